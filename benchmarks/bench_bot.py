@@ -0,0 +1,278 @@
+"""Нагрузочные сценарии всего бота против локальной имитации Bot API.
+
+Бот запускается как есть (main.UniversalBot) с BOT_API_URL, указывающим на
+fake_bot_api, и базой из generate_data во временном каталоге. Сценарии:
+  tag_flood       - поток сообщений с тегами через getUpdates до ответов sendMessage;
+  concurrency     - тот же поток при разном UPDATE_CONCURRENCY и проверка порядка в чатах;
+  birthdays_list  - /birthdays в больших чатах;
+  check_birthdays - полный проход проверки по всей базе и доставка из outbox.
+Результат - JSON (stdout или --output), чтобы сравнивать релизы между собой.
+Запуск:
+    python benchmarks/bench_bot.py --users 100000 --chats 200 --output results.json
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_bot_api import FakeBotAPI
+from generate_data import generate
+
+TOKEN = "123456:bench-token"
+FIRST_CHAT_ID = -1000000000
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))] if values else 0.0
+
+
+def latency_summary(samples):
+    return {
+        "count": len(samples),
+        "p50_ms": round(percentile(samples, 0.5) * 1000, 3),
+        "p95_ms": round(percentile(samples, 0.95) * 1000, 3),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3) if samples else 0.0,
+    }
+
+
+def message_update(chat_id, user_id, text, message_id=1):
+    """Словарь обновления с текстовым сообщением, как его присылает Telegram"""
+    message = {
+        "message_id": message_id,
+        "date": int(time.time()),
+        "chat": {"id": chat_id, "type": "supergroup" if chat_id < 0 else "private", "title": "bench"},
+        "from": {"id": user_id, "is_bot": False, "first_name": "Bench"},
+        "text": text,
+    }
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return {"update_id": message_id, "message": message}
+
+
+async def tag_flood(main, bot, api, args):
+    """Сообщения с тегами идут через getUpdates; ждем, пока на каждое уйдет ответ"""
+    tags = [f"@{name}" for name in main.groups_data]
+    application = bot.application
+    await application.start()
+    await application.updater.start_polling(poll_interval=0.0, timeout=1)
+
+    sent_before = len(api.sent)
+    start = time.perf_counter()
+    for i in range(args.messages):
+        text = f"внимание {tags[i % len(tags)]} собираемся через 5 минут"
+        api.push_update(message_update(FIRST_CHAT_ID - i % args.chats, 100000 + i, text, i + 1))
+    await api.wait_sent(sent_before + args.messages, timeout=args.timeout)
+    elapsed = time.perf_counter() - start
+
+    await application.updater.stop()
+    await application.stop()
+    return {
+        "messages": args.messages,
+        "elapsed_s": round(elapsed, 3),
+        "updates_per_s": round(args.messages / elapsed, 1),
+    }
+
+
+def replies_in_order(replies):
+    """Ответы каждого чата идут в порядке сообщений, на которые отвечают"""
+    last = {}
+    for chat_id, message_id in replies:
+        if message_id < last.get(chat_id, 0):
+            return False
+        last[chat_id] = message_id
+    return True
+
+
+async def concurrency(main, bot, api, args):
+    """Пропускная способность tag_flood при каждом значении --concurrency"""
+    tags = [f"@{name}" for name in main.groups_data]
+    results = {}
+    for level in args.concurrency:
+        level_bot = main.UniversalBot(TOKEN, concurrency=level)
+        application = level_bot.application
+        await application.initialize()
+        await application.start()
+        await application.updater.start_polling(poll_interval=0.0, timeout=1)
+
+        sent_before, replies_before = len(api.sent), len(api.replies)
+        start = time.perf_counter()
+        for i in range(args.messages):
+            text = f"внимание {tags[i % len(tags)]} собираемся через 5 минут"
+            api.push_update(message_update(FIRST_CHAT_ID - i % args.chats, 100000 + i, text, i + 1))
+        await api.wait_sent(sent_before + args.messages, timeout=args.timeout)
+        elapsed = time.perf_counter() - start
+
+        await application.updater.stop()
+        await application.stop()
+        await application.shutdown()
+        results[str(level)] = {
+            "elapsed_s": round(elapsed, 3),
+            "updates_per_s": round(args.messages / elapsed, 1),
+            "ordered_within_chat": replies_in_order(api.replies[replies_before:]),
+        }
+    return {"messages": args.messages, "chats": args.chats, "levels": results}
+
+
+async def birthdays_list(main, bot, api, args):
+    """/birthdays в чатах с ~users/chats участниками"""
+    from telegram import Update
+
+    samples = []
+    failed = 0
+    for i in range(args.repeat):
+        update = Update.de_json(message_update(FIRST_CHAT_ID - i % args.chats, 1, "/birthdays", i + 1), bot.application.bot)
+        sent_before = len(api.sent)
+        start = time.perf_counter()
+        try:
+            await bot.application.process_update(update)
+        except Exception:
+            pass
+        samples.append(time.perf_counter() - start)
+        failed += len(api.sent) == sent_before
+
+    result = latency_summary(samples)
+    result.update(chat_size=args.users // args.chats, failed_replies=failed)
+    return result
+
+
+def outbox_counts(path):
+    conn = sqlite3.connect(path)
+    try:
+        return dict(conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+    finally:
+        conn.close()
+
+
+async def check_birthdays(main, bot, api, args):
+    """Проверка по всей базе, повторная проверка и доставка из outbox в течение --drain секунд"""
+    start = time.perf_counter()
+    ok = await bot.check_birthdays()
+    first = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await bot.check_birthdays()
+    repeat = time.perf_counter() - start
+    enqueued = outbox_counts(main.db.db.db_name)
+
+    sent_before = len(api.sent)
+    await bot.outbox.start()
+    await asyncio.sleep(args.drain)
+    await bot.outbox.stop()
+    delivered = len(api.sent) - sent_before
+
+    return {
+        "users": args.users,
+        "ok": ok,
+        "check_s": round(first, 3),
+        "repeat_check_s": round(repeat, 3),
+        "outbox": enqueued,
+        "drain_s": args.drain,
+        "delivered": delivered,
+        "delivery_per_s": round(delivered / args.drain, 1),
+        "flood_hits": api.flood_hits,
+    }
+
+
+SCENARIOS = {
+    "tag_flood": tag_flood,
+    "concurrency": concurrency,
+    "birthdays_list": birthdays_list,
+    "check_birthdays": check_birthdays,
+}
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args, workdir):
+    api = await FakeBotAPI(args.latency, args.flood_rate, args.retry_after).start()
+
+    # main читает настройки и открывает базу при импорте
+    os.environ["BOT_API_URL"] = api.url
+    os.environ["DATABASE_NAME"] = os.path.join(workdir, "birthdays.db")
+    # tag_flood ждет ответа на каждое сообщение - объединение ответов выключено
+    os.environ.setdefault("TAG_REPLY_WINDOW", "0")
+    with contextlib.redirect_stdout(io.StringIO()):
+        import main
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    # Неудачные ответы учитываются в результатах, трассировки PTB только мешают
+    logging.getLogger("telegram.ext").setLevel(logging.CRITICAL)
+
+    bot = main.UniversalBot(TOKEN)
+    await bot.application.initialize()
+
+    results = {}
+    try:
+        for name in args.scenarios:
+            with contextlib.redirect_stdout(io.StringIO()):
+                results[name] = await SCENARIOS[name](main, bot, api, args)
+    finally:
+        await bot.application.shutdown()
+        await api.stop()
+        main.db.close()
+
+    return {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "users": args.users,
+            "chats": args.chats,
+            "api_latency_s": args.latency,
+            "flood_rate": args.flood_rate,
+            "api_calls": dict(api.calls),
+        },
+        "scenarios": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=2000, help="сообщений в tag_flood")
+    parser.add_argument("--repeat", type=int, default=20, help="вызовов /birthdays")
+    parser.add_argument("--drain", type=float, default=5.0, help="секунд доставки из outbox")
+    parser.add_argument("--latency", type=float, default=0.005, help="задержка ответа Bot API, секунд")
+    parser.add_argument("--flood-rate", type=float, default=0.0, help="доля ответов 429")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64],
+                        help="значения UPDATE_CONCURRENCY для сценария concurrency")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--output", help="файл для JSON с результатами")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        generate(os.path.join(workdir, "birthdays.db"), args.users, args.chats)
+        report = asyncio.run(run(args, workdir))
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Микробенчмарк слоя хранения: соединение на каждый вызов, пул соединений и база в памяти.
+
+Запуск:
+    python benchmarks/bench_database.py --ops 2000
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import Database, StorageBackend, SQLiteBackend, MemoryBackend
+
+
+class ConnectPerCallPool(StorageBackend):
+    """Прежнее поведение: новое соединение, один запрос, commit и close"""
+
+    def __init__(self, db_name):
+        self.name = self.db_name = db_name
+
+    @contextmanager
+    def writer(self):
+        conn = sqlite3.connect(self.db_name, check_same_thread=False)
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    @contextmanager
+    def reader(self):
+        conn = sqlite3.connect(self.db_name, check_same_thread=False)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def close(self):
+        pass
+
+
+def run_workload(db, ops, chats):
+    """Смешанная нагрузка, похожая на работу бота; возвращает ops/sec по операциям"""
+    rng = random.Random(42)
+    results = {}
+
+    def measure(name, fn):
+        start = time.perf_counter()
+        for i in range(ops):
+            fn(i)
+        elapsed = time.perf_counter() - start
+        results[name] = ops / elapsed
+
+    def add(i):
+        month, day = rng.randint(1, 12), rng.randint(1, 28)
+        db.add_birthday(i, i % chats, f"1990-{month:02d}-{day:02d}", f"user{i}", "Имя", "")
+
+    measure("add_birthday", add)
+    measure("get_user_birthday", lambda i: db.get_user_birthday(i, i % chats))
+    measure("get_chat_members", lambda i: db.get_chat_members(i % chats))
+    measure("is_reminder_sent", lambda i: db.is_reminder_sent(i, i % chats, "2025-01-01", "reminder"))
+    measure("add_sent_reminder", lambda i: db.add_sent_reminder(i, i % chats, "2025-01-01", "reminder"))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ops", type=int, default=2000, help="операций на каждый метод")
+    parser.add_argument("--chats", type=int, default=20, help="количество чатов")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        variants = {
+            "connect-per-call": lambda path: ConnectPerCallPool(path),
+            "pooled": lambda path: SQLiteBackend(path),
+            "memory": lambda path: MemoryBackend(),
+        }
+        report = {}
+        for name, make_pool in variants.items():
+            path = os.path.join(tmp, f"{name}.db")
+            # Database печатает сообщение на каждую запись - не меряем вывод в консоль
+            with contextlib.redirect_stdout(io.StringIO()):
+                db = Database(path, pool=make_pool(path))
+                report[name] = run_workload(db, args.ops, args.chats)
+                db.close()
+
+    before, after, memory = report["connect-per-call"], report["pooled"], report["memory"]
+    print(f"{'операция':<20}{'до, ops/s':>14}{'после, ops/s':>16}{'ускорение':>12}{'в памяти, ops/s':>18}")
+    for op in before:
+        print(f"{op:<20}{before[op]:>14.0f}{after[op]:>16.0f}{after[op] / before[op]:>11.1f}x{memory[op]:>18.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Бенчмарк рассылки напоминаний на локальной заглушке Bot API.
+
+Сравнивает прежнюю последовательную отправку (send + sleep(0.1)) с разбором
+outbox обработчиками через DeliveryEngine - так сообщения отправляет бот.
+Запуск:
+    python benchmarks/bench_delivery.py --recipients 300 --latency 0.05 --flood-rate 0.01
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram.error import RetryAfter
+
+from delivery import DeliveryEngine
+from outbox import Outbox
+from storage import Database, AsyncDatabase
+
+
+class FakeBot:
+    """Заглушка Bot API: задержка сети и случайные ответы 429"""
+
+    def __init__(self, latency, flood_rate, retry_after=1, seed=1):
+        self.latency = latency
+        self.flood_rate = flood_rate
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.delivered = 0
+        self.floods = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await asyncio.sleep(self.latency)
+        if self.rng.random() < self.flood_rate:
+            self.floods += 1
+            raise RetryAfter(self.retry_after)
+        self.delivered += 1
+
+
+async def serial_baseline(bot, recipients):
+    """Прежний цикл из check_birthdays"""
+    start = time.perf_counter()
+    for user_id in recipients:
+        try:
+            await bot.send_message(chat_id=user_id, text="reminder")
+        except RetryAfter:
+            pass
+        await asyncio.sleep(0.1)
+    return time.perf_counter() - start
+
+
+async def run(args):
+    recipients = list(range(1, args.recipients + 1))
+
+    bot = FakeBot(args.latency, args.flood_rate)
+    serial = await serial_baseline(bot, recipients)
+    print(f"последовательно: {len(recipients)} сообщений за {serial:.2f} с "
+          f"({bot.delivered / serial:.1f} msg/s, потеряно из-за 429: {bot.floods})")
+
+    bot = FakeBot(args.latency, args.flood_rate)
+    db = AsyncDatabase(Database(":memory:"))
+    outbox = Outbox(db, DeliveryEngine(bot, global_rate=args.global_rate), workers=args.concurrency, base_delay=0)
+    await db.enqueue_outbox([(f"reminder:{user_id}", user_id, "reminder", None) for user_id in recipients])
+
+    start = time.perf_counter()
+    await outbox.start()
+    while bot.delivered < len(recipients):
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    await outbox.stop()
+    db.close()
+    print(f"outbox:          {bot.delivered} сообщений за {elapsed:.2f} с "
+          f"({bot.delivered / elapsed:.1f} msg/s, ответов 429: {bot.floods})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--recipients", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.05, help="задержка ответа API, с")
+    parser.add_argument("--flood-rate", type=float, default=0.01, help="доля ответов 429")
+    parser.add_argument("--global-rate", type=float, default=30, help="лимит сообщений в секунду")
+    parser.add_argument("--concurrency", type=int, default=30, help="обработчиков outbox")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Бенчмарк поиска тегов в handle_message: разбиение на слова против TagMatcher.
+
+Корпус - типичные сообщения группового чата: в основном текст без тегов,
+упоминания пользователей, теги групп в разных формах и регистрах. Совпадение
+результатов обоих алгоритмов проверяет tests/test_tag_matcher.py.
+Запуск:
+    python benchmarks/bench_tags.py --messages 50000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# main открывает базу при импорте - бенчмарку хватит базы в памяти
+os.environ.setdefault("DATABASE_NAME", ":memory:")
+
+from tags import TAG_ENDINGS, TagMatcher, build_group_mapping
+
+WORDS = (
+    "привет всем кто сегодня на тренировке во сколько начинаем скрим вечером "
+    "ребята не забудьте про турнир в субботу нужно обсудить состав и драфт "
+    "я опоздаю минут на десять скиньте пожалуйста запись вчерашней игры"
+).split()
+USERNAMES = ["@rickreygan", "@Margul95", "@someone", "@TaiBurs", "@random_user"]
+
+
+def legacy_find(message_text, group_mapping):
+    """Прежний алгоритм handle_message + find_group_by_tag"""
+    for word in message_text.split():
+        if word.startswith('@'):
+            tag_clean = word.lower().lstrip('@')
+            if tag_clean in group_mapping:
+                return group_mapping[tag_clean]
+            for ending in TAG_ENDINGS:
+                test_tag = tag_clean
+                if not test_tag.endswith(ending):
+                    test_tag = tag_clean + ending
+                if test_tag in group_mapping:
+                    return group_mapping[test_tag]
+    return None
+
+
+def make_corpus(count, group_mapping, seed=7):
+    rng = random.Random(seed)
+    tags = list(group_mapping)
+    corpus = []
+    for _ in range(count):
+        words = rng.choices(WORDS, k=rng.randint(3, 30))
+        roll = rng.random()
+        if roll < 0.15:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(USERNAMES))
+        elif roll < 0.30:
+            tag = rng.choice(tags)
+            if rng.random() < 0.3:
+                tag = tag[:-1] if len(tag) > 3 else tag
+            words.insert(rng.randrange(len(words) + 1), "@" + (tag.upper() if rng.random() < 0.2 else tag))
+        corpus.append(" ".join(words))
+    return corpus
+
+
+def measure(fn, corpus):
+    start = time.perf_counter()
+    for text in corpus:
+        fn(text)
+    return len(corpus) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=50000)
+    args = parser.parse_args()
+
+    from main import groups_data
+    group_mapping = build_group_mapping(groups_data)
+    matcher = TagMatcher(group_mapping)
+    corpus = make_corpus(args.messages, group_mapping)
+
+    before = measure(lambda text: legacy_find(text, group_mapping), corpus)
+    after = measure(matcher.find, corpus)
+    print(f"разбиение на слова: {before:>10.0f} сообщений/с")
+    print(f"TagMatcher:         {after:>10.0f} сообщений/с ({after / before:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
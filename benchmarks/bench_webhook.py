@@ -0,0 +1,98 @@
+"""Проверка и бенчмарк webhook-приема: локальный клиент POST-ит обновления в WebhookApp.
+
+ASGI-приложение вызывается напрямую через httpx.ASGITransport, вместо бота -
+заглушка с очередью обновлений. Меряется задержка ответа и пропускная
+способность для одиночных обновлений и для пачек.
+Запуск:
+    python benchmarks/bench_webhook.py --updates 5000 --batch 50
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from webhook import WebhookApp
+
+SECRET = "bench-secret"
+
+
+class StubApplication:
+    """Минимальная замена telegram.ext.Application для WebhookApp"""
+
+    def __init__(self):
+        self.bot = None
+        self.running = True
+        self.update_queue = asyncio.Queue()
+
+
+def make_update(update_id, chat_id=-1001, text="привет @стафф"):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": chat_id, "type": "supergroup", "title": "bench"},
+            "from": {"id": 1000 + update_id % 50, "is_bot": False, "first_name": "User"},
+            "text": text,
+        },
+    }
+
+
+async def check_endpoints(client, app):
+    """Проверка health/readiness и отказа без секрета"""
+    assert (await client.get("/healthz")).status_code == 200
+    assert (await client.get("/readyz")).status_code == 200
+    app.application.running = False
+    assert (await client.get("/readyz")).status_code == 503
+    app.application.running = True
+    assert (await client.post("/webhook", json=make_update(0))).status_code == 403
+    assert (await client.post("/webhook", content=b"{", headers={"X-Telegram-Bot-Api-Secret-Token": SECRET})).status_code == 400
+
+
+async def post_all(client, updates, batch):
+    headers = {"X-Telegram-Bot-Api-Secret-Token": SECRET}
+    latencies = []
+    start = time.perf_counter()
+    for i in range(0, len(updates), batch):
+        chunk = updates[i:i + batch]
+        sent = time.perf_counter()
+        response = await client.post("/webhook", json=chunk if batch > 1 else chunk[0], headers=headers)
+        latencies.append(time.perf_counter() - sent)
+        response.raise_for_status()
+    return time.perf_counter() - start, latencies
+
+
+async def run(args):
+    app = WebhookApp(StubApplication(), path="/webhook", secret_token=SECRET)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await check_endpoints(client, app)
+
+        updates = [make_update(i) for i in range(1, args.updates + 1)]
+        for batch in (1, args.batch):
+            elapsed, latencies = await post_all(client, updates, batch)
+            queued = app.application.update_queue.qsize()
+            assert queued == len(updates), f"в очереди {queued} обновлений из {len(updates)}"
+            while not app.application.update_queue.empty():
+                app.application.update_queue.get_nowait()
+
+            p99 = statistics.quantiles(latencies, n=100)[98] if len(latencies) >= 2 else latencies[0]
+            print(f"пачка {batch:>4}: {len(updates) / elapsed:>9.0f} обновлений/с, "
+                  f"p50 {statistics.median(latencies) * 1000:.2f} мс, p99 {p99 * 1000:.2f} мс на запрос")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--batch", type=int, default=50)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+"""Локальная имитация Telegram Bot API для нагрузочных тестов.
+
+Понимает getMe, getUpdates, sendMessage, setMyCommands, deleteWebhook и
+setWebhook; добавляет задержку ответа и с заданной вероятностью отвечает 429
+(flood control). Бот направляется сюда через BOT_API_URL. Тесты (tests/)
+используют тот же сервер и задают ошибки явно: flood_next, blocked_chats.
+Запуск отдельно:
+    python benchmarks/fake_bot_api.py --port 8081 --latency 0.05 --flood-rate 0.01
+    BOT_API_URL=http://127.0.0.1:8081/bot python main.py
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+from collections import Counter
+from urllib.parse import parse_qsl
+
+# Ограничение Telegram на длину текста сообщения
+MAX_MESSAGE_LENGTH = 4096
+
+# Теги, которые Bot API принимает в parse_mode=HTML
+SUPPORTED_TAGS = re.compile(r"</?(?:b|strong|i|em|u|ins|s|strike|del|a|code|pre|span|tg-spoiler)(?:\s[^>]*)?>")
+
+BOT_USER = {"id": 1000000, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+
+
+class FakeBotAPI:
+    """HTTP-сервер, отвечающий как Bot API"""
+
+    def __init__(self, latency=0.0, flood_rate=0.0, retry_after=1, seed=42):
+        self.latency = latency
+        self.flood_rate = flood_rate
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.calls = Counter()
+        self.sent = []
+        # (chat_id, reply_to_message_id) ответов - по ним проверяется порядок внутри чата
+        self.replies = []
+        self.flood_hits = 0
+        # Сколько следующих sendMessage ответят 429 независимо от flood_rate
+        self.flood_next = 0
+        # Чаты, заблокировавшие бота: sendMessage отвечает 403
+        self.blocked_chats = set()
+        self.updates = asyncio.Queue()
+        self.next_update_id = 1
+        self.message_ids = iter(range(1, 1 << 62))
+        self.server = None
+        self.port = None
+
+    @property
+    def url(self):
+        """base_url для Application.builder()"""
+        return f"http://127.0.0.1:{self.port}/bot"
+
+    async def start(self, port=0):
+        self.server = await asyncio.start_server(self._handle_connection, "127.0.0.1", port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    def push_update(self, data):
+        """Добавить обновление, которое бот получит через getUpdates"""
+        data = dict(data, update_id=self.next_update_id)
+        self.next_update_id += 1
+        self.updates.put_nowait(data)
+
+    async def wait_sent(self, count, timeout=60):
+        """Ожидание, пока бот отправит count сообщений"""
+        deadline = time.monotonic() + timeout
+        while len(self.sent) < count:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"only {len(self.sent)} of {count} messages sent")
+            await asyncio.sleep(0.01)
+
+    async def _handle_connection(self, reader, writer):
+        # httpx держит соединения открытыми, поэтому запросы читаются в цикле
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                path = request_line.split()[1].decode()
+                status, payload = await self._dispatch(path.rsplit("/", 1)[-1], headers, body, reader)
+
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} OK\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # Клиент закрыл соединение или сервер останавливается посреди getUpdates
+            pass
+        finally:
+            writer.close()
+
+    def _parse_params(self, headers, body):
+        if headers.get("content-type", "").startswith("application/json"):
+            return json.loads(body or b"{}")
+        # PTB передает параметры формой, вложенные значения - строками JSON
+        params = {}
+        for key, value in parse_qsl(body.decode()):
+            try:
+                params[key] = json.loads(value)
+            except ValueError:
+                params[key] = value
+        return params
+
+    async def _dispatch(self, method, headers, body, reader):
+        self.calls[method] += 1
+        params = self._parse_params(headers, body)
+
+        if method == "getUpdates":
+            return 200, {"ok": True, "result": await self._get_updates(params, reader)}
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if method == "getMe":
+            return 200, {"ok": True, "result": BOT_USER}
+        if method in ("setMyCommands", "deleteWebhook", "setWebhook"):
+            return 200, {"ok": True, "result": True}
+        if method == "sendMessage":
+            return self._send_message(params)
+        return 404, {"ok": False, "error_code": 404, "description": "Not Found: method not found"}
+
+    async def _get_updates(self, params, reader):
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        timeout = float(params.get("timeout") or 0)
+
+        batch = []
+        try:
+            if self.updates.empty() and timeout:
+                batch.append(await asyncio.wait_for(self.updates.get(), timeout))
+            while len(batch) < limit and not self.updates.empty():
+                batch.append(self.updates.get_nowait())
+        except asyncio.TimeoutError:
+            pass
+
+        if batch and reader.at_eof():
+            # Опрос остановленного бота: клиент уже ушел, обновления достанутся следующему
+            rest = []
+            while not self.updates.empty():
+                rest.append(self.updates.get_nowait())
+            for update in batch + rest:
+                self.updates.put_nowait(update)
+            return []
+        return [update for update in batch if update["update_id"] >= offset]
+
+    def _send_message(self, params):
+        if self.flood_next or (self.flood_rate and self.rng.random() < self.flood_rate):
+            self.flood_next = max(0, self.flood_next - 1)
+            self.flood_hits += 1
+            return 429, {
+                "ok": False, "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            }
+
+        text = str(params.get("text", ""))
+        if len(text) > MAX_MESSAGE_LENGTH:
+            return 400, {"ok": False, "error_code": 400, "description": "Bad Request: message is too long"}
+        if params.get("parse_mode") == "HTML" and "<" in SUPPORTED_TAGS.sub("", text):
+            return 400, {"ok": False, "error_code": 400,
+                         "description": "Bad Request: can't parse entities: unsupported start tag"}
+
+        chat_id = int(params["chat_id"])
+        if chat_id in self.blocked_chats:
+            return 403, {"ok": False, "error_code": 403, "description": "Forbidden: bot was blocked by the user"}
+
+        self.sent.append((chat_id, text))
+        if params.get("reply_to_message_id"):
+            self.replies.append((chat_id, int(params["reply_to_message_id"])))
+        return 200, {"ok": True, "result": {
+            "message_id": next(self.message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup"},
+            "from": BOT_USER,
+            "text": text,
+        }}
+
+
+async def serve_forever(args):
+    api = await FakeBotAPI(args.latency, args.flood_rate, args.retry_after).start(args.port)
+    print(f"Fake Bot API: {api.url}<token>/<method>")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        print(f"calls: {dict(api.calls)}, flood hits: {api.flood_hits}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка ответа, секунд")
+    parser.add_argument("--flood-rate", type=float, default=0.0, help="доля ответов 429 на sendMessage")
+    parser.add_argument("--retry-after", type=int, default=1, help="retry_after в ответе 429")
+    try:
+        asyncio.run(serve_forever(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
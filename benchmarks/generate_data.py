@@ -0,0 +1,85 @@
+"""Генератор синтетической базы дней рождения для нагрузочных тестов.
+
+Пользователи равномерно распределяются по чатам, даты - равномерно по году,
+поэтому на каждый день приходится ~1/365 именинников, как в живой базе.
+Запуск:
+    python benchmarks/generate_data.py /tmp/bench/birthdays.db --users 100000 --chats 200
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import Database, month_day_key
+
+FIRST_NAMES = ("Анна", "Иван", "Мария", "Пётр", "Ольга", "Дмитрий", "Елена", "Сергей", "Алиса", "Никита")
+LAST_NAMES = ("Иванова", "Петров", "Смирнова", "Кузнецов", "", "", "Соколова", "Попов")
+
+# Пачка строк на одну транзакцию
+CHUNK_SIZE = 10000
+
+
+def generate_rows(users, chats, seed=42):
+    """Строки birthdays: (user_id, chat_id, birthday_date, username, first_name, last_name, month_day)"""
+    rng = random.Random(seed)
+    start = date(1970, 1, 1)
+    for i in range(users):
+        user_id = 100000 + i
+        # Отрицательные id, как у групп Telegram
+        chat_id = -1000000000 - (i % chats)
+        birthday = (start + timedelta(days=rng.randrange(365 * 35))).isoformat()
+        yield (
+            user_id, chat_id, birthday, f"user{user_id}",
+            rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), month_day_key(birthday),
+        )
+
+
+def generate(path, users, chats, seed=42):
+    """Создание базы path с users записями в chats чатах"""
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        db = Database(path)
+
+    rows = generate_rows(users, chats, seed)
+    while True:
+        chunk = list(itertools.islice(rows, CHUNK_SIZE))
+        if not chunk:
+            break
+        with db.pool.writer() as conn:
+            conn.executemany('''
+                INSERT OR REPLACE INTO birthdays
+                    (user_id, chat_id, birthday_date, username, first_name, last_name, month_day)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', chunk)
+
+    with db.pool.writer() as conn:
+        # Все чаты сразу ждут рассылки, как после миграции живой базы
+        conn.execute("INSERT OR IGNORE INTO chat_settings (chat_id) SELECT DISTINCT chat_id FROM birthdays")
+        conn.execute("INSERT OR IGNORE INTO chat_members (chat_id, user_id) SELECT chat_id, user_id FROM birthdays")
+        conn.execute("ANALYZE")
+    db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", help="файл базы (будет перезаписан)")
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    generate(args.path, args.users, args.chats, args.seed)
+    print(f"✅ {args.users} записей в {args.chats} чатах: {args.path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+import csv
+import io
+import json
+from birthdays import parse_birthday_date
+from storage import month_day_key
+
+# Строк на одну транзакцию при импорте и на одно чтение (fetchmany) при выгрузке
+IMPORT_CHUNK = 500
+EXPORT_BATCH = 1000
+# Наибольший принимаемый файл (Bot API отдает ботам файлы до 20 МБ)
+MAX_IMPORT_SIZE = 20 * 1024 * 1024
+# Сколько номеров строк с ошибками показывать в ответе
+MAX_REPORTED_ERRORS = 10
+
+EXPORT_FIELDS = ("user_id", "birthday", "username", "first_name", "last_name")
+
+# Допустимые названия столбцов -> поле записи
+FIELD_ALIASES = {
+    "user_id": "user_id", "id": "user_id",
+    "birthday": "birthday", "birthday_date": "birthday", "date": "birthday", "дата": "birthday",
+    "username": "username",
+    "first_name": "first_name", "имя": "first_name",
+    "last_name": "last_name", "фамилия": "last_name",
+}
+
+
+class ImportFileError(ValueError):
+    """Файл не удалось дочитать; строки до места ошибки уже сохранены"""
+
+    def __init__(self, message, imported, errors, month_days):
+        super().__init__(message)
+        self.imported = imported
+        self.errors = errors
+        self.month_days = month_days
+
+
+def _normalize(record):
+    return {FIELD_ALIASES[key.strip().lower()]: value for key, value in record.items()
+            if key and key.strip().lower() in FIELD_ALIASES}
+
+
+def iter_csv_records(stream):
+    """Строки CSV с заголовком; разделитель (запятая или точка с запятой) определяется по заголовку"""
+    header = stream.readline()
+    delimiter = ";" if header.count(";") > header.count(",") else ","
+    fields = next(csv.reader([header], delimiter=delimiter), [])
+    for record in csv.DictReader(stream, fieldnames=fields, delimiter=delimiter):
+        yield _normalize(record)
+
+
+def iter_json_records(stream, chunk_size=64 * 1024):
+    """Объекты из JSON-массива или JSON Lines, разбираемые по мере чтения"""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    opened = False
+    for chunk in iter(lambda: stream.read(chunk_size), ""):
+        buffer += chunk
+        while True:
+            buffer = buffer.lstrip(" \t\r\n,")
+            if not opened and buffer.startswith("["):
+                buffer, opened = buffer[1:], True
+                continue
+            if not buffer or buffer.startswith("]"):
+                break
+            try:
+                record, end = decoder.raw_decode(buffer)
+            except ValueError:
+                # Объект еще не дочитан
+                break
+            buffer = buffer[end:]
+            yield _normalize(record) if isinstance(record, dict) else {}
+    if buffer.strip(" \t\r\n,]"):
+        raise ValueError("Некорректный JSON")
+
+
+def read_records(stream, filename):
+    """Записи файла импорта: JSON по расширению .json/.jsonl, иначе CSV"""
+    if filename.lower().endswith((".json", ".jsonl")):
+        return iter_json_records(stream)
+    return iter_csv_records(stream)
+
+
+def parse_record(record, today):
+    """Строка для Database.add_birthdays или ValueError"""
+    user_id = int(str(record.get("user_id", "")).strip())
+    birthday_date = parse_birthday_date(str(record.get("birthday", "")), today)
+    return (
+        user_id,
+        birthday_date.strftime("%Y-%m-%d"),
+        str(record.get("username") or "").lstrip("@"),
+        str(record.get("first_name") or ""),
+        str(record.get("last_name") or ""),
+    )
+
+
+def import_birthdays(database, chat_id, stream, filename, today, next_run_at=0):
+    """Импорт файла в чат пачками по IMPORT_CHUNK строк.
+
+    Возвращает (число записанных строк, номера записей с ошибками, ключи "ММ-ДД"
+    записанных дат). Записи нумеруются с 1 без заголовка CSV: запись CSV может
+    занимать несколько строк файла. Ошибочные записи пропускаются, остальные сохраняются.
+    Если файл не удалось дочитать, строки до места ошибки сохраняются и
+    выбрасывается ImportFileError с итогами импорта.
+    """
+    imported, errors, month_days = 0, [], set()
+    chunk = []
+    number = 0
+    try:
+        for number, record in enumerate(read_records(stream, filename), 1):
+            try:
+                row = parse_record(record, today)
+            except ValueError:
+                errors.append(number)
+                continue
+            chunk.append(row)
+            month_days.add(month_day_key(row[1]))
+            if len(chunk) >= IMPORT_CHUNK:
+                imported += database.add_birthdays(chat_id, chunk, next_run_at)
+                chunk = []
+    except (ValueError, csv.Error) as e:
+        if chunk:
+            imported += database.add_birthdays(chat_id, chunk, next_run_at)
+        raise ImportFileError(f"{e} (после записи {number})", imported, errors, month_days) from e
+    if chunk:
+        imported += database.add_birthdays(chat_id, chunk, next_run_at)
+    return imported, errors, month_days
+
+
+def export_birthdays(database, chat_id, stream, fmt="csv"):
+    """Выгрузка дней рождения чата в текстовый поток stream; возвращает число строк"""
+    count = 0
+    if fmt == "csv":
+        writer = csv.writer(stream)
+        writer.writerow(EXPORT_FIELDS)
+    else:
+        stream.write("[")
+
+    for rows in database.iter_chat_birthdays(chat_id, EXPORT_BATCH):
+        for user_id, _, birthday_date, username, first_name, last_name in rows:
+            values = (user_id, birthday_date, username or "", first_name or "", last_name or "")
+            if fmt == "csv":
+                writer.writerow(values)
+            else:
+                stream.write(("," if count else "") + "\n" + json.dumps(dict(zip(EXPORT_FIELDS, values)), ensure_ascii=False))
+            count += 1
+
+    if fmt != "csv":
+        stream.write("\n]\n")
+    return count
+
+
+def open_text(binary):
+    """Текстовый поток поверх загруженного файла (UTF-8, с BOM или без)"""
+    return io.TextIOWrapper(binary, encoding="utf-8-sig", newline="")
+
+
+def export_to_file(database, chat_id, binary, fmt="csv"):
+    """Выгрузка в двоичный файл binary; CSV - с BOM, чтобы Excel узнал UTF-8"""
+    stream = io.TextIOWrapper(binary, encoding="utf-8-sig" if fmt == "csv" else "utf-8", newline="")
+    count = export_birthdays(database, chat_id, stream, fmt)
+    stream.flush()
+    stream.detach()
+    return count
@@ -0,0 +1,221 @@
+import calendar
+import html
+from datetime import date, datetime, timedelta
+from dateutil.parser import parse
+from storage import month_day_key
+from chat_cache import ChatCache
+
+# Строк на странице /birthdays: даже при длинных именах страница меньше 4096 символов
+PAGE_SIZE = 20
+# Сколько чатов держать в кэше страниц
+PAGE_CACHE_SIZE = 256
+
+# Префикс callback_data кнопок листания
+PAGE_CALLBACK = "bd"
+
+# /upcoming: период по умолчанию и наибольший (год); строк в ответах /upcoming и /month
+UPCOMING_DAYS = 30
+MAX_UPCOMING_DAYS = 365
+LIST_LIMIT = 50
+
+MONTH_NAMES = (
+    "Январь", "Февраль", "Март", "Апрель", "Май", "Июнь",
+    "Июль", "Август", "Сентябрь", "Октябрь", "Ноябрь", "Декабрь",
+)
+
+
+def format_date(birthday_date):
+    """ГГГГ-ММ-ДД -> ДД.ММ.ГГГГ без разбора даты"""
+    return f"{birthday_date[8:10]}.{birthday_date[5:7]}.{birthday_date[:4]}"
+
+
+class FutureDateError(ValueError):
+    """Дата рождения позже сегодняшней"""
+
+
+def parse_birthday_date(text, today):
+    """Дата рождения из строки ДД.ММ.ГГГГ, ДД.ММ.ГГ, ДД.ММ (год - текущий), ГГГГ-ММ-ДД
+    и других понятных dateutil написаний; ValueError, если дата не распознана или в будущем
+    """
+    date_str = text.strip().replace('/', '.').replace('-', '.')
+
+    parsed_date = None
+    # ГГГГ.ММ.ДД - ISO-дата (в таком виде даты выгружает /export_birthdays)
+    for fmt in ('%d.%m.%Y', '%d.%m.%y', '%d.%m', '%Y.%m.%d'):
+        try:
+            parsed_date = datetime.strptime(date_str, fmt)
+            break
+        except ValueError:
+            continue
+
+    if parsed_date is None:
+        try:
+            parsed_date = parse(date_str, dayfirst=True)
+        except (ValueError, OverflowError):
+            raise ValueError("Не удалось распознать дату")
+
+    # Если введена дата без года, используем текущий год
+    if len(date_str.split('.')) == 2:
+        birthday_date = parsed_date.replace(year=today.year).date()
+    else:
+        birthday_date = parsed_date.date()
+
+    if birthday_date > today:
+        raise FutureDateError("Дата рождения не может быть в будущем")
+    return birthday_date
+
+
+def display_name(first_name, last_name, username):
+    """Имя для списка: имя и фамилия или имя и @username"""
+    name = first_name or ""
+    if last_name:
+        name += f" {last_name}"
+    elif username:
+        name += f" (@{username})"
+    return html.escape(name)
+
+
+def celebration_window(today, days):
+    """Диапазон ключей "ММ-ДД" (start, end) для days дней начиная с today.
+
+    При start > end диапазон переходит через Новый год. Если последний день -
+    28 февраля невисокосного года, в диапазон попадает и 29 февраля.
+    """
+    days = max(1, min(days, MAX_UPCOMING_DAYS))
+    last = today + timedelta(days=days - 1)
+    start, end = today.strftime("%m-%d"), last.strftime("%m-%d")
+    if end == "02-28" and not calendar.isleap(last.year):
+        end = "02-29"
+    return start, end
+
+
+def next_celebration(birthday_date, today):
+    """Ближайший день (не раньше today), когда отмечается день рождения"""
+    month, day = int(birthday_date[5:7]), int(birthday_date[8:10])
+    for year in (today.year, today.year + 1):
+        celebrated = date(year, month, 28 if (month, day) == (2, 29) and not calendar.isleap(year) else day)
+        if celebrated >= today:
+            return celebrated
+
+
+def _days_until(days):
+    if days == 0:
+        return "сегодня"
+    if days == 1:
+        return "завтра"
+    return f"через {days} дн."
+
+
+def render_upcoming(rows, today, days, more=False):
+    """Текст ответа на /upcoming"""
+    lines = [f"📅 <b>Ближайшие дни рождения ({days} дн.):</b>\n"]
+    for user_id, chat_id, birthday_date, username, first_name, last_name in rows:
+        celebrated = next_celebration(birthday_date, today)
+        age = celebrated.year - int(birthday_date[:4])
+        age_text = f", исполнится {age}" if age > 0 else ""
+        lines.append(
+            f"• {celebrated.strftime('%d.%m')} - {display_name(first_name, last_name, username)}"
+            f"{age_text} ({_days_until((celebrated - today).days)})"
+        )
+    if more:
+        lines.append(f"\n… показаны первые {LIST_LIMIT}, уменьшите период")
+    return "\n".join(lines)
+
+
+def render_month(rows, month, today, more=False):
+    """Текст ответа на /month"""
+    lines = [f"📅 <b>Дни рождения: {MONTH_NAMES[month - 1]}</b>\n"]
+    for user_id, chat_id, birthday_date, username, first_name, last_name in rows:
+        line = f"• {birthday_date[8:10]}.{birthday_date[5:7]} - {display_name(first_name, last_name, username)}"
+        if month_day_key(birthday_date) == "02-29" and not calendar.isleap(today.year):
+            line += " (в этом году 28.02)"
+        lines.append(line)
+    if more:
+        lines.append(f"\n… показаны первые {LIST_LIMIT}")
+    return "\n".join(lines)
+
+
+def row_key(row):
+    """Ключ строки в порядке списка: (month_day, user_id)"""
+    return month_day_key(row[2]), row[0]
+
+
+def page_callback(direction, number, key):
+    """callback_data кнопки: bd:<n|p>:<номер страницы>:<ММ-ДД>:<user_id>"""
+    return f"{PAGE_CALLBACK}:{direction}:{number}:{key[0]}:{key[1]}"
+
+
+def parse_page_callback(data):
+    """(before, номер страницы, ключ) из callback_data или None"""
+    try:
+        prefix, direction, number, month_day, user_id = data.split(":")
+        if prefix != PAGE_CALLBACK or direction not in ("n", "p"):
+            return None
+        return direction == "p", int(number), (month_day, int(user_id))
+    except ValueError:
+        return None
+
+
+class BirthdayPage:
+    """Одна отрисованная страница списка дней рождения чата"""
+
+    def __init__(self, rows, number, total, has_prev, has_next):
+        self.rows = rows
+        self.number = number
+        self.total = total
+        self.pages = max(1, -(-total // PAGE_SIZE))
+        self.prev_data = page_callback("p", number - 1, row_key(rows[0])) if has_prev and rows else None
+        self.next_data = page_callback("n", number + 1, row_key(rows[-1])) if has_next and rows else None
+
+        lines = ["🎉 <b>Дни рождения участников:</b>\n"]
+        first = (number - 1) * PAGE_SIZE + 1
+        for i, (user_id, chat_id, birthday_date, username, first_name, last_name) in enumerate(rows, first):
+            lines.append(f"{i}. {display_name(first_name, last_name, username)} - {format_date(birthday_date)}")
+        lines.append(f"\n📊 Всего: {total} человек(а)")
+        if self.pages > 1:
+            lines.append(f"📄 Страница {min(number, self.pages)} из {self.pages}")
+        self.text = "\n".join(lines)
+
+
+class BirthdayPages:
+    """Страницы /birthdays по чатам с вытеснением давно не использованных (LRU).
+
+    Страница читается из базы одним запросом по индексу (chat_id, month_day,
+    user_id) и хранится, пока в чате не изменится какой-нибудь день рождения -
+    тогда достаточно вызвать invalidate.
+    """
+
+    def __init__(self, loader, counter, capacity=PAGE_CACHE_SIZE):
+        self.loader = loader
+        self.counter = counter
+        self._chats = ChatCache(capacity)
+
+    async def get(self, chat_id, cursor=None, before=False, number=1):
+        """Страница чата после (или до) cursor; без cursor - первая"""
+        cache = self._chats.get(chat_id)
+        if cache is not None:
+            page = cache["pages"].get((before, cursor, number))
+            if page is not None:
+                return page
+
+        generation = self._chats.generation(chat_id)
+        total = cache["total"] if cache is not None else await self.counter(chat_id)
+
+        # Лишняя строка показывает, есть ли страница дальше в этом направлении
+        rows = await self.loader(chat_id, cursor, PAGE_SIZE + 1, before)
+        more = len(rows) > PAGE_SIZE
+        if before:
+            rows = rows[-PAGE_SIZE:]
+            page = BirthdayPage(rows, number, total, has_prev=more, has_next=True)
+        else:
+            rows = rows[:PAGE_SIZE]
+            page = BirthdayPage(rows, number, total, has_prev=cursor is not None, has_next=more)
+
+        cache = self._chats.get(chat_id) or {"total": total, "pages": {}}
+        if self._chats.put(chat_id, cache, generation):
+            cache["pages"][(before, cursor, number)] = page
+        return page
+
+    def invalidate(self, chat_id):
+        """Сброс страниц чата после изменения его дней рождения"""
+        self._chats.invalidate(chat_id)
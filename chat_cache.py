@@ -0,0 +1,46 @@
+from collections import OrderedDict
+
+
+class ChatCache:
+    """Значения по чатам с вытеснением давно не использованных (LRU).
+
+    invalidate сбрасывает значение чата и меняет его поколение: результат
+    загрузки, начатой до сброса, put в кэш уже не положит.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._items = OrderedDict()
+        self._generations = {}
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, chat_id):
+        return chat_id in self._items
+
+    def get(self, chat_id):
+        """Значение чата или None; найденное становится самым свежим"""
+        value = self._items.get(chat_id)
+        if value is not None:
+            self._items.move_to_end(chat_id)
+        return value
+
+    def generation(self, chat_id):
+        """Поколение чата: запоминается перед загрузкой и передается в put"""
+        return self._generations.get(chat_id, 0)
+
+    def put(self, chat_id, value, generation=None):
+        """Сохранение значения; False, если с начала загрузки чат сбрасывали"""
+        if generation is not None and generation != self.generation(chat_id):
+            return False
+        self._items[chat_id] = value
+        self._items.move_to_end(chat_id)
+        while len(self._items) > self.capacity:
+            self._items.popitem(last=False)
+        return True
+
+    def invalidate(self, chat_id):
+        """Сброс значения чата и начатых для него загрузок"""
+        self._items.pop(chat_id, None)
+        self._generations[chat_id] = self.generation(chat_id) + 1
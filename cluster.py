@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+from telegram import Bot, Update
+from telegram.error import NetworkError
+from webhook import WebhookApp, serve_webhook
+
+logger = logging.getLogger(__name__)
+
+# Как часто проверяем, живы ли процессы-обработчики
+SUPERVISE_INTERVAL = 5
+# Длинный опрос getUpdates в главном процессе
+POLL_TIMEOUT = 30
+# Сколько ждем завершения процесса-обработчика при остановке
+SHUTDOWN_TIMEOUT = 15
+
+
+def shard_key(update):
+    """Ключ распределения: чат, иначе пользователь, иначе номер обновления"""
+    if update.effective_chat:
+        return update.effective_chat.id
+    if update.effective_user:
+        return update.effective_user.id
+    return update.update_id
+
+
+class ShardRouter:
+    """Очередь обновлений, раскладывающая их по процессам.
+
+    Все обновления одного чата попадают в один процесс, поэтому состояние
+    диалогов и кэш тегов чата остаются локальными для процесса.
+    """
+
+    def __init__(self, queues):
+        self.queues = queues
+
+    def put_nowait(self, update):
+        self.queues[shard_key(update) % len(self.queues)].put(update.to_dict())
+
+
+def run_shard_worker(token, index, updates):
+    """Точка входа процесса-обработчика"""
+    from main import UniversalBot, METRICS_PORT
+
+    instance_id = f"{socket.gethostname()}-{os.getpid()}-shard{index}"
+    # У каждого процесса свои метрики - и свой порт подряд от METRICS_PORT
+    metrics_port = METRICS_PORT + index if METRICS_PORT is not None else None
+    bot = UniversalBot(token, instance_id=instance_id, updater=False, metrics_port=metrics_port)
+    try:
+        asyncio.run(bot.run_shard(updates))
+    except KeyboardInterrupt:
+        pass
+
+
+class Cluster:
+    """Главный процесс: принимает обновления и раздает их процессам-обработчикам.
+
+    Снаружи выглядит как Application для WebhookApp: bot, running, update_queue.
+    Планировщик и outbox работают только в одном процессе - том, что держит
+    аренду в базе.
+    """
+
+    def __init__(self, token, workers):
+        self.token = token
+        self.bot = Bot(token)
+        self.running = False
+        self.context = multiprocessing.get_context("spawn")
+        self.queues = [self.context.Queue() for _ in range(workers)]
+        self.update_queue = ShardRouter(self.queues)
+        self.processes = [None] * workers
+
+    def start_worker(self, index):
+        """Запуск (или перезапуск) процесса-обработчика"""
+        process = self.context.Process(
+            target=run_shard_worker, args=(self.token, index, self.queues[index]), name=f"shard-{index}"
+        )
+        process.start()
+        self.processes[index] = process
+        logger.info(f"✅ Shard {index} started (pid {process.pid})")
+
+    async def supervise(self):
+        """Перезапуск упавших процессов-обработчиков"""
+        while True:
+            await asyncio.sleep(SUPERVISE_INTERVAL)
+            for index, process in enumerate(self.processes):
+                if not process.is_alive():
+                    logger.error(f"Shard {index} exited with code {process.exitcode}, restarting")
+                    self.start_worker(index)
+
+    async def poll_updates(self):
+        """Получение обновлений длинным опросом"""
+        await self.bot.delete_webhook(drop_pending_updates=True)
+        offset = None
+        while True:
+            try:
+                updates = await self.bot.get_updates(
+                    offset=offset, timeout=POLL_TIMEOUT, read_timeout=POLL_TIMEOUT + 10,
+                    allowed_updates=Update.ALL_TYPES
+                )
+            except NetworkError as e:
+                logger.warning(f"getUpdates failed: {e}")
+                await asyncio.sleep(1)
+                continue
+
+            for update in updates:
+                self.update_queue.put_nowait(update)
+                offset = update.update_id + 1
+
+    async def serve(self, webhook_url, listen, port, path, secret):
+        """Получение обновлений через webhook"""
+        await self.bot.set_webhook(
+            url=webhook_url.rstrip('/') + path,
+            secret_token=secret,
+            allowed_updates=Update.ALL_TYPES,
+            drop_pending_updates=True
+        )
+        await serve_webhook(WebhookApp(self, path=path, secret_token=secret), listen, port)
+
+    def stop_workers(self):
+        """Остановка процессов-обработчиков: пустое сообщение, затем ожидание"""
+        for queue in self.queues:
+            queue.put(None)
+        for process in self.processes:
+            process.join(SHUTDOWN_TIMEOUT)
+            if process.is_alive():
+                process.terminate()
+
+    async def run(self, webhook_url=None, listen="0.0.0.0", port=8080, path="/webhook", secret=None):
+        """Запуск кластера до остановки по сигналу"""
+        logger.info(f"✅ Starting Universal Bot cluster with {len(self.processes)} shards...")
+        for index in range(len(self.processes)):
+            self.start_worker(index)
+
+        loop = asyncio.get_running_loop()
+        main_task = asyncio.current_task()
+        loop.add_signal_handler(signal.SIGTERM, main_task.cancel)
+
+        await self.bot.initialize()
+        self.running = True
+        supervisor = asyncio.create_task(self.supervise())
+        try:
+            if webhook_url:
+                await self.serve(webhook_url, listen, port, path, secret)
+            else:
+                await self.poll_updates()
+        except (asyncio.CancelledError, KeyboardInterrupt):
+            pass
+        finally:
+            self.running = False
+            supervisor.cancel()
+            await loop.run_in_executor(None, self.stop_workers)
+            await self.bot.shutdown()
+            logger.info("🛑 Cluster stopped")
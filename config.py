@@ -1,20 +1,30 @@
-import os
-from dotenv import load_dotenv
-
-# Загружаем переменные из .env файла
-load_dotenv()
-
-# Токен бота из переменных окружения
-BOT_TOKEN = os.getenv('BOT_TOKEN')
-
-if not BOT_TOKEN:
-    raise ValueError("❌ BOT_TOKEN not found in environment variables!")
-
-# Настройки базы данных
-DATABASE_NAME = "birthdays.db"
-
-# Интервал проверки дней рождения (в секундах)
-CHECK_INTERVAL = 300  # 5 минут
-
-# Время очистки старых напоминаний (в днях)
-CLEANUP_DAYS = 3
\ No newline at end of file
+import os
+from dotenv import load_dotenv
+
+# Загружаем переменные из .env файла
+load_dotenv()
+
+# Токен бота из переменных окружения
+BOT_TOKEN = os.getenv('BOT_TOKEN')
+
+# Настройки базы данных (":memory:" - база в памяти, для бенчмарков)
+DATABASE_NAME = os.getenv('DATABASE_NAME', "birthdays.db")
+
+# Пауза перед повторной проверкой дней рождения после ошибки (в секундах)
+CHECK_INTERVAL = int(os.getenv('CHECK_INTERVAL', 300))  # 5 минут
+
+# Время очистки старых напоминаний (в днях)
+CLEANUP_DAYS = int(os.getenv('CLEANUP_DAYS', 3))
+
+# Сколько дней не писать в личку пользователю, которому сообщение не доставилось
+# (запрет снимается раньше, если он отправит боту /start)
+UNDELIVERABLE_DAYS = int(os.getenv('UNDELIVERABLE_DAYS', 30))
+
+# Резервные копии базы: каталог, период (в секундах, 0 - выключены) и сколько копий хранить
+BACKUP_DIR = os.getenv('BACKUP_DIR', "backups")
+BACKUP_INTERVAL = int(os.getenv('BACKUP_INTERVAL', 3600))  # раз в час
+BACKUP_KEEP = int(os.getenv('BACKUP_KEEP', 24))
+
+# Часовой пояс и час рассылки для чатов без своих настроек (/timezone, /delivery_hour)
+DEFAULT_TIMEZONE = os.getenv('DEFAULT_TIMEZONE', "Europe/Moscow")
+DEFAULT_DELIVERY_HOUR = int(os.getenv('DEFAULT_DELIVERY_HOUR', 9))
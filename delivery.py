@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import time
+from telegram.error import RetryAfter, NetworkError, Forbidden, BadRequest
+from metrics import SEND_LATENCY, MESSAGES_SENT, API_ERRORS, RETRY_AFTER
+
+logger = logging.getLogger(__name__)
+
+# Лимиты Bot API: ~30 сообщений в секунду на бота, ~1 в секунду в личный чат,
+# ~20 в минуту в группу
+GLOBAL_RATE = 30
+PRIVATE_CHAT_RATE = 1
+GROUP_CHAT_RATE = 20 / 60
+
+# Сколько раз повторяем отправку
+MAX_ATTEMPTS = 3
+
+
+class TokenBucket:
+    """Ведро токенов: в среднем не больше rate событий в секунду, всплеск до burst"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        """Ожидание свободного токена"""
+        while True:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                await asyncio.sleep(self.blocked_until - now)
+                continue
+
+            self._refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        """Блокировка ведра на время flood wait"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    @property
+    def idle(self):
+        """Ведро полное и не заблокировано - его можно не хранить"""
+        now = time.monotonic()
+        self._refill(now)
+        return self.tokens >= self.capacity and now >= self.blocked_until
+
+
+class DeliveryStats:
+    """Итоги рассылки"""
+
+    def __init__(self):
+        self.sent = 0
+        self.failed = 0
+        self.retry_after_hits = 0
+        self.started = time.monotonic()
+        self.elapsed = 0.0
+
+    @property
+    def throughput(self):
+        """Отправлено сообщений в секунду"""
+        return self.sent / self.elapsed if self.elapsed else 0.0
+
+    def __repr__(self):
+        return (f"DeliveryStats(sent={self.sent}, failed={self.failed}, "
+                f"retry_after={self.retry_after_hits}, {self.throughput:.1f} msg/s)")
+
+
+class DeliveryEngine:
+    """Отправка сообщений с учетом глобального лимита и лимитов на чат"""
+
+    def __init__(self, bot, global_rate=GLOBAL_RATE, max_attempts=MAX_ATTEMPTS):
+        self.bot = bot
+        self.global_bucket = TokenBucket(global_rate, burst=global_rate)
+        self.chat_buckets = {}
+        self.max_attempts = max_attempts
+
+    def _chat_bucket(self, chat_id):
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            # Отрицательные id - группы и каналы
+            rate = GROUP_CHAT_RATE if chat_id < 0 else PRIVATE_CHAT_RATE
+            bucket = self.chat_buckets[chat_id] = TokenBucket(rate)
+        return bucket
+
+    async def deliver(self, chat_id, text, stats=None, **kwargs):
+        """Отправка одного сообщения с повторами; при неудаче пробрасывает последнюю ошибку"""
+        stats = stats or DeliveryStats()
+        chat_bucket = self._chat_bucket(chat_id)
+
+        for attempt in range(1, self.max_attempts + 1):
+            await chat_bucket.acquire()
+            await self.global_bucket.acquire()
+            start = time.perf_counter()
+            try:
+                await self.bot.send_message(chat_id=chat_id, text=text, **kwargs)
+                SEND_LATENCY.observe(time.perf_counter() - start)
+                MESSAGES_SENT.inc()
+                stats.sent += 1
+                return
+            except RetryAfter as e:
+                # Flood wait действует на весь бот - притормаживаем все отправки
+                API_ERRORS.inc(type(e).__name__)
+                RETRY_AFTER.inc()
+                stats.retry_after_hits += 1
+                logger.warning(f"Flood control for chat {chat_id}, retry in {e.retry_after}s")
+                self.global_bucket.pause(e.retry_after)
+                error = e
+            except (Forbidden, BadRequest) as e:
+                # Повтор не поможет: бот заблокирован или чат недоступен
+                API_ERRORS.inc(type(e).__name__)
+                stats.failed += 1
+                raise
+            except NetworkError as e:
+                API_ERRORS.inc(type(e).__name__)
+                logger.warning(f"Network error sending to {chat_id} (attempt {attempt}): {e}")
+                await asyncio.sleep(2 ** attempt)
+                error = e
+            except Exception as e:
+                API_ERRORS.inc(type(e).__name__)
+                stats.failed += 1
+                raise
+
+        stats.failed += 1
+        raise error
+
+    def drop_idle_buckets(self):
+        """Удаление ведер неактивных чатов, чтобы словарь не рос бесконечно"""
+        for chat_id in [chat_id for chat_id, bucket in self.chat_buckets.items() if bucket.idle]:
+            del self.chat_buckets[chat_id]
@@ -1,835 +1,1299 @@
-import logging
-from datetime import datetime, timedelta
-from telegram import Update, BotCommand
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, ConversationHandler
-from dateutil.parser import parse
-import sqlite3
-import asyncio
-import threading
-import time
-import os
-
-# Настройка логирования
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
-logger = logging.getLogger(__name__)
-
-# Токен бота из переменных окружения
-BOT_TOKEN = os.getenv('BOT_TOKEN', '8581961551:AAGFlhCEzZc3k6veVoU3QTOJ41YVyTGEw6o')
-
-print("🚀 Запуск объединенного бота...")
-
-# Состояния для ConversationHandler
-SET_BIRTHDAY = 1
-
-# Данные для тегов с альтернативными написаниями
-groups_data = {
-    "команда": {
-        "members": [
-            {"username": "welIweIIweIl"},
-            {"username": "morgonmlbb"},
-            {"username": "zhukov_nes"},
-            {"username": "SHAHmirozdanie"}
-        ],
-        "aliases": ["команд", "команду"] 
-    },
-    "тренер": {
-        "members": [
-            {"username": "Dedusmlbb"},
-            {"username": "Margul95"}
-        ],
-        "aliases": ["тренера", "тренеры", "тренеров"]
-    },
-    "начальник": {
-        "members": [
-            {"username": "rickreygan"},
-            {"username": "qqueasiness"}
-        ],
-        "aliases": ["начальники", "начальников", "начальству"]
-    },
-    "аналитик": {
-        "members": [
-            {"username": "KeepOnDaaancing"},
-        ],
-        "aliases": ["аналитики", "аналитиков", "аналитикам"]
-    },
-    "менеджер": {
-        "members": [
-            {"username": "PredatoryIrbis"},
-        ],
-        "aliases": ["менеджеры", "менеджеров", "менеджерам"]
-    },
-    "психолог": {
-        "members": [
-            {"username": "Rygen_ml"},
-        ],
-        "aliases": ["психологи", "психологов", "психологам"]
-    },
-    "смм": {
-        "members": [
-            {"username": "KystVDele"},
-            {"username": "HanjiS_live"},
-        ],
-        "aliases": ["смим", "смима", "сммам"]
-    },
-    "хуёжник": {
-        "members": [
-            {"username": "TaiBurs"},
-        ],
-        "aliases": ["хуежник", "хуёжники", "хуежники", "хуёжников", "хуежников"]
-    },
-    "стафф": {
-        "members": [
-            {"username": "rickreygan"},
-            {"username": "Margul95"},
-            {"username": "qqueasiness"},
-            {"username": "TaiBurs"},
-            {"username": "PredatoryIrbis"},
-            {"username": "KeepOnDaaancing"},
-            {"username": "KystVDele"},
-            {"username": "Dedusmlbb"},
-            {"username": "Rygen_ml"}
-        ],
-        "aliases": ["стаф", "стафу", "стафом", "штаб", "штабу", "штабом"]
-    }
-}
-
-# Словарь для быстрого поиска группы по любому из имен
-group_mapping = {}
-for group_name, group_info in groups_data.items():
-    # Основное имя
-    group_mapping[group_name] = group_name
-    # Альтернативные имена
-    for alias in group_info["aliases"]:
-        group_mapping[alias] = group_name
-
-
-class Database:
-    def __init__(self, db_name='birthdays.db'):
-        self.db_name = db_name
-        self.init_db()
-
-    def init_db(self):
-        """Инициализация базы данных"""
-        conn = sqlite3.connect(self.db_name, check_same_thread=False)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS birthdays (
-                user_id INTEGER,
-                chat_id INTEGER,
-                birthday_date TEXT,
-                username TEXT,
-                first_name TEXT,
-                last_name TEXT,
-                PRIMARY KEY (user_id, chat_id)
-            )
-        ''')
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS sent_reminders (
-                user_id INTEGER,
-                chat_id INTEGER,
-                reminder_date TEXT,
-                reminder_type TEXT,
-                PRIMARY KEY (user_id, chat_id, reminder_date, reminder_type)
-            )
-        ''')
-
-        conn.commit()
-        conn.close()
-        print("✅ База данных инициализирована")
-
-    def add_birthday(self, user_id, chat_id, birthday_date, username, first_name, last_name):
-        """Добавление дня рождения"""
-        conn = sqlite3.connect(self.db_name, check_same_thread=False)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            INSERT OR REPLACE INTO birthdays (user_id, chat_id, birthday_date, username, first_name, last_name)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (user_id, chat_id, birthday_date, username, first_name, last_name))
-
-        conn.commit()
-        conn.close()
-
-    def get_chat_birthdays(self, chat_id):
-        """Получение дней рождения для конкретного чата"""
-        conn = sqlite3.connect(self.db_name, check_same_thread=False)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT user_id, chat_id, birthday_date, username, first_name, last_name 
-            FROM birthdays 
-            WHERE chat_id = ?
-        ''', (chat_id,))
-        birthdays = cursor.fetchall()
-
-        conn.close()
-        return birthdays
-
-    def get_chat_members(self, chat_id):
-        """Получение всех участников чата"""
-        conn = sqlite3.connect(self.db_name, check_same_thread=False)
-        cursor = conn.cursor()
-
-        cursor.execute('SELECT DISTINCT user_id FROM birthdays WHERE chat_id = ?', (chat_id,))
-        members = cursor.fetchall()
-
-        conn.close()
-        return [member[0] for member in members]
-
-    def get_user_birthday(self, user_id, chat_id):
-        """Получение дня рождения конкретного пользователя"""
-        conn = sqlite3.connect(self.db_name, check_same_thread=False)
-        cursor = conn.cursor()
-
-        cursor.execute('SELECT * FROM birthdays WHERE user_id = ? AND chat_id = ?', (user_id, chat_id))
-        birthday = cursor.fetchone()
-
-        conn.close()
-        return birthday
-
-    def get_tomorrow_birthdays(self):
-        """Получение дней рождения на завтра"""
-        conn = sqlite3.connect(self.db_name, check_same_thread=False)
-        cursor = conn.cursor()
-
-        tomorrow = (datetime.now() + timedelta(days=1))
-        tomorrow_month_day = tomorrow.strftime("%m-%d")
-
-        cursor.execute('''
-            SELECT user_id, chat_id, birthday_date, username, first_name, last_name 
-            FROM birthdays 
-            WHERE substr(birthday_date, 6, 5) = ?
-        ''', (tomorrow_month_day,))
-        birthdays = cursor.fetchall()
-
-        conn.close()
-        return birthdays
-
-    def get_today_birthdays(self):
-        """Получение дней рождения на сегодня"""
-        conn = sqlite3.connect(self.db_name, check_same_thread=False)
-        cursor = conn.cursor()
-
-        today = datetime.now()
-        today_month_day = today.strftime("%m-%d")
-
-        cursor.execute('''
-            SELECT user_id, chat_id, birthday_date, username, first_name, last_name 
-            FROM birthdays 
-            WHERE substr(birthday_date, 6, 5) = ?
-        ''', (today_month_day,))
-        birthdays = cursor.fetchall()
-
-        conn.close()
-        return birthdays
-
-    def add_sent_reminder(self, user_id, chat_id, reminder_date, reminder_type):
-        """Добавление записи об отправленном напоминании"""
-        conn = sqlite3.connect(self.db_name, check_same_thread=False)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            INSERT OR REPLACE INTO sent_reminders (user_id, chat_id, reminder_date, reminder_type)
-            VALUES (?, ?, ?, ?)
-        ''', (user_id, chat_id, reminder_date, reminder_type))
-
-        conn.commit()
-        conn.close()
-
-    def is_reminder_sent(self, user_id, chat_id, reminder_date, reminder_type):
-        """Проверка, было ли уже отправлено напоминание"""
-        conn = sqlite3.connect(self.db_name, check_same_thread=False)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT 1 FROM sent_reminders 
-            WHERE user_id = ? AND chat_id = ? AND reminder_date = ? AND reminder_type = ?
-        ''', (user_id, chat_id, reminder_date, reminder_type))
-
-        result = cursor.fetchone()
-        conn.close()
-
-        return result is not None
-
-    def cleanup_old_reminders(self):
-        """Очистка старых напоминаний"""
-        conn = sqlite3.connect(self.db_name, check_same_thread=False)
-        cursor = conn.cursor()
-
-        three_days_ago = (datetime.now() - timedelta(days=3)).strftime("%Y-%m-%d")
-
-        cursor.execute('''
-            DELETE FROM sent_reminders 
-            WHERE reminder_date < ?
-        ''', (three_days_ago,))
-
-        conn.commit()
-        conn.close()
-
-
-# Инициализация базы данных
-db = Database()
-
-
-class UniversalBot:
-    def __init__(self, token):
-        self.token = token
-        self.application = Application.builder().token(token).build()
-        self.setup_handlers()
-
-    def setup_handlers(self):
-        """Настройка обработчиков команд"""
-        # Обработчик для установки дня рождения с состоянием
-        set_birthday_handler = ConversationHandler(
-            entry_points=[CommandHandler("set_birthday", self.set_birthday_command)],
-            states={
-                SET_BIRTHDAY: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.process_birthday_date)]
-            },
-            fallbacks=[CommandHandler("cancel", self.cancel_birthday_input)]
-        )
-
-        # Команды дней рождения
-        self.application.add_handler(set_birthday_handler)
-        self.application.add_handler(CommandHandler("start", self.start_command))
-        self.application.add_handler(CommandHandler("my_birthday", self.my_birthday_command))
-        self.application.add_handler(CommandHandler("birthdays", self.birthdays_command))
-
-        # Команды тегов
-        self.application.add_handler(CommandHandler("groups", self.groups_command))
-        self.application.add_handler(CommandHandler("tags", self.tags_command))
-
-        # Общие команды
-        self.application.add_handler(CommandHandler("help", self.help_command))
-        self.application.add_handler(CommandHandler("cancel", self.cancel_command))
-
-        # Обработчик сообщений для тегов - ИСПРАВЛЕННЫЙ
-        self.application.add_handler(MessageHandler(
-            filters.TEXT & ~filters.COMMAND,
-            self.handle_message
-        ))
-
-    async def setup_commands(self, application):
-        """Настройка подсказок команд"""
-        commands = [
-            ("start", "Начать работу с ботом"),
-            ("set_birthday", "Установить день рождения"),
-            ("my_birthday", "Посмотреть свою дату рождения"),
-            ("birthdays", "Список дней рождения в группе"),
-            ("groups", "Показать состав групп для тегов"),
-            ("tags", "Список доступных тегов"),
-            ("help", "Показать справку по командам"),
-            ("cancel", "Отменить текущее действие")
-        ]
-        await application.bot.set_my_commands(commands)
-        logger.info("✅ Bot commands setup completed")
-
-    async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Обработчик команды /start"""
-        user = update.effective_user
-        chat_type = update.effective_chat.type
-
-        if chat_type == "private":
-            await update.message.reply_text(
-                "🎉🤖 <b>Универсальный бот - Дни рождения и Теги!</b>\n\n"
-                "Я совмещаю две функции:\n\n"
-                "🎂 <b>Дни рождения:</b>\n"
-                "• Напоминания о ДР участников\n"
-                "• Поздравления в группе\n"
-                "• Список всех дней рождения\n\n"
-                "🏷️ <b>Теги:</b>\n"
-                "• Быстрое упоминание групп\n"
-                "• @команда, @тренер, @стафф и др.\n"
-                "• Поддерживает разные написания: @стафф, @стаф, @штаб\n\n"
-                "📌 <b>Добавьте меня в группу</b> для полного функционала!\n\n"
-                "📋 Команды: /help",
-                parse_mode='HTML'
-            )
-        else:
-            await update.message.reply_text(
-                "🎉🤖 <b>Универсальный бот активирован!</b>\n\n"
-                "Теперь я буду:\n\n"
-                "🎂 <b>Следить за днями рождения:</b>\n"
-                "• Напоминать за день до ДР\n"
-                "• Поздравлять именинников\n"
-                "• Хранить список ДР\n\n"
-                "🏷️ <b>Упоминать группы:</b>\n"
-                "• @команда - упомянуть команду (также @команд, @команду)\n"
-                "• @тренер - упомянуть тренеров (также @тренера, @тренеры)\n"
-                "• @стафф - упомянуть стафф (также @стаф, @штаб)\n"
-                "• И другие теги с альтернативными написаниями\n\n"
-                "📋 <b>Основные команды:</b>\n"
-                "/set_birthday - установить ДР\n"
-                "/birthdays - список ДР\n"
-                "/groups - состав групп\n"
-                "/tags - доступные теги\n"
-                "/help - помощь",
-                parse_mode='HTML'
-            )
-
-    # === КОМАНДЫ ДНЕЙ РОЖДЕНИЯ ===
-
-    async def set_birthday_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Установка дня рождения"""
-        chat_type = update.effective_chat.type
-
-        if chat_type == "private":
-            await update.message.reply_text("❌ Эту команду нужно использовать в группе!")
-            return ConversationHandler.END
-
-        await update.message.reply_text(
-            "📅 <b>Установка дня рождения</b>\n\n"
-            "Введите дату в формате: <code>ДД.ММ.ГГГГ</code>\n\n"
-            "📝 <b>Примеры:</b>\n"
-            "• 15.05.1990\n"
-            "• 03.12.1985\n"
-            "• 25.01.2000\n"
-            "• 29.11.00\n"
-            "• 15.05 (текущий год)\n\n"
-            "❌ <b>Отмена:</b> /cancel",
-            parse_mode='HTML'
-        )
-        return SET_BIRTHDAY
-
-    async def process_birthday_date(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Обработка введенной даты рождения"""
-        date_str = update.message.text.strip()
-
-        try:
-            date_str = date_str.replace('/', '.').replace('-', '.')
-
-            formats_to_try = ['%d.%m.%Y', '%d.%m.%y', '%d.%m']
-            parsed_date = None
-
-            for fmt in formats_to_try:
-                try:
-                    parsed_date = datetime.strptime(date_str, fmt)
-                    break
-                except ValueError:
-                    continue
-
-            if parsed_date is None:
-                try:
-                    parsed_date = parse(date_str, dayfirst=True)
-                except:
-                    raise ValueError("Не удалось распознать дату")
-
-            # Если введена дата без года, используем текущий год
-            if len(date_str.split('.')) == 2:
-                birthday_date = parsed_date.replace(year=datetime.now().year).date()
-            else:
-                birthday_date = parsed_date.date()
-
-            if birthday_date > datetime.now().date():
-                await update.message.reply_text("❌ Дата рождения не может быть в будущем!")
-                return SET_BIRTHDAY
-
-            user = update.effective_user
-            chat = update.effective_chat
-            birthday_str = birthday_date.strftime("%Y-%m-%d")
-
-            db.add_birthday(
-                user_id=user.id,
-                chat_id=chat.id,
-                birthday_date=birthday_str,
-                username=user.username or "",
-                first_name=user.first_name or "",
-                last_name=user.last_name or ""
-            )
-
-            await update.message.reply_text(
-                f"✅ <b>Отлично, {user.first_name}!</b>\n\n"
-                f"🎂 Ваш день рождения установлен на <b>{birthday_date.strftime('%d.%m.%Y')}</b>\n\n"
-                f"📢 Теперь участники будут получать напоминания о вашем ДР!",
-                parse_mode='HTML'
-            )
-
-            return ConversationHandler.END
-
-        except ValueError:
-            await update.message.reply_text(
-                "❌ <b>Неверный формат даты!</b>\n\n"
-                "Пожалуйста, введите дату в формате: <code>ДД.ММ.ГГГГ</code>\n\n"
-                "✅ <b>Примеры:</b>\n"
-                "• 15.05.1990\n"
-                "• 03.12.1985\n"
-                "• 25.01.2000\n\n"
-                "❌ <b>Отмена:</b> /cancel",
-                parse_mode='HTML'
-            )
-            return SET_BIRTHDAY
-        except Exception as e:
-            logger.error(f"Error setting birthday: {e}")
-            await update.message.reply_text("❌ Произошла ошибка при сохранении даты.")
-            return ConversationHandler.END
-
-    async def cancel_birthday_input(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Отмена ввода дня рождения"""
-        await update.message.reply_text("❌ Ввод дня рождения отменен.")
-        return ConversationHandler.END
-
-    async def cancel_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Обработчик команды /cancel"""
-        await update.message.reply_text("ℹ️ Нет активных действий для отмены.")
-
-    async def my_birthday_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Показать установленный день рождения"""
-        user = update.effective_user
-        chat = update.effective_chat
-
-        birthday = db.get_user_birthday(user.id, chat.id)
-
-        if birthday:
-            birthday_date = datetime.strptime(birthday[2], "%Y-%m-%d").strftime("%d.%m.%Y")
-            await update.message.reply_text(
-                f"🎂 <b>Ваш день рождения:</b>\n"
-                f"📅 {birthday_date}\n\n"
-                f"✏️ Изменить: /set_birthday",
-                parse_mode='HTML'
-            )
-        else:
-            await update.message.reply_text(
-                "❌ <b>У вас не установлен день рождения</b>\n\n"
-                "📅 Установите его:\n"
-                "/set_birthday",
-                parse_mode='HTML'
-            )
-
-    async def birthdays_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Показать все дни рождения в группе"""
-        chat = update.effective_chat
-
-        if chat.type == "private":
-            await update.message.reply_text("❌ Эту команду нужно использовать в группе!")
-            return
-
-        birthdays = db.get_chat_birthdays(chat.id)
-
-        if not birthdays:
-            await update.message.reply_text(
-                "📅 <b>В этой группе пока нет установленных дней рождения</b>\n\n"
-                "Станьте первым!\n"
-                "/set_birthday",
-                parse_mode='HTML'
-            )
-            return
-
-        birthdays_sorted = sorted(birthdays, key=lambda x: x[2][5:])
-        message = "🎉 <b>Дни рождения участников:</b>\n\n"
-
-        for i, bday in enumerate(birthdays_sorted, 1):
-            user_id, chat_id, birthday_date, username, first_name, last_name = bday
-            display_name = first_name
-            if last_name:
-                display_name += f" {last_name}"
-            elif username:
-                display_name += f" (@{username})"
-
-            date_obj = datetime.strptime(birthday_date, "%Y-%m-%d")
-            formatted_date = date_obj.strftime("%d.%m.%Y")
-
-            message += f"{i}. {display_name} - {formatted_date}\n"
-
-        message += f"\n📊 Всего: {len(birthdays)} человек(а)"
-        await update.message.reply_text(message, parse_mode='HTML')
-
-    # === КОМАНДЫ ТЕГОВ ===
-
-    async def groups_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Показать состав групп"""
-        groups_text = "👥 <b>Состав групп:</b>\n\n"
-        for group_name, group_info in groups_data.items():
-            groups_text += f"<b>{group_name.upper()}:</b>\n"
-            members = group_info["members"]
-            for i, member in enumerate(members, 1):
-                groups_text += f"{i}. @{member['username']}\n"
-
-            # Показываем альтернативные написания
-            if group_info.get("aliases"):
-                aliases = group_info["aliases"]
-                groups_text += f"   🔄 Также: "
-                groups_text += ", ".join([f"@{alias}" for alias in aliases[:3]])
-                if len(aliases) > 3:
-                    groups_text += f" и ещё {len(aliases) - 3}"
-                groups_text += "\n"
-
-            groups_text += "\n"
-
-        groups_text += "💡 <b>Использование:</b> Напишите в чате @название_группы\n"
-        groups_text += "Примеры: @стафф, @стаф, @штаб (все ведут к одной группе)"
-        await update.message.reply_text(groups_text, parse_mode='HTML')
-
-    async def tags_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Показать доступные теги"""
-        tags_text = "🏷️ <b>Доступные теги:</b>\n\n"
-        tags_text += "<b>Основные названия:</b>\n"
-        for group_name in groups_data.keys():
-            tags_text += f"• @{group_name}\n"
-
-        tags_text += "\n<b>Альтернативные написания:</b>\n"
-        for group_name, group_info in groups_data.items():
-            if group_info.get("aliases"):
-                aliases = group_info["aliases"]
-                if aliases:
-                    tags_text += f"• @{group_name} → также: "
-                    tags_text += ", ".join([f"@{alias}" for alias in aliases[:3]])
-                    if len(aliases) > 3:
-                        tags_text += f" и ещё {len(aliases) - 3}"
-                    tags_text += "\n"
-
-        tags_text += "\n🤖 <b>Примеры использования:</b>\n"
-        tags_text += "• @стафф, @стаф, @штаб - упоминают стафф\n"
-        tags_text += "• @тренер, @тренера, @тренеры - упоминают тренеров\n"
-        tags_text += "• @хуёжник, @хуежник - упоминают хуёжника\n\n"
-        tags_text += "💡 <b>Просто напишите в чате нужный тег!</b>"
-        await update.message.reply_text(tags_text, parse_mode='HTML')
-
-    def find_group_by_tag(self, tag: str) -> str:
-        """Найти группу по тегу (основному или альтернативному)"""
-        # Убираем символ @ если он есть
-        tag_clean = tag.lower().lstrip('@')
-
-        # Прямой поиск в маппинге
-        if tag_clean in group_mapping:
-            return group_mapping[tag_clean]
-
-        # Поиск с окончаниями (для русских слов)
-        possible_endings = ["", "а", "у", "ов", "ам", "ами", "ах", "и", "ы"]
-        for ending in possible_endings:
-            test_tag = tag_clean
-            if not test_tag.endswith(ending):
-                test_tag = tag_clean + ending
-            if test_tag in group_mapping:
-                return group_mapping[test_tag]
-
-        return None
-
-    def create_group_mention(self, group_name: str) -> str:
-        """Создание упоминания группы"""
-        if group_name not in groups_data:
-            return ""
-        members = groups_data[group_name]["members"]
-        mentions = [f"@{member['username']}" for member in members if member['username']]
-        return " ".join(mentions)
-
-    async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Обработка сообщений с мгновенными тегами"""
-        if update.message and update.message.text:
-            message_text = update.message.text
-
-            # Разбиваем сообщение на слова и проверяем каждое слово
-            words = message_text.split()
-            for word in words:
-                # Проверяем, начинается ли слово с @
-                if word.startswith('@'):
-                    # Ищем группу по тегу
-                    group_name = self.find_group_by_tag(word)
-
-                    if group_name:
-                        mention_text = self.create_group_mention(group_name)
-                        if mention_text:
-                            response_text = f"🏷️ <b>Тег группы:</b> {group_name}\n\n{mention_text}"
-
-                            try:
-                                await update.message.reply_text(
-                                    response_text,
-                                    reply_to_message_id=update.message.message_id,
-                                    parse_mode='HTML'
-                                )
-                            except Exception as e:
-                                logger.error(f"Error sending mention with HTML: {e}")
-                                # Если не сработало с HTML, пробуем без него
-                                try:
-                                    response_text = f"🏷️ Тег группы: {group_name}\n\n{mention_text}"
-                                    await update.message.reply_text(
-                                        response_text,
-                                        reply_to_message_id=update.message.message_id
-                                    )
-                                except Exception as e2:
-                                    logger.error(f"Error sending mention without HTML: {e2}")
-
-                        # Прерываем после первого найденного тега
-                        break
-
-    async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Справка по командам"""
-        await update.message.reply_text(
-            "📋 <b>Универсальный бот - Справка</b>\n\n"
-            "🎂 <b>Дни рождения:</b>\n"
-            "/set_birthday - Установить день рождения\n"
-            "/my_birthday - Посмотреть свою дату\n"
-            "/birthdays - Список всех ДР в группе\n\n"
-            "🏷️ <b>Теги:</b>\n"
-            "/groups - Показать состав групп\n"
-            "/tags - Список доступных тегов\n\n"
-            "💡 <b>Автоматические теги:</b>\n"
-            "Просто напишите:\n"
-            "• @команда, @команд, @команду\n"
-            "• @тренер, @тренера, @тренеры\n"
-            "• @стафф, @стаф, @штаб\n"
-            "• @хуёжник или @хуежник\n"
-            "• @начальник, @начальники\n"
-            "• И другие теги с альтернативными написаниями\n\n"
-            "⏰ <b>Автоматика:</b>\n"
-            "• Напоминания о ДР за 1 день\n"
-            "• Поздравления в день рождения\n"
-            "• Проверка каждые 5 минут\n\n"
-            "❌ <b>Отмена действий:</b> /cancel",
-            parse_mode='HTML'
-        )
-
-    # === СИСТЕМА НАПОМИНАНИЙ ===
-
-    async def check_birthdays(self):
-        """Проверка дней рождения и отправка уведомлений"""
-        try:
-            now = datetime.now()
-            today_str = now.strftime("%Y-%m-%d")
-            tomorrow_str = (now + timedelta(days=1)).strftime("%Y-%m-%d")
-
-            # Напоминания на завтра
-            tomorrow_birthdays = db.get_tomorrow_birthdays()
-            for birthday in tomorrow_birthdays:
-                user_id, chat_id, birthday_date, username, first_name, last_name = birthday
-
-                if not db.is_reminder_sent(user_id, chat_id, today_str, "reminder"):
-                    chat_members = db.get_chat_members(chat_id)
-
-                    bday_date = datetime.strptime(birthday_date, "%Y-%m-%d")
-                    formatted_date = bday_date.strftime("%d.%m.%Y")
-                    display_name = first_name
-                    if last_name:
-                        display_name += f" {last_name}"
-
-                    reminder_sent = False
-                    for member_id in chat_members:
-                        if member_id != user_id:
-                            try:
-                                await self.send_reminder_to_user(
-                                    member_id, display_name, formatted_date, chat_id
-                                )
-                                reminder_sent = True
-                                await asyncio.sleep(0.1)
-                            except Exception as e:
-                                logger.error(f"Failed to send reminder: {e}")
-
-                    if reminder_sent:
-                        db.add_sent_reminder(user_id, chat_id, today_str, "reminder")
-
-            # Поздравления на сегодня
-            today_birthdays = db.get_today_birthdays()
-            for birthday in today_birthdays:
-                user_id, chat_id, birthday_date, username, first_name, last_name = birthday
-
-                if not db.is_reminder_sent(user_id, chat_id, today_str, "congrats"):
-                    birth_year = datetime.strptime(birthday_date, "%Y-%m-%d").year
-                    current_year = datetime.now().year
-                    age = current_year - birth_year
-
-                    display_name = first_name
-                    if last_name:
-                        display_name += f" {last_name}"
-
-                    try:
-                        await self.send_birthday_congrats(chat_id, display_name, age)
-                        db.add_sent_reminder(user_id, chat_id, today_str, "congrats")
-                    except Exception as e:
-                        logger.error(f"Failed to send congrats: {e}")
-
-            # Очистка старых напоминаний
-            if now.hour == 0 and now.minute < 5:
-                db.cleanup_old_reminders()
-
-        except Exception as e:
-            logger.error(f"Error in check_birthdays: {e}")
-
-    async def send_reminder_to_user(self, user_id, birthday_person, birthday_date, chat_id):
-        """Отправка напоминания в ЛС"""
-        try:
-            message = (
-                f"🎉 <b>Напоминание о дне рождения!</b> 🎉\n\n"
-                f"Завтра, {birthday_date}, празднует день рождения:\n"
-                f"🎂 <b>{birthday_person}</b>\n\n"
-                f"Не забудьте поздравить в группе! 🎊"
-            )
-            await self.application.bot.send_message(
-                chat_id=user_id,
-                text=message,
-                parse_mode='HTML'
-            )
-        except Exception as e:
-            logger.error(f"Failed to send reminder to user {user_id}: {e}")
-
-    async def send_birthday_congrats(self, chat_id, birthday_person, age):
-        """Отправка поздравления в группу"""
-        try:
-            age_text = f"{age}-летием" if age > 1 else f"{age}-летием"
-            message = (
-                f"🎂🎉 <b>С ДНЕМ РОЖДЕНИЯ!</b> 🎉🎂\n\n"
-                f"Поздравляем <b>{birthday_person}</b> с {age_text}! 🎊\n\n"
-                f"💫 Желаем счастья, здоровья, успехов\n"
-                f"✨ И всего самого наилучшего! 🎁\n\n"
-                f"Присоединяйтесь к поздравлениям! 🎈"
-            )
-            await self.application.bot.send_message(
-                chat_id=chat_id,
-                text=message,
-                parse_mode='HTML'
-            )
-        except Exception as e:
-            logger.error(f"Failed to send congrats in group {chat_id}: {e}")
-            raise
-
-    def start_scheduler(self):
-        """Запуск планировщика"""
-
-        def scheduler_loop():
-            time.sleep(10)
-
-            while True:
-                try:
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    loop.run_until_complete(self.check_birthdays())
-                    loop.close()
-                    time.sleep(300)  # 5 минут
-                except Exception as e:
-                    logger.error(f"Scheduler error: {e}")
-                    time.sleep(300)
-
-        scheduler_thread = threading.Thread(target=scheduler_loop, daemon=True)
-        scheduler_thread.start()
-        logger.info("✅ Scheduler started")
-
-    async def post_init(self, application):
-        """Выполняется после инициализации бота"""
-        await self.setup_commands(application)
-        logger.info("🚀 Universal Bot is ready and running!")
-
-    def run(self):
-        """Запуск бота"""
-        self.application.post_init = self.post_init
-        self.start_scheduler()
-        logger.info("✅ Starting Universal Bot...")
-        self.application.run_polling(
-            allowed_updates=Update.ALL_TYPES,
-            drop_pending_updates=True
-        )
-
-
-def main():
-    """Основная функция запуска"""
-    bot = UniversalBot(BOT_TOKEN)
-    bot.run()
-
-
-if __name__ == '__main__':
-
-    main()
-
-
-
+import logging
+from datetime import datetime, timedelta
+from telegram import Update, BotCommand, ChatMember, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
+from telegram.ext import (
+    Application, CommandHandler, MessageHandler, CallbackQueryHandler, ChatMemberHandler, filters, ContextTypes,
+    ConversationHandler,
+)
+from config import DATABASE_NAME, CHECK_INTERVAL, CLEANUP_DAYS, UNDELIVERABLE_DAYS, BACKUP_DIR, BACKUP_INTERVAL, BACKUP_KEEP
+from storage import Database, AsyncDatabase, month_day_key, celebrated_month_days
+from delivery import DeliveryEngine
+from outbox import Outbox
+from tags import TagRegistry, TagCoalescer, TAG_COALESCE_WINDOW, is_valid_tag_name, is_valid_username
+from roster import ChatRoster
+from birthday_files import (
+    import_birthdays, export_to_file, open_text, ImportFileError, MAX_IMPORT_SIZE, MAX_REPORTED_ERRORS
+)
+from birthdays import (
+    BirthdayPages, PAGE_CALLBACK, parse_page_callback, parse_birthday_date, FutureDateError, celebration_window, render_upcoming, render_month,
+    UPCOMING_DAYS, MAX_UPCOMING_DAYS, LIST_LIMIT,
+)
+from webhook import WebhookApp, serve_webhook
+from cluster import Cluster
+from update_processor import ChatOrderedUpdateProcessor
+from timezones import parse_timezone, chat_zone, delivery_hour, local_today, delivery_passed, next_delivery, run_after_change
+import metrics
+from metrics import timed, serve_metrics, HANDLER_LATENCY, SCHEDULER_TICK
+import asyncio
+import html
+import os
+import socket
+import tempfile
+import time
+from contextlib import asynccontextmanager
+
+# Настройка логирования
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+# Токен бота из переменных окружения
+BOT_TOKEN = os.getenv('BOT_TOKEN', '8581961551:AAGFlhCEzZc3k6veVoU3QTOJ41YVyTGEw6o')
+
+# Адрес Bot API (свой сервер Bot API или имитация для нагрузочных тестов)
+BOT_API_URL = os.getenv('BOT_API_URL')
+
+# Режим webhook включается, если задан публичный адрес; иначе используется long polling
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', os.getenv('PORT', '8080')))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')
+
+# Метрики Prometheus на локальном HTTP-порту; без METRICS_PORT метрики выключены
+METRICS_PORT = int(os.getenv('METRICS_PORT')) if os.getenv('METRICS_PORT') else None
+METRICS_LISTEN = os.getenv('METRICS_LISTEN', '127.0.0.1')
+metrics.registry.enabled = METRICS_PORT is not None
+
+# Количество процессов-обработчиков; больше 1 - обновления распределяются по chat_id
+CLUSTER_WORKERS = int(os.getenv('CLUSTER_WORKERS', '1'))
+
+# Сколько обновлений обрабатывается одновременно (разные чаты параллельно, один чат - по порядку)
+UPDATE_CONCURRENCY = int(os.getenv('UPDATE_CONCURRENCY', '16'))
+
+# Окно (секунд) после ответа на тег, за которое повторные упоминания тега в чате
+# собираются в один ответ; 0 - отвечать на каждое
+TAG_REPLY_WINDOW = float(os.getenv('TAG_REPLY_WINDOW', TAG_COALESCE_WINDOW))
+
+print("🚀 Запуск объединенного бота...")
+
+# Состояния для ConversationHandler
+SET_BIRTHDAY = 1
+
+# Планировщик: имя задачи проверки и пауза перед повтором после неудачной отправки
+BIRTHDAY_CHECK_JOB = "birthday_check"
+BACKUP_JOB = "database_backup"
+RETRY_INTERVAL = timedelta(seconds=CHECK_INTERVAL)
+# Наибольшая пауза между проверками: новые чаты и просьбы из других процессов
+# подхватываются не позже, чем через нее
+MAX_CHECK_DELAY = timedelta(hours=1)
+
+# Сколько участников упоминать в одном напоминании в группе (для тех, кому не написать в личку)
+MAX_GROUP_MENTIONS = 50
+
+# Выбор лидера: планировщик и outbox работают только в процессе, держащем аренду
+SCHEDULER_LEASE = "scheduler"
+LEADERSHIP_JOB = "scheduler_leadership"
+LEASE_TTL = 60
+LEASE_RENEW_INTERVAL = 20
+
+# Данные для тегов с альтернативными написаниями
+groups_data = {
+    "команда": {
+        "members": [
+            {"username": "welIweIIweIl"},
+            {"username": "morgonmlbb"},
+            {"username": "zhukov_nes"},
+            {"username": "SHAHmirozdanie"}
+        ],
+        "aliases": ["команд", "команду"] 
+    },
+    "тренер": {
+        "members": [
+            {"username": "Dedusmlbb"},
+            {"username": "Margul95"}
+        ],
+        "aliases": ["тренера", "тренеры", "тренеров"]
+    },
+    "начальник": {
+        "members": [
+            {"username": "rickreygan"},
+            {"username": "qqueasiness"}
+        ],
+        "aliases": ["начальники", "начальников", "начальству"]
+    },
+    "аналитик": {
+        "members": [
+            {"username": "KeepOnDaaancing"},
+        ],
+        "aliases": ["аналитики", "аналитиков", "аналитикам"]
+    },
+    "менеджер": {
+        "members": [
+            {"username": "PredatoryIrbis"},
+        ],
+        "aliases": ["менеджеры", "менеджеров", "менеджерам"]
+    },
+    "психолог": {
+        "members": [
+            {"username": "Rygen_ml"},
+        ],
+        "aliases": ["психологи", "психологов", "психологам"]
+    },
+    "смм": {
+        "members": [
+            {"username": "KystVDele"},
+            {"username": "HanjiS_live"},
+        ],
+        "aliases": ["смим", "смима", "сммам"]
+    },
+    "хуёжник": {
+        "members": [
+            {"username": "TaiBurs"},
+        ],
+        "aliases": ["хуежник", "хуёжники", "хуежники", "хуёжников", "хуежников"]
+    },
+    "стафф": {
+        "members": [
+            {"username": "rickreygan"},
+            {"username": "Margul95"},
+            {"username": "qqueasiness"},
+            {"username": "TaiBurs"},
+            {"username": "PredatoryIrbis"},
+            {"username": "KeepOnDaaancing"},
+            {"username": "KystVDele"},
+            {"username": "Dedusmlbb"},
+            {"username": "Rygen_ml"}
+        ],
+        "aliases": ["стаф", "стафу", "стафом", "штаб", "штабу", "штабом"]
+    }
+}
+
+
+
+def group_reminders_by_recipient(reminders):
+    """Группировка завтрашних ДР по получателям.
+
+    reminders - список (строка birthdays, участники чата для уведомления).
+    Возвращает {получатель: {user_id именинника: (имя, дата ДД.ММ.ГГГГ)}};
+    именинник, записанный в нескольких общих чатах, попадает в список один раз.
+    """
+    digests = {}
+    for birthday, chat_members in reminders:
+        user_id, chat_id, birthday_date, username, first_name, last_name = birthday
+        display_name = first_name
+        if last_name:
+            display_name += f" {last_name}"
+        formatted_date = datetime.strptime(birthday_date, "%Y-%m-%d").strftime("%d.%m.%Y")
+
+        for member_id in chat_members:
+            digests.setdefault(member_id, {}).setdefault(user_id, (display_name, formatted_date))
+
+    return digests
+
+
+# Инициализация базы данных: все запросы выполняются вне цикла событий
+db = AsyncDatabase(Database(DATABASE_NAME))
+
+# Индексы тегов по чатам: свои группы чата из базы или стандартный набор groups_data
+tag_registry = TagRegistry(db.get_tag_groups, groups_data)
+
+# Состав чатов: пополняется из сообщений и ChatMember-обновлений, пишется в базу пачками
+chat_roster = ChatRoster(db)
+
+# Страницы /birthdays по чатам: читаются по индексу и живут до изменения ДР в чате
+birthday_pages = BirthdayPages(db.get_chat_birthdays_page, db.count_chat_birthdays)
+
+
+def page_keyboard(page):
+    """Кнопки листания страницы /birthdays"""
+    buttons = []
+    if page.prev_data:
+        buttons.append(InlineKeyboardButton("◀️ Назад", callback_data=page.prev_data))
+    if page.next_data:
+        buttons.append(InlineKeyboardButton("Вперёд ▶️", callback_data=page.next_data))
+    return InlineKeyboardMarkup([buttons]) if buttons else None
+
+
+def parse_tag_names(args):
+    """Аргументы команды настройки тегов без ведущих @"""
+    return [arg.lstrip('@') for arg in args if arg.lstrip('@')]
+
+
+class UniversalBot:
+    def __init__(self, token, instance_id=None, updater=True, metrics_port=METRICS_PORT, concurrency=UPDATE_CONCURRENCY):
+        self.token = token
+        builder = (
+            Application.builder().token(token)
+            .concurrent_updates(ChatOrderedUpdateProcessor(concurrency))
+            .post_init(self.post_init).post_stop(self.post_stop).post_shutdown(self.post_shutdown)
+        )
+        if BOT_API_URL:
+            builder = builder.base_url(BOT_API_URL)
+        if not updater:
+            # Процесс кластера получает обновления от главного процесса, а не из Telegram
+            builder = builder.updater(None)
+        self.application = builder.build()
+        self.instance_id = instance_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.is_leader = False
+        self.metrics_port = metrics_port
+        self.metrics_server = None
+        self.delivery = DeliveryEngine(self.application.bot)
+        self.outbox = Outbox(db, self.delivery, undeliverable_ttl=UNDELIVERABLE_DAYS * 86400)
+        self.tag_replies = TagCoalescer(self.send_tag_reply, TAG_REPLY_WINDOW)
+        self.setup_handlers()
+
+    def measured(self, callback):
+        """Обработчик с замером времени выполнения (если метрики включены)"""
+        return timed(HANDLER_LATENCY, callback.__name__.removesuffix("_command"))(callback)
+
+    def setup_handlers(self):
+        """Настройка обработчиков команд"""
+        # Обработчик для установки дня рождения с состоянием
+        set_birthday_handler = ConversationHandler(
+            entry_points=[CommandHandler("set_birthday", self.measured(self.set_birthday_command))],
+            states={
+                SET_BIRTHDAY: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.measured(self.process_birthday_date))]
+            },
+            fallbacks=[CommandHandler("cancel", self.measured(self.cancel_birthday_input))]
+        )
+
+        # Состав чатов: отдельная группа обработчиков, срабатывает для каждого сообщения
+        # до остальных и ничего не ждет
+        self.application.add_handler(MessageHandler(filters.ChatType.GROUPS, self.track_message_sender), group=-1)
+        self.application.add_handler(ChatMemberHandler(self.track_chat_member, ChatMemberHandler.CHAT_MEMBER))
+
+        # Команды дней рождения
+        self.application.add_handler(set_birthday_handler)
+        self.application.add_handler(CommandHandler("start", self.measured(self.start_command)))
+        self.application.add_handler(CommandHandler("my_birthday", self.measured(self.my_birthday_command)))
+        self.application.add_handler(CommandHandler("birthdays", self.measured(self.birthdays_command)))
+        self.application.add_handler(CommandHandler("upcoming", self.measured(self.upcoming_command)))
+        self.application.add_handler(CommandHandler("month", self.measured(self.month_command)))
+        self.application.add_handler(CommandHandler("timezone", self.measured(self.timezone_command)))
+        self.application.add_handler(CommandHandler("delivery_hour", self.measured(self.delivery_hour_command)))
+        self.application.add_handler(CallbackQueryHandler(
+            self.measured(self.birthdays_page_callback), pattern=f"^{PAGE_CALLBACK}:"
+        ))
+
+        # Импорт и выгрузка (для администраторов); файл можно прислать с командой в подписи
+        self.application.add_handler(CommandHandler("import_birthdays", self.measured(self.import_birthdays_command)))
+        self.application.add_handler(MessageHandler(
+            filters.Document.ALL & filters.CaptionRegex(r"^/import_birthdays(@\w+)?(\s|$)"),
+            self.measured(self.import_birthdays_command)
+        ))
+        self.application.add_handler(CommandHandler("export_birthdays", self.measured(self.export_birthdays_command)))
+
+        # Команды тегов
+        self.application.add_handler(CommandHandler("groups", self.measured(self.groups_command)))
+        self.application.add_handler(CommandHandler("tags", self.measured(self.tags_command)))
+
+        # Настройка тегов чата (для администраторов)
+        self.application.add_handler(CommandHandler("tag_create", self.measured(self.tag_create_command)))
+        self.application.add_handler(CommandHandler("tag_delete", self.measured(self.tag_delete_command)))
+        self.application.add_handler(CommandHandler("tag_add", self.measured(self.tag_add_command)))
+        self.application.add_handler(CommandHandler("tag_remove", self.measured(self.tag_remove_command)))
+        self.application.add_handler(CommandHandler("tag_alias", self.measured(self.tag_alias_command)))
+
+        # Общие команды
+        self.application.add_handler(CommandHandler("help", self.measured(self.help_command)))
+        self.application.add_handler(CommandHandler("cancel", self.measured(self.cancel_command)))
+
+        # Обработчик сообщений для тегов - ИСПРАВЛЕННЫЙ
+        self.application.add_handler(MessageHandler(
+            filters.TEXT & ~filters.COMMAND,
+            self.measured(self.handle_message)
+        ))
+
+    async def setup_commands(self, application):
+        """Настройка подсказок команд"""
+        commands = [
+            ("start", "Начать работу с ботом"),
+            ("set_birthday", "Установить день рождения"),
+            ("my_birthday", "Посмотреть свою дату рождения"),
+            ("birthdays", "Список дней рождения в группе"),
+            ("upcoming", "Ближайшие дни рождения"),
+            ("month", "Дни рождения за месяц"),
+            ("groups", "Показать состав групп для тегов"),
+            ("tags", "Список доступных тегов"),
+            ("help", "Показать справку по командам"),
+            ("cancel", "Отменить текущее действие")
+        ]
+        await application.bot.set_my_commands(commands)
+        logger.info("✅ Bot commands setup completed")
+
+    async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработчик команды /start"""
+        user = update.effective_user
+        chat_type = update.effective_chat.type
+
+        if chat_type == "private":
+            # Пользователь открыл личный чат - напоминания снова можно присылать в личку
+            await db.clear_undeliverable(user.id)
+            await update.message.reply_text(
+                "🎉🤖 <b>Универсальный бот - Дни рождения и Теги!</b>\n\n"
+                "Я совмещаю две функции:\n\n"
+                "🎂 <b>Дни рождения:</b>\n"
+                "• Напоминания о ДР участников\n"
+                "• Поздравления в группе\n"
+                "• Список всех дней рождения\n\n"
+                "🏷️ <b>Теги:</b>\n"
+                "• Быстрое упоминание групп\n"
+                "• @команда, @тренер, @стафф и др.\n"
+                "• Поддерживает разные написания: @стафф, @стаф, @штаб\n\n"
+                "📌 <b>Добавьте меня в группу</b> для полного функционала!\n\n"
+                "📋 Команды: /help",
+                parse_mode='HTML'
+            )
+        else:
+            await update.message.reply_text(
+                "🎉🤖 <b>Универсальный бот активирован!</b>\n\n"
+                "Теперь я буду:\n\n"
+                "🎂 <b>Следить за днями рождения:</b>\n"
+                "• Напоминать за день до ДР\n"
+                "• Поздравлять именинников\n"
+                "• Хранить список ДР\n\n"
+                "🏷️ <b>Упоминать группы:</b>\n"
+                "• @команда - упомянуть команду (также @команд, @команду)\n"
+                "• @тренер - упомянуть тренеров (также @тренера, @тренеры)\n"
+                "• @стафф - упомянуть стафф (также @стаф, @штаб)\n"
+                "• И другие теги с альтернативными написаниями\n\n"
+                "📋 <b>Основные команды:</b>\n"
+                "/set_birthday - установить ДР\n"
+                "/birthdays - список ДР\n"
+                "/groups - состав групп\n"
+                "/tags - доступные теги\n"
+                "/help - помощь",
+                parse_mode='HTML'
+            )
+
+    # === СОСТАВ ЧАТОВ ===
+
+    async def track_message_sender(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Отправитель сообщения и вступившие/вышедшие участники попадают в состав чата"""
+        message = update.message
+        if message is None:
+            return
+        chat_id = message.chat.id
+        if message.from_user and not message.from_user.is_bot:
+            chat_roster.seen(chat_id, message.from_user.id)
+        for user in message.new_chat_members or ():
+            if not user.is_bot:
+                chat_roster.seen(chat_id, user.id)
+        if message.left_chat_member and not message.left_chat_member.is_bot:
+            chat_roster.left(chat_id, message.left_chat_member.id)
+
+    async def track_chat_member(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Изменение статуса участника (бот - администратор группы)"""
+        change = update.chat_member
+        member = change.new_chat_member
+        if member.user.is_bot:
+            return
+        if member.status in (ChatMember.LEFT, ChatMember.BANNED) or getattr(member, "is_member", True) is False:
+            chat_roster.left(change.chat.id, member.user.id)
+        else:
+            chat_roster.seen(change.chat.id, member.user.id)
+
+    # === КОМАНДЫ ДНЕЙ РОЖДЕНИЯ ===
+
+    async def set_birthday_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Установка дня рождения"""
+        chat_type = update.effective_chat.type
+
+        if chat_type == "private":
+            await update.message.reply_text("❌ Эту команду нужно использовать в группе!")
+            return ConversationHandler.END
+
+        await update.message.reply_text(
+            "📅 <b>Установка дня рождения</b>\n\n"
+            "Введите дату в формате: <code>ДД.ММ.ГГГГ</code>\n\n"
+            "📝 <b>Примеры:</b>\n"
+            "• 15.05.1990\n"
+            "• 03.12.1985\n"
+            "• 25.01.2000\n"
+            "• 29.11.00\n"
+            "• 15.05 (текущий год)\n\n"
+            "❌ <b>Отмена:</b> /cancel",
+            parse_mode='HTML'
+        )
+        return SET_BIRTHDAY
+
+    async def process_birthday_date(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработка введенной даты рождения"""
+        try:
+            birthday_date = parse_birthday_date(update.message.text, datetime.now().date())
+
+            user = update.effective_user
+            chat = update.effective_chat
+            birthday_str = birthday_date.strftime("%Y-%m-%d")
+
+            # Новый чат попадает в расписание с часом рассылки по умолчанию
+            now = time.time()
+            tz, hour = await db.get_chat_settings(chat.id)
+            zone = chat_zone(tz)
+            await db.add_birthday(
+                user_id=user.id,
+                chat_id=chat.id,
+                birthday_date=birthday_str,
+                username=user.username or "",
+                first_name=user.first_name or "",
+                last_name=user.last_name or "",
+                next_run_at=next_delivery(now, zone, delivery_hour(hour))
+            )
+            birthday_pages.invalidate(chat.id)
+            await self.check_soon_birthdays(chat.id, zone, hour, {month_day_key(birthday_str)})
+
+            await update.message.reply_text(
+                f"✅ <b>Отлично, {user.first_name}!</b>\n\n"
+                f"🎂 Ваш день рождения установлен на <b>{birthday_date.strftime('%d.%m.%Y')}</b>\n\n"
+                f"📢 Теперь участники будут получать напоминания о вашем ДР!",
+                parse_mode='HTML'
+            )
+
+            return ConversationHandler.END
+
+        except FutureDateError:
+            await update.message.reply_text("❌ Дата рождения не может быть в будущем!")
+            return SET_BIRTHDAY
+        except ValueError:
+            await update.message.reply_text(
+                "❌ <b>Неверный формат даты!</b>\n\n"
+                "Пожалуйста, введите дату в формате: <code>ДД.ММ.ГГГГ</code>\n\n"
+                "✅ <b>Примеры:</b>\n"
+                "• 15.05.1990\n"
+                "• 03.12.1985\n"
+                "• 25.01.2000\n\n"
+                "❌ <b>Отмена:</b> /cancel",
+                parse_mode='HTML'
+            )
+            return SET_BIRTHDAY
+        except Exception as e:
+            logger.error(f"Error setting birthday: {e}")
+            await update.message.reply_text("❌ Произошла ошибка при сохранении даты.")
+            return ConversationHandler.END
+
+    async def check_soon_birthdays(self, chat_id, zone, hour, month_days):
+        """Новые ДР сегодня или завтра по времени группы, когда сегодняшняя рассылка уже прошла, -
+        проверяем сразу; до часа рассылки их обработает плановая проверка"""
+        now = time.time()
+        if not delivery_passed(now, zone, delivery_hour(hour)):
+            return
+        today = local_today(now, zone)
+        if set(month_days) & set(celebrated_month_days(today) + celebrated_month_days(today + timedelta(days=1))):
+            await db.reschedule_chats([(0, chat_id)])
+            await self.request_birthday_check()
+
+    async def cancel_birthday_input(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Отмена ввода дня рождения"""
+        await update.message.reply_text("❌ Ввод дня рождения отменен.")
+        return ConversationHandler.END
+
+    async def cancel_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработчик команды /cancel"""
+        await update.message.reply_text("ℹ️ Нет активных действий для отмены.")
+
+    async def my_birthday_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Показать установленный день рождения"""
+        user = update.effective_user
+        chat = update.effective_chat
+
+        birthday = await db.get_user_birthday(user.id, chat.id)
+
+        if birthday:
+            birthday_date = datetime.strptime(birthday[2], "%Y-%m-%d").strftime("%d.%m.%Y")
+            await update.message.reply_text(
+                f"🎂 <b>Ваш день рождения:</b>\n"
+                f"📅 {birthday_date}\n\n"
+                f"✏️ Изменить: /set_birthday",
+                parse_mode='HTML'
+            )
+        else:
+            await update.message.reply_text(
+                "❌ <b>У вас не установлен день рождения</b>\n\n"
+                "📅 Установите его:\n"
+                "/set_birthday",
+                parse_mode='HTML'
+            )
+
+    async def birthdays_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Показать все дни рождения в группе"""
+        chat = update.effective_chat
+
+        if chat.type == "private":
+            await update.message.reply_text("❌ Эту команду нужно использовать в группе!")
+            return
+
+        # Первая страница: из базы читается только она, а не весь чат
+        page = await birthday_pages.get(chat.id)
+
+        if not page.rows:
+            await update.message.reply_text(
+                "📅 <b>В этой группе пока нет установленных дней рождения</b>\n\n"
+                "Станьте первым!\n"
+                "/set_birthday",
+                parse_mode='HTML'
+            )
+            return
+
+        await update.message.reply_text(page.text, parse_mode='HTML', reply_markup=page_keyboard(page))
+
+    async def birthdays_page_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Листание списка /birthdays кнопками"""
+        query = update.callback_query
+        parsed = parse_page_callback(query.data)
+        if parsed is None or query.message is None:
+            await query.answer()
+            return
+
+        before, number, cursor = parsed
+        page = await birthday_pages.get(query.message.chat.id, cursor, before, number)
+        await query.answer()
+        try:
+            await query.edit_message_text(page.text, parse_mode='HTML', reply_markup=page_keyboard(page))
+        except BadRequest as e:
+            # Повторное нажатие на ту же кнопку - страница не изменилась
+            if "not modified" not in str(e):
+                raise
+
+    async def chat_today(self, chat_id):
+        """Сегодняшняя дата по часовому поясу чата"""
+        tz, _ = await db.get_chat_settings(chat_id)
+        return local_today(time.time(), chat_zone(tz))
+
+    async def upcoming_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Дни рождения в ближайшие N дней"""
+        chat = update.effective_chat
+        if chat.type == "private":
+            await update.message.reply_text("❌ Эту команду нужно использовать в группе!")
+            return
+
+        try:
+            days = int(context.args[0]) if context.args else UPCOMING_DAYS
+            if not 1 <= days <= MAX_UPCOMING_DAYS:
+                raise ValueError
+        except ValueError:
+            await update.message.reply_text(f"❌ Использование: /upcoming [дней от 1 до {MAX_UPCOMING_DAYS}]")
+            return
+
+        today = await self.chat_today(chat.id)
+        start, end = celebration_window(today, days)
+        rows = await db.get_birthdays_between(chat.id, start, end, LIST_LIMIT + 1)
+
+        if not rows:
+            await update.message.reply_text(f"📅 В ближайшие {days} дн. дней рождения нет")
+            return
+        await update.message.reply_text(
+            render_upcoming(rows[:LIST_LIMIT], today, days, more=len(rows) > LIST_LIMIT), parse_mode='HTML'
+        )
+
+    async def month_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Дни рождения за месяц"""
+        chat = update.effective_chat
+        if chat.type == "private":
+            await update.message.reply_text("❌ Эту команду нужно использовать в группе!")
+            return
+
+        today = await self.chat_today(chat.id)
+        try:
+            month = int(context.args[0]) if context.args else today.month
+            if not 1 <= month <= 12:
+                raise ValueError
+        except ValueError:
+            await update.message.reply_text("❌ Использование: /month [номер месяца от 1 до 12]")
+            return
+
+        rows = await db.get_birthdays_between(chat.id, f"{month:02d}-01", f"{month:02d}-31", LIST_LIMIT + 1)
+
+        if not rows:
+            await update.message.reply_text("📅 В этом месяце дней рождения нет")
+            return
+        await update.message.reply_text(
+            render_month(rows[:LIST_LIMIT], month, today, more=len(rows) > LIST_LIMIT), parse_mode='HTML'
+        )
+
+    # === ИМПОРТ И ВЫГРУЗКА ДНЕЙ РОЖДЕНИЯ ===
+
+    async def import_birthdays_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Импорт дней рождения из CSV или JSON"""
+        if not await self.check_chat_admin(update, context):
+            return
+
+        message = update.message
+        document = message.document or (message.reply_to_message.document if message.reply_to_message else None)
+        if document is None:
+            await message.reply_text(
+                "📥 <b>Импорт дней рождения</b>\n\n"
+                "Пришлите файл CSV или JSON с подписью /import_birthdays "
+                "или ответьте этой командой на сообщение с файлом.\n\n"
+                "Столбцы: <code>user_id, birthday, username, first_name, last_name</code>\n"
+                "Дата - в тех же форматах, что и в /set_birthday. Формат файла - как у /export_birthdays.",
+                parse_mode='HTML'
+            )
+            return
+        if document.file_size and document.file_size > MAX_IMPORT_SIZE:
+            await message.reply_text("❌ Файл слишком большой (больше 20 МБ).")
+            return
+
+        chat = update.effective_chat
+        now = time.time()
+        tz, hour = await db.get_chat_settings(chat.id)
+        zone = chat_zone(tz)
+
+        # Файл скачивается на диск и разбирается построчно в отдельном потоке
+        with tempfile.TemporaryFile() as tmp:
+            file = await context.bot.get_file(document.file_id)
+            await file.download_to_memory(tmp)
+            tmp.seek(0)
+            failure = None
+            try:
+                imported, errors, month_days = await asyncio.to_thread(
+                    import_birthdays, db.db, chat.id, open_text(tmp), document.file_name or "",
+                    local_today(now, zone), next_delivery(now, zone, delivery_hour(hour))
+                )
+            except ImportFileError as e:
+                # Пачки до места ошибки уже записаны - сообщаем, сколько
+                failure = e
+                imported, errors, month_days = e.imported, e.errors, e.month_days
+
+        birthday_pages.invalidate(chat.id)
+        await self.check_soon_birthdays(chat.id, zone, hour, month_days)
+
+        if failure is None:
+            text = f"✅ Импортировано дней рождения: {imported}"
+        else:
+            text = f"❌ Не удалось дочитать файл: {failure}"
+            if imported:
+                text += f"\n✅ До ошибки импортировано дней рождения: {imported}"
+        if errors:
+            shown = ", ".join(map(str, errors[:MAX_REPORTED_ERRORS]))
+            more = "…" if len(errors) > MAX_REPORTED_ERRORS else ""
+            text += f"\n⚠️ Пропущено записей с ошибками: {len(errors)} (номера записей без заголовка: {shown}{more})"
+        await message.reply_text(text)
+
+    async def export_birthdays_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Выгрузка дней рождения группы в CSV или JSON"""
+        if not await self.check_chat_admin(update, context):
+            return
+
+        fmt = context.args[0].lower() if context.args else "csv"
+        if fmt not in ("csv", "json"):
+            await update.message.reply_text("❌ Использование: /export_birthdays [csv|json]")
+            return
+
+        chat = update.effective_chat
+        # Строки читаются пачками и сразу пишутся во временный файл
+        with tempfile.TemporaryFile() as tmp:
+            count = await asyncio.to_thread(export_to_file, db.db, chat.id, tmp, fmt)
+            if not count:
+                await update.message.reply_text("📅 В этой группе пока нет установленных дней рождения")
+                return
+            tmp.seek(0)
+            await update.message.reply_document(
+                document=tmp, filename=f"birthdays_{chat.id}.{fmt}", caption=f"📤 Дней рождения: {count}"
+            )
+
+    # === КОМАНДЫ ТЕГОВ ===
+
+    async def groups_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Показать состав групп"""
+        index = await tag_registry.get(update.effective_chat.id)
+        await update.message.reply_text(index.groups_text, parse_mode='HTML')
+
+    async def tags_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Показать доступные теги"""
+        index = await tag_registry.get(update.effective_chat.id)
+        await update.message.reply_text(index.tags_text, parse_mode='HTML')
+
+    async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработка сообщений с мгновенными тегами"""
+        if update.message and update.message.text:
+            # Индекс фиксируется один раз, чтобы поиск и ответ были из одной версии групп
+            index = await tag_registry.get(update.effective_chat.id)
+
+            # Первый тег группы в сообщении, найденный за один проход по тексту
+            group_name = index.matcher.find(update.message.text)
+            reply = index.replies.get(group_name) if group_name else None
+
+            if not reply:
+                return
+            # На первое упоминание за окно отвечаем сразу, повторы уйдут одним ответом по окончании окна
+            if self.tag_replies.add(update.effective_chat.id, group_name, reply, update.message.message_id):
+                await self.send_tag_reply(update.effective_chat.id, reply, update.message.message_id)
+
+    async def send_tag_reply(self, chat_id, reply, reply_to_message_id):
+        """Ответ на тег: с HTML, при ошибке - без разметки"""
+        html_text, plain_text = reply
+        try:
+            await self.application.bot.send_message(
+                chat_id,
+                html_text,
+                reply_to_message_id=reply_to_message_id,
+                allow_sending_without_reply=True,
+                parse_mode='HTML'
+            )
+        except Exception as e:
+            logger.error(f"Error sending mention with HTML: {e}")
+            # Если не сработало с HTML, пробуем без него
+            try:
+                await self.application.bot.send_message(
+                    chat_id,
+                    plain_text,
+                    reply_to_message_id=reply_to_message_id,
+                    allow_sending_without_reply=True
+                )
+            except Exception as e2:
+                logger.error(f"Error sending mention without HTML: {e2}")
+
+    async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Справка по командам"""
+        await update.message.reply_text(
+            "📋 <b>Универсальный бот - Справка</b>\n\n"
+            "🎂 <b>Дни рождения:</b>\n"
+            "/set_birthday - Установить день рождения\n"
+            "/my_birthday - Посмотреть свою дату\n"
+            "/birthdays - Список всех ДР в группе\n"
+            "/upcoming [дней] - Ближайшие ДР (по умолчанию 30 дней)\n"
+            "/month [мм] - ДР за месяц\n"
+            "/timezone [пояс] - Часовой пояс группы\n"
+            "/delivery_hour [час] - Час рассылки поздравлений\n\n"
+            "🏷️ <b>Теги:</b>\n"
+            "/groups - Показать состав групп\n"
+            "/tags - Список доступных тегов\n\n"
+            "📥 <b>Импорт и выгрузка (администраторы):</b>\n"
+            "/import_birthdays - Загрузить ДР из CSV/JSON\n"
+            "/export_birthdays [csv|json] - Выгрузить ДР группы\n\n"
+            "⚙️ <b>Свои теги группы (администраторы):</b>\n"
+            "/tag_create имя [написания...] - Создать тег\n"
+            "/tag_delete имя - Удалить тег\n"
+            "/tag_add имя @user... - Добавить участников\n"
+            "/tag_remove имя @user... - Убрать участников\n"
+            "/tag_alias имя написание... - Добавить написания\n"
+            "Свои теги группы заменяют стандартный набор.\n\n"
+            "💡 <b>Автоматические теги:</b>\n"
+            "Просто напишите:\n"
+            "• @команда, @команд, @команду\n"
+            "• @тренер, @тренера, @тренеры\n"
+            "• @стафф, @стаф, @штаб\n"
+            "• @хуёжник или @хуежник\n"
+            "• @начальник, @начальники\n"
+            "• И другие теги с альтернативными написаниями\n\n"
+            "⏰ <b>Автоматика:</b>\n"
+            "• Напоминания о ДР за 1 день\n"
+            "• Поздравления в день рождения\n"
+            "• Рассылка в заданный час по времени группы\n\n"
+            "❌ <b>Отмена действий:</b> /cancel",
+            parse_mode='HTML'
+        )
+
+    # === НАСТРОЙКА ТЕГОВ ЧАТА ===
+
+    async def check_chat_admin(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Команда вызвана администратором группы; иначе отправляет ответ и возвращает False"""
+        chat = update.effective_chat
+        if chat.type == "private":
+            await update.message.reply_text("❌ Эту команду нужно использовать в группе!")
+            return False
+
+        member = await context.bot.get_chat_member(chat.id, update.effective_user.id)
+        if member.status not in (ChatMember.ADMINISTRATOR, ChatMember.OWNER):
+            await update.message.reply_text("❌ Эта команда доступна только администраторам группы.")
+            return False
+        return True
+
+    async def check_tag_admin(self, update: Update, context: ContextTypes.DEFAULT_TYPE, usage: str, min_args: int):
+        """Проверка прав и аргументов команды настройки тегов.
+
+        Возвращает (имя группы, остальные аргументы) или None, если ответ уже отправлен.
+        """
+        if not await self.check_chat_admin(update, context):
+            return None
+
+        args = parse_tag_names(context.args or [])
+        if len(args) < min_args:
+            await update.message.reply_text(f"ℹ️ Использование: <code>{usage}</code>", parse_mode='HTML')
+            return None
+
+        return args[0].lower(), args[1:]
+
+    async def reject_invalid_names(self, update: Update, names, is_valid, what):
+        """Ответ об ошибке, если среди names есть недопустимые; True - команда отклонена"""
+        invalid = [name for name in names if not is_valid(name)]
+        if not invalid:
+            return False
+        await update.message.reply_text(
+            f"❌ Недопустимые {what}: {', '.join(invalid)}\n"
+            f"Тег - одно слово до 32 символов, username - 5-32 латинских букв, цифр или _."
+        )
+        return True
+
+    async def tag_create_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Создание тега группы"""
+        parsed = await self.check_tag_admin(update, context, "/tag_create имя [написания...]", 1)
+        if not parsed:
+            return
+        group_name, aliases = parsed
+        chat_id = update.effective_chat.id
+        if await self.reject_invalid_names(update, [group_name, *aliases], is_valid_tag_name, "названия"):
+            return
+
+        if not await db.create_tag_group(chat_id, group_name, [alias.lower() for alias in aliases]):
+            await update.message.reply_text(f"❌ Тег @{group_name} уже существует.")
+            return
+
+        tag_registry.invalidate(chat_id)
+        await update.message.reply_text(
+            f"✅ Тег @{group_name} создан.\n"
+            f"Добавьте участников: <code>/tag_add {group_name} @username</code>",
+            parse_mode='HTML'
+        )
+
+    async def tag_delete_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Удаление тега группы"""
+        parsed = await self.check_tag_admin(update, context, "/tag_delete имя", 1)
+        if not parsed:
+            return
+        group_name, _ = parsed
+        chat_id = update.effective_chat.id
+
+        if not await db.delete_tag_group(chat_id, group_name):
+            await update.message.reply_text(f"❌ Тег @{group_name} не найден.")
+            return
+
+        tag_registry.invalidate(chat_id)
+        await update.message.reply_text(f"✅ Тег @{group_name} удален.")
+
+    async def tag_add_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Добавление участников в тег"""
+        parsed = await self.check_tag_admin(update, context, "/tag_add имя @user1 @user2", 2)
+        if not parsed:
+            return
+        group_name, usernames = parsed
+        chat_id = update.effective_chat.id
+        if await self.reject_invalid_names(update, usernames, is_valid_username, "username"):
+            return
+
+        if group_name not in await db.get_tag_groups(chat_id):
+            await update.message.reply_text(f"❌ Тег @{group_name} не найден. Создайте его: /tag_create")
+            return
+
+        added = await db.add_tag_members(chat_id, group_name, usernames)
+        tag_registry.invalidate(chat_id)
+        await update.message.reply_text(f"✅ Добавлено участников в @{group_name}: {added}")
+
+    async def tag_remove_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Удаление участников из тега"""
+        parsed = await self.check_tag_admin(update, context, "/tag_remove имя @user1 @user2", 2)
+        if not parsed:
+            return
+        group_name, usernames = parsed
+        chat_id = update.effective_chat.id
+
+        removed = await db.remove_tag_members(chat_id, group_name, usernames)
+        tag_registry.invalidate(chat_id)
+        await update.message.reply_text(f"✅ Убрано участников из @{group_name}: {removed}")
+
+    async def tag_alias_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Добавление альтернативных написаний тега"""
+        parsed = await self.check_tag_admin(update, context, "/tag_alias имя написание1 написание2", 2)
+        if not parsed:
+            return
+        group_name, aliases = parsed
+        chat_id = update.effective_chat.id
+        if await self.reject_invalid_names(update, aliases, is_valid_tag_name, "написания"):
+            return
+
+        if group_name not in await db.get_tag_groups(chat_id):
+            await update.message.reply_text(f"❌ Тег @{group_name} не найден. Создайте его: /tag_create")
+            return
+
+        added = await db.add_tag_aliases(chat_id, group_name, [alias.lower() for alias in aliases])
+        tag_registry.invalidate(chat_id)
+        await update.message.reply_text(f"✅ Добавлено написаний для @{group_name}: {added}")
+
+    # === ЧАСОВОЙ ПОЯС И ЧАС РАССЫЛКИ ===
+
+    async def show_delivery_settings(self, update: Update, usage: str):
+        """Текущие настройки рассылки чата"""
+        tz, hour = await db.get_chat_settings(update.effective_chat.id)
+        await update.message.reply_text(
+            f"🕘 Поздравления и напоминания приходят в <b>{delivery_hour(hour):02d}:00</b> "
+            f"по времени <b>{chat_zone(tz)}</b>\n\n"
+            f"ℹ️ Изменить (администраторы): <code>{usage}</code>",
+            parse_mode='HTML'
+        )
+
+    async def save_delivery_settings(self, update: Update, tz, hour):
+        """Сохранение настроек рассылки и пересчет момента следующей рассылки чата"""
+        chat_id = update.effective_chat.id
+        # Час уже прошел - проверяем сегодня сразу, иначе чат ждал бы до завтра;
+        # повторная проверка уже обработанного дня ничего не отправит (sent_reminders)
+        next_run_at = run_after_change(time.time(), chat_zone(tz), delivery_hour(hour))
+        await db.set_chat_settings(chat_id, tz, hour, next_run_at)
+        # Лидер пересчитает, когда проснуться, с учетом нового момента
+        await self.request_birthday_check()
+        await update.message.reply_text(
+            f"✅ Рассылка в <b>{delivery_hour(hour):02d}:00</b> по времени <b>{chat_zone(tz)}</b>",
+            parse_mode='HTML'
+        )
+
+    async def timezone_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Часовой пояс группы"""
+        usage = "/timezone Europe/Moscow или /timezone +3"
+        if update.effective_chat.type == "private":
+            await update.message.reply_text("❌ Эту команду нужно использовать в группе!")
+            return
+        if not context.args:
+            await self.show_delivery_settings(update, usage)
+            return
+        if not await self.check_chat_admin(update, context):
+            return
+
+        tz = parse_timezone(context.args[0])
+        if tz is None:
+            await update.message.reply_text(f"❌ Неизвестный часовой пояс. Пример: <code>{usage}</code>", parse_mode='HTML')
+            return
+
+        _, hour = await db.get_chat_settings(update.effective_chat.id)
+        await self.save_delivery_settings(update, tz, hour)
+
+    async def delivery_hour_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Час рассылки поздравлений и напоминаний группы"""
+        usage = "/delivery_hour 9"
+        if update.effective_chat.type == "private":
+            await update.message.reply_text("❌ Эту команду нужно использовать в группе!")
+            return
+        if not context.args:
+            await self.show_delivery_settings(update, usage)
+            return
+        if not await self.check_chat_admin(update, context):
+            return
+
+        try:
+            hour = int(context.args[0])
+            if not 0 <= hour <= 23:
+                raise ValueError
+        except ValueError:
+            await update.message.reply_text("❌ Использование: /delivery_hour [час от 0 до 23]")
+            return
+
+        tz, _ = await db.get_chat_settings(update.effective_chat.id)
+        await self.save_delivery_settings(update, tz, hour)
+
+    # === СИСТЕМА НАПОМИНАНИЙ ===
+
+    async def check_birthdays(self):
+        """Проверка дней рождения в чатах, для которых наступил час рассылки, и
+        постановка уведомлений в очередь отправки.
+
+        Возвращает False, если проверка завершилась ошибкой и ее стоит повторить.
+        """
+        all_sent = True
+        try:
+            now = time.time()
+
+            # Чаты с наступившим моментом рассылки, сгруппированные по местной дате
+            due_chats = await db.get_due_chats(now)
+            chats_by_date = {}
+            for chat_id, tz, hour in due_chats:
+                chats_by_date.setdefault(local_today(now, chat_zone(tz)).isoformat(), []).append(chat_id)
+
+            messages, sent_reminders = [], []
+            for today_str, chat_ids in chats_by_date.items():
+                # Еще не обработанные ДР и участники затронутых чатов - два запроса на дату
+                today_birthdays, tomorrow_birthdays = await db.get_pending_birthdays(today_str, chat_ids)
+                members_by_chat = await chat_roster.members_for_chats({birthday[1] for birthday in tomorrow_birthdays})
+                undeliverable = await db.get_undeliverable(
+                    {member_id for members in members_by_chat.values() for member_id in members}
+                )
+                self.collect_notifications(
+                    today_str, today_birthdays, tomorrow_birthdays, members_by_chat, messages, sent_reminders,
+                    undeliverable
+                )
+
+            # Сообщения и отметки об отправке сохраняются одной транзакцией
+            # (executemany), доставку выполняют обработчики outbox
+            if sent_reminders and await db.enqueue_outbox(messages, sent_reminders):
+                self.outbox.wake()
+
+            # Следующая рассылка обработанных чатов - в их час по местному времени
+            if due_chats:
+                await db.reschedule_chats([
+                    (next_delivery(now, chat_zone(tz), delivery_hour(hour)), chat_id)
+                    for chat_id, tz, hour in due_chats
+                ])
+                logger.info(f"📬 Обработано чатов: {len(due_chats)}")
+
+            # Очистка старых напоминаний и доставленных сообщений
+            await db.cleanup_old_reminders(CLEANUP_DAYS)
+            await db.cleanup_outbox(CLEANUP_DAYS)
+            await db.cleanup_undeliverable()
+
+        except Exception as e:
+            logger.error(f"Error in check_birthdays: {e}")
+            all_sent = False
+
+        return all_sent
+
+    def collect_notifications(self, today_str, today_birthdays, tomorrow_birthdays, members_by_chat,
+                              messages, sent_reminders, undeliverable=frozenset()):
+        """Сообщения outbox и отметки sent_reminders для чатов с местной датой today_str"""
+        # Напоминания на завтра: каждый получатель получает одно сообщение со всеми
+        # завтрашними именинниками из общих с ним чатов
+        reminders = [
+            (birthday, [member_id for member_id in members_by_chat[birthday[1]] if member_id != birthday[0]])
+            for birthday in tomorrow_birthdays
+        ]
+
+        # Кому личка недоступна, не пишем в нее вовсе: их упоминает одно сообщение в группе
+        skipped_by_chat = {}
+        for birthday, chat_members in reminders:
+            skipped = [member_id for member_id in chat_members if member_id in undeliverable]
+            if skipped:
+                birthdays, member_ids = skipped_by_chat.setdefault(birthday[1], ({}, set()))
+                birthdays[birthday[0]] = birthday
+                member_ids.update(skipped)
+        for chat_id, (birthdays, member_ids) in skipped_by_chat.items():
+            messages.append((
+                f"group_reminder:{today_str}:{chat_id}:{','.join(map(str, sorted(birthdays)))}",
+                chat_id, self.format_group_reminder(list(birthdays.values()), sorted(member_ids)), 'HTML'
+            ))
+
+        digests = group_reminders_by_recipient(
+            (birthday, [member_id for member_id in chat_members if member_id not in undeliverable])
+            for birthday, chat_members in reminders
+        )
+        messages.extend(
+            (f"reminder:{today_str}:{recipient}:{','.join(map(str, sorted(entries)))}",
+             recipient, self.format_digest(list(entries.values())), 'HTML')
+            for recipient, entries in digests.items()
+        )
+        sent_reminders.extend(
+            (birthday[0], birthday[1], today_str, "reminder") for birthday, chat_members in reminders if chat_members
+        )
+
+        # Поздравления на сегодня
+        current_year = int(today_str[:4])
+        for birthday in today_birthdays:
+            user_id, chat_id, birthday_date, username, first_name, last_name = birthday
+
+            birth_year = datetime.strptime(birthday_date, "%Y-%m-%d").year
+            age = current_year - birth_year
+
+            display_name = first_name
+            if last_name:
+                display_name += f" {last_name}"
+
+            messages.append((
+                f"congrats:{today_str}:{chat_id}:{user_id}",
+                chat_id, self.format_congrats(display_name, age), 'HTML'
+            ))
+            sent_reminders.append((user_id, chat_id, today_str, "congrats"))
+
+    def format_reminder(self, birthday_person, birthday_date):
+        """Текст напоминания в ЛС"""
+        return (
+            f"🎉 <b>Напоминание о дне рождения!</b> 🎉\n\n"
+            f"Завтра, {birthday_date}, празднует день рождения:\n"
+            f"🎂 <b>{html.escape(birthday_person)}</b>\n\n"
+            f"Не забудьте поздравить в группе! 🎊"
+        )
+
+    def format_congrats(self, birthday_person, age):
+        """Текст поздравления в группе"""
+        age_text = f"{age}-летием" if age > 1 else f"{age}-летием"
+        return (
+            f"🎂🎉 <b>С ДНЕМ РОЖДЕНИЯ!</b> 🎉🎂\n\n"
+            f"Поздравляем <b>{html.escape(birthday_person)}</b> с {age_text}! 🎊\n\n"
+            f"💫 Желаем счастья, здоровья, успехов\n"
+            f"✨ И всего самого наилучшего! 🎁\n\n"
+            f"Присоединяйтесь к поздравлениям! 🎈"
+        )
+
+    def format_digest(self, entries):
+        """Одно напоминание обо всех завтрашних именинниках получателя"""
+        if len(entries) == 1:
+            return self.format_reminder(*entries[0])
+
+        people = "\n".join(
+            f"🎂 <b>{html.escape(birthday_person)}</b> ({birthday_date})" for birthday_person, birthday_date in entries
+        )
+        return (
+            f"🎉 <b>Напоминание о днях рождения!</b> 🎉\n\n"
+            f"Завтра празднуют день рождения:\n"
+            f"{people}\n\n"
+            f"Не забудьте поздравить в группах! 🎊"
+        )
+
+    def format_group_reminder(self, birthdays, member_ids):
+        """Напоминание в группе для участников, которым не написать в личку"""
+        people = "\n".join(
+            f"🎂 <b>{html.escape(first_name + (f' {last_name}' if last_name else ''))}</b> "
+            f"({birthday_date[8:10]}.{birthday_date[5:7]}.{birthday_date[:4]})"
+            for user_id, chat_id, birthday_date, username, first_name, last_name in birthdays
+        )
+        mentions = " ".join(f'<a href="tg://user?id={member_id}">👤</a>' for member_id in member_ids[:MAX_GROUP_MENTIONS])
+        return (
+            f"🎉 <b>Напоминание о дне рождения!</b> 🎉\n\n"
+            f"Завтра празднуют день рождения:\n"
+            f"{people}\n\n"
+            f"{mentions}\n"
+            f"Не забудьте поздравить! 🎊 Чтобы получать напоминания в личку, напишите мне /start"
+        )
+
+    def start_scheduler(self):
+        """Запуск планировщика: проверки выполняет только процесс, держащий аренду"""
+        self.application.job_queue.run_repeating(
+            self.leadership_job, interval=LEASE_RENEW_INTERVAL, first=0, name=LEADERSHIP_JOB
+        )
+        logger.info("✅ Scheduler started")
+
+    async def leadership_job(self, context: ContextTypes.DEFAULT_TYPE):
+        """Захват или продление аренды планировщика"""
+        leader = await db.acquire_lease(SCHEDULER_LEASE, self.instance_id, LEASE_TTL)
+
+        if leader and not self.is_leader:
+            logger.info(f"👑 {self.instance_id} runs the birthday scheduler")
+            self.is_leader = True
+            await self.outbox.start()
+            self.schedule_birthday_check(timedelta(seconds=10))
+            if BACKUP_INTERVAL > 0:
+                self.application.job_queue.run_repeating(
+                    self.backup_job, interval=BACKUP_INTERVAL, first=BACKUP_INTERVAL, name=BACKUP_JOB
+                )
+        elif not leader and self.is_leader:
+            logger.warning(f"{self.instance_id} lost the scheduler lease")
+            self.is_leader = False
+            await self.outbox.stop()
+            for name in (BIRTHDAY_CHECK_JOB, BACKUP_JOB):
+                for job in self.application.job_queue.get_jobs_by_name(name):
+                    job.schedule_removal()
+
+        # Другие процессы просят внеочередную проверку через базу
+        if self.is_leader and await db.pop_scheduler_request(BIRTHDAY_CHECK_JOB):
+            self.schedule_birthday_check(timedelta(seconds=0))
+
+    async def request_birthday_check(self):
+        """Внеочередная проверка: сразу, если процесс - лидер, иначе через просьбу лидеру"""
+        if self.is_leader:
+            self.schedule_birthday_check(timedelta(seconds=0))
+        else:
+            await db.add_scheduler_request(BIRTHDAY_CHECK_JOB)
+
+    def schedule_birthday_check(self, when):
+        """Планирование следующей проверки дней рождения вместо уже запланированной"""
+        job_queue = self.application.job_queue
+        for job in job_queue.get_jobs_by_name(BIRTHDAY_CHECK_JOB):
+            job.schedule_removal()
+        job_queue.run_once(self.birthday_check_job, when=when, name=BIRTHDAY_CHECK_JOB)
+
+    async def birthday_check_job(self, context: ContextTypes.DEFAULT_TYPE):
+        """Задача планировщика: проверка и выбор момента следующего запуска"""
+        if not self.is_leader:
+            return
+
+        logger.info("🔍 Проверка дней рождения...")
+        start = time.perf_counter()
+        all_sent = await self.check_birthdays()
+        SCHEDULER_TICK.observe(time.perf_counter() - start)
+        if all_sent:
+            # Спим до ближайшего момента рассылки среди всех чатов
+            next_run_at = await db.get_next_run_at()
+            delay = MAX_CHECK_DELAY if next_run_at is None else timedelta(seconds=max(0, next_run_at - time.time()))
+            delay = min(delay, MAX_CHECK_DELAY)
+        else:
+            delay = RETRY_INTERVAL
+        self.schedule_birthday_check(delay)
+        logger.info(f"⏰ Следующая проверка через {delay}")
+
+    async def backup_job(self, context: ContextTypes.DEFAULT_TYPE):
+        """Задача планировщика: резервная копия базы в отдельном потоке"""
+        if not self.is_leader:
+            return
+
+        try:
+            await asyncio.to_thread(db.db.backup_database, BACKUP_DIR, BACKUP_KEEP)
+        except Exception as e:
+            logger.error(f"Error in backup_database: {e}")
+
+    async def post_init(self, application):
+        """Выполняется после инициализации бота"""
+        await self.setup_commands(application)
+        await chat_roster.start()
+        if self.metrics_port is not None:
+            self.metrics_server = await serve_metrics(METRICS_LISTEN, self.metrics_port)
+        self.start_scheduler()
+        logger.info("🚀 Universal Bot is ready and running!")
+
+    async def post_stop(self, application):
+        """Выполняется после остановки обработки обновлений, пока бот еще может отправлять"""
+        await self.tag_replies.close()
+
+    async def post_shutdown(self, application):
+        """Выполняется при остановке бота"""
+        await self.outbox.stop()
+        await chat_roster.stop()
+        if self.metrics_server is not None:
+            self.metrics_server.close()
+            self.metrics_server = None
+        if self.is_leader:
+            await db.release_lease(SCHEDULER_LEASE, self.instance_id)
+            self.is_leader = False
+
+    def run(self):
+        """Запуск бота"""
+        if WEBHOOK_URL:
+            asyncio.run(self.run_webhook())
+            return
+
+        logger.info("✅ Starting Universal Bot...")
+        self.application.run_polling(
+            allowed_updates=Update.ALL_TYPES,
+            drop_pending_updates=True
+        )
+
+    @asynccontextmanager
+    async def started(self):
+        """Запуск приложения без run_polling с теми же шагами и хуками"""
+        await self.application.initialize()
+        await self.post_init(self.application)
+        await self.application.start()
+        try:
+            yield
+        finally:
+            await self.application.stop()
+            await self.post_stop(self.application)
+            await self.application.shutdown()
+            await self.post_shutdown(self.application)
+
+    async def run_webhook(self):
+        """Запуск бота в режиме webhook на ASGI-сервере в том же цикле событий"""
+        logger.info("✅ Starting Universal Bot in webhook mode...")
+        app = WebhookApp(self.application, path=WEBHOOK_PATH, secret_token=WEBHOOK_SECRET)
+
+        async with self.started():
+            await self.application.bot.set_webhook(
+                url=WEBHOOK_URL.rstrip('/') + WEBHOOK_PATH,
+                secret_token=WEBHOOK_SECRET,
+                allowed_updates=Update.ALL_TYPES,
+                drop_pending_updates=True
+            )
+            await serve_webhook(app, WEBHOOK_LISTEN, WEBHOOK_PORT)
+
+    async def run_shard(self, updates):
+        """Обработка обновлений своей доли чатов, которые присылает главный процесс кластера"""
+        loop = asyncio.get_running_loop()
+        async with self.started():
+            while True:
+                data = await loop.run_in_executor(None, updates.get)
+                if data is None:
+                    break
+                self.application.update_queue.put_nowait(Update.de_json(data, self.application.bot))
+
+
+def main():
+    """Основная функция запуска"""
+    if CLUSTER_WORKERS > 1:
+        cluster = Cluster(BOT_TOKEN, CLUSTER_WORKERS)
+        asyncio.run(cluster.run(WEBHOOK_URL, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET))
+        return
+
+    bot = UniversalBot(BOT_TOKEN)
+    bot.run()
+
+
+if __name__ == '__main__':
+
+    main()
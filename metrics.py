@@ -0,0 +1,221 @@
+import asyncio
+import bisect
+import functools
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм задержек, в секундах
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# Границы корзин скорости рассылки, сообщений в секунду
+THROUGHPUT_BUCKETS = (1, 5, 10, 20, 25, 30, 40, 60, 100)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Счетчик, который только растет"""
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.values = {}
+
+    def inc(self, *labels, amount=1):
+        if not self.registry.enabled:
+            return
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Gauge:
+    """Значение, которое может расти и уменьшаться"""
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.values = {}
+
+    def set(self, value, *labels):
+        if not self.registry.enabled:
+            return
+        self.values[labels] = value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        for labels, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Распределение значений по корзинам с суммой и количеством"""
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # {значения меток: [счетчики по корзинам (последняя - +Inf), сумма, количество]}
+        self.series = {}
+
+    def observe(self, value, *labels):
+        if not self.registry.enabled:
+            return
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = _format_labels(self.labelnames, labels, [("le", _format_value(float(bound)))])
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Registry:
+    """Набор метрик процесса.
+
+    Пока метрики выключены, observe/inc сразу возвращаются, а timed оставляет
+    обработчики без обертки - на горячем пути остается одна проверка флага.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.metrics = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(self, name, documentation, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def gauge(self, name, documentation, labelnames=()):
+        metric = Gauge(self, name, documentation, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(self, name, documentation, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Все метрики в текстовом формате Prometheus"""
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+HANDLER_LATENCY = registry.histogram(
+    "bot_handler_seconds", "Time spent in an update handler.", ("handler",))
+DB_LATENCY = registry.histogram(
+    "bot_db_query_seconds", "Database call latency including the wait for a database thread.", ("method",))
+SCHEDULER_TICK = registry.histogram(
+    "bot_scheduler_tick_seconds", "Duration of one birthday check.")
+FANOUT_THROUGHPUT = registry.histogram(
+    "bot_fanout_messages_per_second", "Throughput of one outbox drain, from the first claimed message until the queue is empty.", buckets=THROUGHPUT_BUCKETS)
+SEND_LATENCY = registry.histogram(
+    "bot_send_seconds", "Latency of a single sendMessage call.")
+MESSAGES_SENT = registry.counter(
+    "bot_messages_sent_total", "Messages accepted by the Bot API.")
+API_ERRORS = registry.counter(
+    "bot_api_errors_total", "Failed Bot API calls by error type.", ("error",))
+RETRY_AFTER = registry.counter(
+    "bot_retry_after_total", "Flood control (RetryAfter) responses.")
+BACKUP_DURATION = registry.histogram(
+    "bot_backup_seconds", "Duration of a database backup.", buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 300, 900))
+BACKUP_PROGRESS = registry.gauge(
+    "bot_backup_progress_ratio", "Share of pages copied by the running backup.")
+BACKUP_LAST_SUCCESS = registry.gauge(
+    "bot_backup_last_success_timestamp_seconds", "Unix time of the last successful backup.")
+BACKUP_FAILURES = registry.counter(
+    "bot_backup_failures_total", "Failed database backups.")
+
+
+def timed(histogram, *labels):
+    """Декоратор асинхронной функции: время выполнения попадает в гистограмму"""
+    def decorator(callback):
+        if not histogram.registry.enabled:
+            return callback
+
+        @functools.wraps(callback)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await callback(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start, *labels)
+
+        return wrapper
+    return decorator
+
+
+async def _handle_request(reader, writer):
+    try:
+        request_line = await reader.readline()
+        # Заголовки не нужны, но их надо дочитать до пустой строки
+        while (await reader.readline()).strip():
+            pass
+
+        parts = request_line.split()
+        if len(parts) >= 2 and parts[0] == b"GET" and parts[1].split(b"?")[0] == b"/metrics":
+            status, body = "200 OK", registry.render().encode()
+        else:
+            status, body = "404 Not Found", b"not found"
+
+        writer.write(
+            f"HTTP/1.1 {status}\r\n"
+            f"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve_metrics(listen, port):
+    """Запуск HTTP-сервера с /metrics в текущем цикле событий; возвращает сервер для close()"""
+    server = await asyncio.start_server(_handle_request, listen, port)
+    logger.info(f"📊 Metrics available at http://{listen}:{port}/metrics")
+    return server
@@ -0,0 +1,148 @@
+import asyncio
+import html
+import logging
+import re
+import time
+from telegram.error import Forbidden, BadRequest
+from delivery import DeliveryStats
+from metrics import FANOUT_THROUGHPUT
+
+logger = logging.getLogger(__name__)
+
+# Обработчики очереди, размер пачки и политика повторов
+OUTBOX_WORKERS = 8
+CLAIM_BATCH = 10
+MAX_ATTEMPTS = 6
+BASE_RETRY_DELAY = 30  # секунд, дальше удваивается с каждой попыткой
+POLL_INTERVAL = 30  # как часто проверять отложенные повторы без явного пробуждения
+UNDELIVERABLE_TTL = 30 * 86400  # сколько не писать в личку тем, кому сообщение не доставилось
+
+
+def plain_text(text):
+    """Текст HTML-сообщения без разметки"""
+    return html.unescape(re.sub(r"<[^>]+>", "", text))
+
+
+def is_undeliverable(chat_id, error):
+    """Личка недоступна: бот заблокирован или пользователь ни разу не писал боту"""
+    if chat_id <= 0:
+        return False
+    return isinstance(error, Forbidden) or "chat not found" in str(error).lower()
+
+
+class Outbox:
+    """Пул обработчиков, разбирающих сохраненную в базе очередь исходящих сообщений.
+
+    Сообщение помечается отправленным сразу после успешной отправки, поэтому после
+    перезапуска повторно может уйти не больше одного сообщения на обработчик.
+    """
+
+    def __init__(self, db, delivery, workers=OUTBOX_WORKERS, batch_size=CLAIM_BATCH,
+                 max_attempts=MAX_ATTEMPTS, base_delay=BASE_RETRY_DELAY, undeliverable_ttl=UNDELIVERABLE_TTL):
+        self.db = db
+        self.delivery = delivery
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.undeliverable_ttl = undeliverable_ttl
+        self._wakeup = asyncio.Event()
+        self._tasks = []
+        # Итоги текущего разбора очереди и число обработчиков, занятых пачкой
+        self._drain = None
+        self._busy = 0
+
+    async def start(self):
+        """Восстановление прерванных отправок и запуск обработчиков"""
+        await self.db.recover_outbox()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        logger.info(f"✅ Outbox started with {self.workers} workers")
+
+    async def stop(self):
+        """Остановка обработчиков; недоставленные сообщения остаются в базе"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def wake(self):
+        """Сигнал обработчикам, что в очереди появились сообщения"""
+        self._wakeup.set()
+
+    async def _work(self):
+        while True:
+            try:
+                self._wakeup.clear()
+                rows = await self.db.claim_outbox(self.batch_size)
+                if not rows:
+                    self._finish_drain()
+                    self.delivery.drop_idle_buckets()
+                    await self._sleep()
+                    continue
+
+                if self._drain is None:
+                    self._drain = DeliveryStats()
+                stats = self._drain
+                self._busy += 1
+                try:
+                    for row in rows:
+                        await self._deliver(*row, stats)
+                finally:
+                    self._busy -= 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Outbox worker error: {e}")
+                await asyncio.sleep(POLL_INTERVAL)
+
+    def _finish_drain(self):
+        """Очередь опустела: итоги разбора в метрику и лог"""
+        stats = self._drain
+        if stats is None or self._busy:
+            return
+        self._drain = None
+        stats.elapsed = time.monotonic() - stats.started
+        if stats.sent:
+            FANOUT_THROUGHPUT.observe(stats.throughput)
+        if stats.sent or stats.failed:
+            logger.info(f"📬 Рассылка завершена: {stats}")
+
+    async def _sleep(self):
+        """Ожидание новых сообщений или ближайшего отложенного повтора"""
+        next_time = await self.db.get_next_outbox_time()
+        timeout = POLL_INTERVAL if next_time is None else min(POLL_INTERVAL, max(0, next_time - time.time()))
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _send(self, chat_id, text, parse_mode, stats):
+        """Отправка; если Telegram не принял разметку, сообщение уходит без нее"""
+        try:
+            await self.delivery.deliver(chat_id, text, stats=stats, parse_mode=parse_mode)
+        except BadRequest as e:
+            if not parse_mode or "chat not found" in str(e).lower():
+                raise
+            logger.warning(f"Message to {chat_id} rejected with {parse_mode} markup, sending as plain text: {e}")
+            await self.delivery.deliver(chat_id, plain_text(text), stats=stats)
+
+    async def _deliver(self, message_id, chat_id, text, parse_mode, attempts, stats):
+        try:
+            await self._send(chat_id, text, parse_mode, stats)
+        except (Forbidden, BadRequest) as e:
+            logger.warning(f"Outbox message {message_id} to {chat_id} is undeliverable: {e}")
+            await self.db.fail_outbox(message_id, str(e))
+            # Следующие рассылки не тратят на этого пользователя запрос к API
+            if is_undeliverable(chat_id, e):
+                await self.db.mark_undeliverable(chat_id, str(e), self.undeliverable_ttl)
+        except Exception as e:
+            attempts += 1
+            if attempts >= self.max_attempts:
+                logger.error(f"Outbox message {message_id} to {chat_id} moved to dead letter: {e}")
+                await self.db.fail_outbox(message_id, str(e))
+            else:
+                delay = self.base_delay * 2 ** (attempts - 1)
+                logger.warning(f"Outbox message {message_id} to {chat_id} failed, retry in {delay}s: {e}")
+                await self.db.fail_outbox(message_id, str(e), time.time() + delay)
+        else:
+            await self.db.complete_outbox(message_id)
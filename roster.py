@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import time
+from chat_cache import ChatCache
+
+logger = logging.getLogger(__name__)
+
+# Как часто накопленные изменения состава записываются в базу
+FLUSH_INTERVAL = 5
+# Сколько чатов держать в памяти и через сколько секунд перечитывать состав из базы
+# (его пополняют и другие процессы кластера)
+ROSTER_CACHE_SIZE = 1024
+ROSTER_TTL = 600
+
+
+class ChatRoster:
+    """Состав чатов: кэш в памяти и отложенная пачечная запись в chat_members.
+
+    seen/left только меняют множества в памяти, поэтому обработка сообщений
+    не ждет базу. Раз в FLUSH_INTERVAL секунд накопленное записывается одной
+    транзакцией; участник, уже известный кэшу, повторно не записывается.
+    """
+
+    def __init__(self, db, flush_interval=FLUSH_INTERVAL, capacity=ROSTER_CACHE_SIZE, ttl=ROSTER_TTL):
+        self.db = db
+        self.flush_interval = flush_interval
+        self.ttl = ttl
+        # chat_id -> [участники, время загрузки из базы или None, если состав известен не полностью]
+        self._chats = ChatCache(capacity)
+        self._joined = set()
+        self._left = set()
+        self._task = None
+
+    def _entry(self, chat_id):
+        entry = self._chats.get(chat_id)
+        if entry is None:
+            entry = [set(), None]
+            self._chats.put(chat_id, entry)
+        return entry
+
+    def seen(self, chat_id, user_id):
+        """Пользователь есть в чате: написал сообщение или вступил"""
+        members = self._entry(chat_id)[0]
+        if user_id in members:
+            return
+        members.add(user_id)
+        self._left.discard((chat_id, user_id))
+        self._joined.add((chat_id, user_id))
+
+    def left(self, chat_id, user_id):
+        """Пользователь вышел из чата или удален"""
+        entry = self._chats.get(chat_id)
+        if entry is not None:
+            entry[0].discard(user_id)
+        self._joined.discard((chat_id, user_id))
+        self._left.add((chat_id, user_id))
+
+    async def flush(self):
+        """Запись накопленных изменений состава одной транзакцией"""
+        if not self._joined and not self._left:
+            return
+        joined, left = self._joined, self._left
+        self._joined, self._left = set(), set()
+        try:
+            await self.db.update_chat_members(list(joined), list(left))
+        except Exception as e:
+            logger.error(f"Error saving chat members: {e}")
+            # Возвращаем в очередь то, что не перекрыто более новыми событиями
+            self._joined.update(joined - self._left)
+            self._left.update(left - self._joined)
+
+    async def members_for_chats(self, chat_ids):
+        """Участники нескольких чатов: {chat_id: [user_id, ...]}; из базы читаются только устаревшие"""
+        await self.flush()
+        now = time.monotonic()
+        members, stale = {}, []
+        for chat_id in chat_ids:
+            entry = self._chats.get(chat_id)
+            if entry is not None and entry[1] is not None and now - entry[1] <= self.ttl:
+                members[chat_id] = list(entry[0])
+            else:
+                stale.append(chat_id)
+
+        if stale:
+            loaded = await self.db.get_members_for_chats(stale)
+            for chat_id, user_ids in loaded.items():
+                entry = self._entry(chat_id)
+                entry[0], entry[1] = set(user_ids), now
+            members.update(loaded)
+        return members
+
+    async def start(self):
+        """Запуск периодической записи"""
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Остановка с записью того, что накопилось"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
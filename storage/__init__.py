@@ -0,0 +1,13 @@
+"""Хранилище бота: запросы (Database), их асинхронная обертка и backend'ы.
+
+open_backend выбирает backend по имени базы: ":memory:" - база в памяти,
+иначе файл SQLite.
+"""
+from storage.backend import StorageBackend
+from storage.sqlite import SQLiteBackend, DEFAULT_PRAGMAS, STATEMENT_CACHE_SIZE
+from storage.memory import MemoryBackend
+from storage.backup import create_backup, list_backups, copy_database
+from storage.database import (
+    Database, AsyncDatabase, open_backend, month_day_key, celebrated_month_days, MIGRATIONS,
+    OUTBOX_PENDING, OUTBOX_SENDING, OUTBOX_SENT, OUTBOX_DEAD,
+)
@@ -0,0 +1,24 @@
+class StorageBackend:
+    """Интерфейс backend'а хранилища: выдача соединений SQLite для Database.
+
+    name - имя базы (файл или ":memory:");
+    readers - сколько чтений может идти параллельно с записью.
+    """
+
+    name = None
+    readers = 0
+
+    def writer(self):
+        """Контекстный менеджер с соединением для записи: одна транзакция на блок with"""
+        raise NotImplementedError
+
+    def reader(self):
+        """Контекстный менеджер с соединением для чтения (может совпадать с писателем)"""
+        raise NotImplementedError
+
+    def backup_source(self):
+        """Контекстный менеджер с соединением, из которого снимается резервная копия"""
+        raise NotImplementedError
+
+    def close(self):
+        """Закрытие всех соединений"""
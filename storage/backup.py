@@ -0,0 +1,113 @@
+import gzip
+import logging
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime
+from metrics import BACKUP_DURATION, BACKUP_PROGRESS, BACKUP_LAST_SUCCESS, BACKUP_FAILURES
+
+logger = logging.getLogger(__name__)
+
+# Страниц за один шаг копирования и пауза между шагами: между шагами база
+# свободна, и писатели не ждут окончания всей копии
+BACKUP_STEP_PAGES = 1024
+BACKUP_STEP_SLEEP = 0.005
+# Если база все время меняется, постраничная копия начинается заново;
+# после стольких перезапусков копируем одним шагом
+MAX_RESTARTS = 5
+
+BACKUP_SUFFIX = ".db"
+
+
+class _BackupRestarting(Exception):
+    pass
+
+
+def copy_database(source, target, pages=BACKUP_STEP_PAGES, sleep=BACKUP_STEP_SLEEP):
+    """Копия базы source в target через SQLite backup API шагами по pages страниц.
+
+    Запись в базу другим соединением между шагами перезапускает копирование;
+    при частых перезапусках остаток копируется одним шагом - в режиме WAL
+    чтение снимка писателей не блокирует.
+    """
+    restarts = 0
+    last_remaining = None
+
+    def progress(status, remaining, total):
+        nonlocal restarts, last_remaining
+        BACKUP_PROGRESS.set((total - remaining) / total if total else 1.0)
+        if last_remaining is not None and remaining > last_remaining:
+            restarts += 1
+            if restarts > MAX_RESTARTS:
+                raise _BackupRestarting
+        last_remaining = remaining
+
+    try:
+        source.backup(target, pages=pages, progress=progress, sleep=sleep)
+    except _BackupRestarting:
+        logger.warning(f"Backup restarted {restarts} times, copying the rest in one step")
+        source.backup(target)
+    BACKUP_PROGRESS.set(1.0)
+
+
+def _compress(path, target_path):
+    with open(path, "rb") as src, gzip.open(target_path, "wb", compresslevel=6) as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+
+
+def list_backups(directory, prefix):
+    """Готовые копии базы prefix в каталоге, от старых к новым"""
+    if not os.path.isdir(directory):
+        return []
+    names = [
+        name for name in os.listdir(directory)
+        if name.startswith(prefix + ".backup_") and (name.endswith(BACKUP_SUFFIX) or name.endswith(BACKUP_SUFFIX + ".gz"))
+    ]
+    return [os.path.join(directory, name) for name in sorted(names)]
+
+
+def prune_backups(directory, prefix, keep):
+    """Удаление копий сверх keep последних"""
+    backups = list_backups(directory, prefix)
+    for path in backups[:max(0, len(backups) - keep)]:
+        os.remove(path)
+    return max(0, len(backups) - keep)
+
+
+def create_backup(backend, directory, keep=24, compress=True, pages=BACKUP_STEP_PAGES, sleep=BACKUP_STEP_SLEEP):
+    """Снимок базы в directory; возвращает путь к файлу копии.
+
+    Копия собирается во временном файле и появляется под своим именем только
+    целиком, поэтому в каталоге не бывает оборванных копий.
+    """
+    os.makedirs(directory, exist_ok=True)
+    prefix = os.path.splitext(os.path.basename(backend.name))[0] if backend.name != ":memory:" else "memory"
+    path = os.path.join(directory, f"{prefix}.backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}{BACKUP_SUFFIX}")
+    tmp_path = path + ".tmp"
+
+    start = time.perf_counter()
+    try:
+        target = sqlite3.connect(tmp_path)
+        try:
+            with backend.backup_source() as source:
+                copy_database(source, target, pages, sleep)
+        finally:
+            target.close()
+
+        if compress:
+            _compress(tmp_path, path + ".gz.tmp")
+            os.remove(tmp_path)
+            tmp_path, path = path + ".gz.tmp", path + ".gz"
+        os.replace(tmp_path, path)
+    except Exception:
+        BACKUP_FAILURES.inc()
+        for leftover in (tmp_path, path + ".gz.tmp"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        raise
+
+    BACKUP_DURATION.observe(time.perf_counter() - start)
+    BACKUP_LAST_SUCCESS.set(time.time())
+    prune_backups(directory, prefix, keep)
+    return path
@@ -0,0 +1,783 @@
+import asyncio
+import calendar
+import functools
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+import json
+from metrics import DB_LATENCY
+from storage.sqlite import SQLiteBackend
+from storage.memory import MemoryBackend
+from storage.backup import create_backup
+
+# Миграции схемы: после применения i-го элемента PRAGMA user_version = i + 1
+MIGRATIONS = (
+    # 1: нормализованный ключ "ММ-ДД" вместо substr() в запросах и индексы под него
+    (
+        "ALTER TABLE birthdays ADD COLUMN month_day TEXT",
+        "UPDATE birthdays SET month_day = substr(birthday_date, 6, 5)",
+        "CREATE INDEX IF NOT EXISTS idx_birthdays_month_day ON birthdays (month_day)",
+        "CREATE INDEX IF NOT EXISTS idx_birthdays_chat_month_day ON birthdays (chat_id, month_day)",
+    ),
+    # 2: очередь исходящих сообщений (outbox)
+    (
+        """
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            idempotency_key TEXT NOT NULL UNIQUE,
+            chat_id INTEGER NOT NULL,
+            text TEXT NOT NULL,
+            parse_mode TEXT,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL DEFAULT 0,
+            claim_token TEXT,
+            last_error TEXT,
+            created_at REAL NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_outbox_pending ON outbox (next_attempt_at) WHERE status = 'pending'",
+        "CREATE INDEX IF NOT EXISTS idx_outbox_status ON outbox (status)",
+    ),
+    # 3: группы тегов, их участники и альтернативные написания по чатам
+    (
+        """
+        CREATE TABLE IF NOT EXISTS tag_groups (
+            chat_id INTEGER NOT NULL,
+            group_name TEXT NOT NULL,
+            PRIMARY KEY (chat_id, group_name)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS tag_group_members (
+            chat_id INTEGER NOT NULL,
+            group_name TEXT NOT NULL,
+            username TEXT NOT NULL,
+            PRIMARY KEY (chat_id, group_name, username)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS tag_group_aliases (
+            chat_id INTEGER NOT NULL,
+            group_name TEXT NOT NULL,
+            alias TEXT NOT NULL,
+            PRIMARY KEY (chat_id, alias)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_tag_group_aliases_group ON tag_group_aliases (chat_id, group_name)",
+    ),
+    # 4: аренды (leases) для выбора единственного процесса-планировщика
+    (
+        """
+        CREATE TABLE IF NOT EXISTS leases (
+            name TEXT PRIMARY KEY,
+            holder TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS scheduler_requests (
+            name TEXT PRIMARY KEY,
+            requested_at REAL NOT NULL
+        )
+        """,
+    ),
+    # 5: постраничный список чата по (month_day, user_id) - индекс целиком задает порядок
+    (
+        "CREATE INDEX IF NOT EXISTS idx_birthdays_chat_month_day_user ON birthdays (chat_id, month_day, user_id)",
+        "DROP INDEX IF EXISTS idx_birthdays_chat_month_day",
+    ),
+    # 6: часовой пояс и час рассылки чатов; next_run_at - ближайший момент рассылки (UTC)
+    (
+        """
+        CREATE TABLE IF NOT EXISTS chat_settings (
+            chat_id INTEGER PRIMARY KEY,
+            tz TEXT,
+            delivery_hour INTEGER,
+            next_run_at REAL NOT NULL DEFAULT 0
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_chat_settings_next_run ON chat_settings (next_run_at)",
+        # Уже известные чаты обрабатываются первой же проверкой и получают свое расписание
+        "INSERT OR IGNORE INTO chat_settings (chat_id) SELECT DISTINCT chat_id FROM birthdays",
+    ),
+    # 7: состав чатов - получатели напоминаний, а не только записавшие свой ДР
+    (
+        """
+        CREATE TABLE IF NOT EXISTS chat_members (
+            chat_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            PRIMARY KEY (chat_id, user_id)
+        ) WITHOUT ROWID
+        """,
+        "INSERT OR IGNORE INTO chat_members (chat_id, user_id) SELECT DISTINCT chat_id, user_id FROM birthdays",
+    ),
+    # 8: пользователи, которым бот не может написать в личку (до expires_at)
+    (
+        """
+        CREATE TABLE IF NOT EXISTS undeliverable_users (
+            user_id INTEGER PRIMARY KEY,
+            error TEXT,
+            expires_at REAL NOT NULL
+        )
+        """,
+    ),
+)
+
+# Статусы сообщений в outbox
+OUTBOX_PENDING = 'pending'
+OUTBOX_SENDING = 'sending'
+OUTBOX_SENT = 'sent'
+OUTBOX_DEAD = 'dead'
+
+
+def month_day_key(birthday_date):
+    """Ключ "ММ-ДД" для даты в формате ГГГГ-ММ-ДД"""
+    return birthday_date[5:10]
+
+
+def celebrated_month_days(day):
+    """Ключи "ММ-ДД" дней рождения, которые отмечаются в день day.
+
+    Родившиеся 29 февраля в невисокосный год празднуют 28-го.
+    """
+    key = day.strftime("%m-%d")
+    if key == "02-28" and not calendar.isleap(day.year):
+        return (key, "02-29")
+    return (key,)
+
+
+def open_backend(db_name, **kwargs):
+    """Backend для базы db_name: ":memory:" - в памяти процесса, иначе файл SQLite"""
+    if db_name == ":memory:":
+        return MemoryBackend(**kwargs)
+    return SQLiteBackend(db_name, **kwargs)
+
+
+class Database:
+    """Все запросы бота к хранилищу; соединения выдает backend (pool)"""
+
+    def __init__(self, db_name='birthdays.db', pool=None):
+        self.pool = pool or open_backend(db_name)
+        self.db_name = self.pool.name
+        self.init_db()
+
+    def init_db(self):
+        """Инициализация базы данных"""
+        with self.pool.writer() as conn:
+            # Создаем таблицу для дней рождения
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS birthdays (
+                    user_id INTEGER,
+                    chat_id INTEGER,
+                    birthday_date TEXT,
+                    username TEXT,
+                    first_name TEXT,
+                    last_name TEXT,
+                    PRIMARY KEY (user_id, chat_id)
+                )
+            ''')
+
+            # Создаем таблицу для отслеживания отправленных напоминаний
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS sent_reminders (
+                    user_id INTEGER,
+                    chat_id INTEGER,
+                    reminder_date TEXT,
+                    reminder_type TEXT,
+                    PRIMARY KEY (user_id, chat_id, reminder_date, reminder_type)
+                )
+            ''')
+
+            self.migrate(conn)
+
+        print("✅ База данных инициализирована")
+
+    def migrate(self, conn):
+        """Применение недостающих миграций схемы"""
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        for number, statements in enumerate(MIGRATIONS[version:], version + 1):
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f'PRAGMA user_version = {number}')
+            print(f"🔧 Применена миграция базы данных №{number}")
+
+    def close(self):
+        """Закрытие соединений с базой"""
+        self.pool.close()
+
+    def add_birthday(self, user_id, chat_id, birthday_date, username, first_name, last_name, next_run_at=0):
+        """Добавление дня рождения; новый чат попадает в расписание рассылки с моментом next_run_at"""
+        with self.pool.writer() as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO birthdays (user_id, chat_id, birthday_date, username, first_name, last_name, month_day)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (user_id, chat_id, birthday_date, username, first_name, last_name, month_day_key(birthday_date)))
+            conn.execute(
+                'INSERT OR IGNORE INTO chat_settings (chat_id, next_run_at) VALUES (?, ?)', (chat_id, next_run_at)
+            )
+            conn.execute('INSERT OR IGNORE INTO chat_members (chat_id, user_id) VALUES (?, ?)', (chat_id, user_id))
+
+        print(f"✅ День рождения сохранен для user_id: {user_id}")
+
+    def add_birthdays(self, chat_id, rows, next_run_at=0):
+        """Пачка дней рождения чата одной транзакцией (executemany).
+
+        rows - список (user_id, birthday_date, username, first_name, last_name).
+        """
+        with self.pool.writer() as conn:
+            conn.executemany('''
+                INSERT OR REPLACE INTO birthdays (user_id, chat_id, birthday_date, username, first_name, last_name, month_day)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', [
+                (user_id, chat_id, birthday_date, username, first_name, last_name, month_day_key(birthday_date))
+                for user_id, birthday_date, username, first_name, last_name in rows
+            ])
+            conn.executemany(
+                'INSERT OR IGNORE INTO chat_members (chat_id, user_id) VALUES (?, ?)', [(chat_id, row[0]) for row in rows]
+            )
+            conn.execute(
+                'INSERT OR IGNORE INTO chat_settings (chat_id, next_run_at) VALUES (?, ?)', (chat_id, next_run_at)
+            )
+        return len(rows)
+
+    def get_all_birthdays(self):
+        """Получение всех дней рождения"""
+        with self.pool.reader() as conn:
+            return conn.execute(
+                'SELECT user_id, chat_id, birthday_date, username, first_name, last_name FROM birthdays'
+            ).fetchall()
+
+    def get_chat_birthdays(self, chat_id):
+        """Получение дней рождения для конкретного чата"""
+        with self.pool.reader() as conn:
+            return conn.execute('''
+                SELECT user_id, chat_id, birthday_date, username, first_name, last_name
+                FROM birthdays
+                WHERE chat_id = ?
+            ''', (chat_id,)).fetchall()
+
+    def get_chat_birthdays_page(self, chat_id, cursor=None, limit=20, before=False):
+        """Страница дней рождения чата в порядке (month_day, user_id).
+
+        cursor - ключ (month_day, user_id) соседней строки: страница берется после
+        него или, если before, до него. Строки всегда в прямом порядке.
+        """
+        with self.pool.reader() as conn:
+            if cursor is None:
+                return conn.execute('''
+                    SELECT user_id, chat_id, birthday_date, username, first_name, last_name
+                    FROM birthdays
+                    WHERE chat_id = ?
+                    ORDER BY month_day, user_id
+                    LIMIT ?
+                ''', (chat_id, limit)).fetchall()
+
+            if before:
+                rows = conn.execute('''
+                    SELECT user_id, chat_id, birthday_date, username, first_name, last_name
+                    FROM birthdays
+                    WHERE chat_id = ? AND (month_day, user_id) < (?, ?)
+                    ORDER BY month_day DESC, user_id DESC
+                    LIMIT ?
+                ''', (chat_id, *cursor, limit)).fetchall()
+                rows.reverse()
+                return rows
+
+            return conn.execute('''
+                SELECT user_id, chat_id, birthday_date, username, first_name, last_name
+                FROM birthdays
+                WHERE chat_id = ? AND (month_day, user_id) > (?, ?)
+                ORDER BY month_day, user_id
+                LIMIT ?
+            ''', (chat_id, *cursor, limit)).fetchall()
+
+    def iter_chat_birthdays(self, chat_id, batch_size=1000):
+        """Дни рождения чата пачками по batch_size строк (fetchmany), в порядке списка"""
+        with self.pool.reader() as conn:
+            cursor = conn.execute('''
+                SELECT user_id, chat_id, birthday_date, username, first_name, last_name
+                FROM birthdays
+                WHERE chat_id = ?
+                ORDER BY month_day, user_id
+            ''', (chat_id,))
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+
+    def count_chat_birthdays(self, chat_id):
+        """Количество дней рождения в чате (по индексу, без чтения строк)"""
+        with self.pool.reader() as conn:
+            return conn.execute('SELECT COUNT(*) FROM birthdays WHERE chat_id = ?', (chat_id,)).fetchone()[0]
+
+    def get_chat_members(self, chat_id):
+        """Получение всех участников чата"""
+        with self.pool.reader() as conn:
+            members = conn.execute('SELECT user_id FROM chat_members WHERE chat_id = ?', (chat_id,)).fetchall()
+
+        return [member[0] for member in members]
+
+    def get_members_for_chats(self, chat_ids):
+        """Участники нескольких чатов одним запросом: {chat_id: [user_id, ...]}"""
+        members = {chat_id: [] for chat_id in chat_ids}
+        if not members:
+            return members
+
+        with self.pool.reader() as conn:
+            rows = conn.execute('''
+                SELECT chat_id, user_id FROM chat_members
+                WHERE chat_id IN (SELECT value FROM json_each(?))
+            ''', (json.dumps(list(members)),)).fetchall()
+
+        for chat_id, user_id in rows:
+            members[chat_id].append(user_id)
+        return members
+
+    def update_chat_members(self, joined=(), left=()):
+        """Пачка изменений состава одной транзакцией: joined и left - списки (chat_id, user_id)"""
+        with self.pool.writer() as conn:
+            conn.executemany('INSERT OR IGNORE INTO chat_members (chat_id, user_id) VALUES (?, ?)', joined)
+            conn.executemany('DELETE FROM chat_members WHERE chat_id = ? AND user_id = ?', left)
+
+    def get_user_birthday(self, user_id, chat_id):
+        """Получение дня рождения конкретного пользователя"""
+        with self.pool.reader() as conn:
+            return conn.execute(
+                'SELECT user_id, chat_id, birthday_date, username, first_name, last_name '
+                'FROM birthdays WHERE user_id = ? AND chat_id = ?', (user_id, chat_id)
+            ).fetchone()
+
+    def delete_birthday(self, user_id, chat_id):
+        """Удаление дня рождения"""
+        with self.pool.writer() as conn:
+            conn.execute('DELETE FROM birthdays WHERE user_id = ? AND chat_id = ?', (user_id, chat_id))
+
+        print(f"✅ День рождения удален для user_id: {user_id}")
+
+    def get_birthdays_between(self, chat_id, start, end, limit=-1):
+        """ДР чата с ключом "ММ-ДД" от start до end включительно, по кругу года.
+
+        При start > end диапазон проходит через Новый год: сначала конец года,
+        затем его начало. Оба куска читаются по индексу (chat_id, month_day,
+        user_id) уже в нужном порядке, без сортировки.
+        """
+        query = '''
+            SELECT user_id, chat_id, birthday_date, username, first_name, last_name
+            FROM birthdays
+            WHERE chat_id = ? AND month_day BETWEEN ? AND ?
+            ORDER BY month_day, user_id
+            LIMIT ?
+        '''
+        with self.pool.reader() as conn:
+            if start <= end:
+                return conn.execute(query, (chat_id, start, end, limit)).fetchall()
+
+            rows = conn.execute(query, (chat_id, start, "12-31", limit)).fetchall()
+            if limit < 0 or len(rows) < limit:
+                rows += conn.execute(query, (chat_id, "01-01", end, limit - len(rows) if limit >= 0 else -1)).fetchall()
+            return rows
+
+    def get_pending_birthdays(self, reminder_date, chat_ids=None):
+        """Дни рождения на дату reminder_date и следующий день, по которым еще нет записи в sent_reminders.
+
+        Один запрос по индексу month_day с антиджойном: ДР в день reminder_date
+        проверяются на тип "congrats", на следующий день - на тип "reminder".
+        chat_ids ограничивает проверку чатами, для которых наступил час рассылки.
+        """
+        today = date.fromisoformat(reminder_date)
+        targets = [(key, "congrats") for key in celebrated_month_days(today)]
+        targets += [(key, "reminder") for key in celebrated_month_days(today + timedelta(days=1))]
+        params = [value for target in targets for value in target] + [reminder_date]
+        if chat_ids is not None:
+            params.append(json.dumps(list(chat_ids)))
+
+        with self.pool.reader() as conn:
+            rows = conn.execute(f'''
+                SELECT b.user_id, b.chat_id, b.birthday_date, b.username, b.first_name, b.last_name,
+                       t.reminder_type
+                FROM (SELECT ? AS month_day, ? AS reminder_type
+                      {"UNION ALL SELECT ?, ? " * (len(targets) - 1)}) AS t
+                JOIN birthdays AS b ON b.month_day = t.month_day
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM sent_reminders AS s
+                    WHERE s.user_id = b.user_id AND s.chat_id = b.chat_id
+                      AND s.reminder_date = ? AND s.reminder_type = t.reminder_type
+                )
+                {"AND b.chat_id IN (SELECT value FROM json_each(?))" if chat_ids is not None else ""}
+            ''', params).fetchall()
+
+        today_birthdays = [row[:6] for row in rows if row[6] == "congrats"]
+        tomorrow_birthdays = [row[:6] for row in rows if row[6] == "reminder"]
+        print(f"🎯 Ожидают отправки: поздравлений {len(today_birthdays)}, напоминаний {len(tomorrow_birthdays)}")
+        return today_birthdays, tomorrow_birthdays
+
+    def add_sent_reminder(self, user_id, chat_id, reminder_date, reminder_type):
+        """Добавление записи об отправленном напоминании"""
+        with self.pool.writer() as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO sent_reminders (user_id, chat_id, reminder_date, reminder_type)
+                VALUES (?, ?, ?, ?)
+            ''', (user_id, chat_id, reminder_date, reminder_type))
+
+        print(f"✅ Напоминание сохранено для user_id: {user_id}, тип: {reminder_type}")
+
+    def is_reminder_sent(self, user_id, chat_id, reminder_date, reminder_type):
+        """Проверка, было ли уже отправлено напоминание"""
+        with self.pool.reader() as conn:
+            result = conn.execute('''
+                SELECT 1 FROM sent_reminders
+                WHERE user_id = ? AND chat_id = ? AND reminder_date = ? AND reminder_type = ?
+            ''', (user_id, chat_id, reminder_date, reminder_type)).fetchone()
+
+        return result is not None
+
+    def cleanup_old_reminders(self, days=3):
+        """Очистка старых напоминаний (старше days дней)"""
+        cutoff = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+
+        with self.pool.writer() as conn:
+            cursor = conn.execute('''
+                DELETE FROM sent_reminders
+                WHERE reminder_date < ?
+            ''', (cutoff,))
+            deleted_count = cursor.rowcount
+
+        if deleted_count > 0:
+            print(f"🧹 Удалено старых напоминаний: {deleted_count}")
+
+    # === ГРУППЫ ТЕГОВ ===
+
+    def get_tag_groups(self, chat_id):
+        """Группы тегов чата в формате groups_data; пустой словарь, если своих групп нет"""
+        with self.pool.reader() as conn:
+            names = conn.execute(
+                'SELECT group_name FROM tag_groups WHERE chat_id = ? ORDER BY rowid', (chat_id,)
+            ).fetchall()
+            members = conn.execute(
+                'SELECT group_name, username FROM tag_group_members WHERE chat_id = ? ORDER BY rowid', (chat_id,)
+            ).fetchall()
+            aliases = conn.execute(
+                'SELECT group_name, alias FROM tag_group_aliases WHERE chat_id = ? ORDER BY rowid', (chat_id,)
+            ).fetchall()
+
+        groups = {name: {"members": [], "aliases": []} for name, in names}
+        for group_name, username in members:
+            groups[group_name]["members"].append({"username": username})
+        for group_name, alias in aliases:
+            groups[group_name]["aliases"].append(alias)
+        return groups
+
+    def create_tag_group(self, chat_id, group_name, aliases=()):
+        """Создание группы тегов; возвращает False, если имя уже занято"""
+        with self.pool.writer() as conn:
+            taken = conn.execute('''
+                SELECT 1 FROM tag_groups WHERE chat_id = ? AND group_name = ?
+                UNION ALL
+                SELECT 1 FROM tag_group_aliases WHERE chat_id = ? AND alias = ?
+            ''', (chat_id, group_name, chat_id, group_name)).fetchone()
+            if taken:
+                return False
+
+            conn.execute('INSERT INTO tag_groups (chat_id, group_name) VALUES (?, ?)', (chat_id, group_name))
+            conn.executemany(
+                'INSERT OR IGNORE INTO tag_group_aliases (chat_id, group_name, alias) VALUES (?, ?, ?)',
+                [(chat_id, group_name, alias) for alias in aliases if alias != group_name]
+            )
+        return True
+
+    def delete_tag_group(self, chat_id, group_name):
+        """Удаление группы тегов вместе с участниками и написаниями"""
+        with self.pool.writer() as conn:
+            deleted = conn.execute(
+                'DELETE FROM tag_groups WHERE chat_id = ? AND group_name = ?', (chat_id, group_name)
+            ).rowcount
+            conn.execute('DELETE FROM tag_group_members WHERE chat_id = ? AND group_name = ?', (chat_id, group_name))
+            conn.execute('DELETE FROM tag_group_aliases WHERE chat_id = ? AND group_name = ?', (chat_id, group_name))
+        return deleted > 0
+
+    def add_tag_members(self, chat_id, group_name, usernames):
+        """Добавление участников в группу тегов; возвращает число добавленных"""
+        with self.pool.writer() as conn:
+            return conn.executemany('''
+                INSERT OR IGNORE INTO tag_group_members (chat_id, group_name, username)
+                SELECT chat_id, group_name, ? FROM tag_groups WHERE chat_id = ? AND group_name = ?
+            ''', [(username, chat_id, group_name) for username in usernames]).rowcount
+
+    def remove_tag_members(self, chat_id, group_name, usernames):
+        """Удаление участников из группы тегов; возвращает число удаленных"""
+        with self.pool.writer() as conn:
+            return conn.executemany(
+                'DELETE FROM tag_group_members WHERE chat_id = ? AND group_name = ? AND username = ?',
+                [(chat_id, group_name, username) for username in usernames]
+            ).rowcount
+
+    def add_tag_aliases(self, chat_id, group_name, aliases):
+        """Добавление альтернативных написаний; занятые написания пропускаются"""
+        with self.pool.writer() as conn:
+            return conn.executemany('''
+                INSERT OR IGNORE INTO tag_group_aliases (chat_id, group_name, alias)
+                SELECT chat_id, group_name, ? FROM tag_groups
+                WHERE chat_id = ? AND group_name = ?
+                  AND NOT EXISTS (SELECT 1 FROM tag_groups WHERE chat_id = ? AND group_name = ?)
+            ''', [(alias, chat_id, group_name, chat_id, alias) for alias in aliases]).rowcount
+
+    # === НЕДОСТУПНЫЕ ДЛЯ ЛИЧНЫХ СООБЩЕНИЙ ===
+
+    def mark_undeliverable(self, user_id, error, ttl):
+        """Пользователю не доставить личное сообщение: не пытаться ttl секунд"""
+        with self.pool.writer() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO undeliverable_users (user_id, error, expires_at) VALUES (?, ?, ?)',
+                (user_id, error, time.time() + ttl)
+            )
+
+    def clear_undeliverable(self, user_id):
+        """Пользователь открыл личный чат с ботом; True, если он был в списке"""
+        with self.pool.writer() as conn:
+            return conn.execute('DELETE FROM undeliverable_users WHERE user_id = ?', (user_id,)).rowcount > 0
+
+    def get_undeliverable(self, user_ids):
+        """Те из user_ids, кому сейчас не отправить личное сообщение"""
+        user_ids = list(user_ids)
+        if not user_ids:
+            return set()
+        with self.pool.reader() as conn:
+            rows = conn.execute('''
+                SELECT user_id FROM undeliverable_users
+                WHERE user_id IN (SELECT value FROM json_each(?)) AND expires_at > ?
+            ''', (json.dumps(user_ids), time.time())).fetchall()
+        return {row[0] for row in rows}
+
+    def cleanup_undeliverable(self):
+        """Удаление истекших записей"""
+        with self.pool.writer() as conn:
+            conn.execute('DELETE FROM undeliverable_users WHERE expires_at <= ?', (time.time(),))
+
+    # === НАСТРОЙКИ ЧАТОВ И РАСПИСАНИЕ РАССЫЛКИ ===
+
+    def get_chat_settings(self, chat_id):
+        """(часовой пояс, час рассылки) чата; None - значение по умолчанию"""
+        with self.pool.reader() as conn:
+            row = conn.execute('SELECT tz, delivery_hour FROM chat_settings WHERE chat_id = ?', (chat_id,)).fetchone()
+        return row or (None, None)
+
+    def set_chat_settings(self, chat_id, tz, delivery_hour, next_run_at):
+        """Сохранение настроек чата вместе с пересчитанным моментом рассылки"""
+        with self.pool.writer() as conn:
+            conn.execute('''
+                INSERT INTO chat_settings (chat_id, tz, delivery_hour, next_run_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (chat_id) DO UPDATE SET
+                    tz = excluded.tz, delivery_hour = excluded.delivery_hour, next_run_at = excluded.next_run_at
+            ''', (chat_id, tz, delivery_hour, next_run_at))
+
+    def get_due_chats(self, now=None):
+        """Чаты, момент рассылки которых наступил: (chat_id, tz, delivery_hour).
+
+        Читается только начало индекса по next_run_at, остальные чаты не затрагиваются.
+        """
+        now = time.time() if now is None else now
+        with self.pool.reader() as conn:
+            return conn.execute(
+                'SELECT chat_id, tz, delivery_hour FROM chat_settings WHERE next_run_at <= ? ORDER BY next_run_at',
+                (now,)
+            ).fetchall()
+
+    def reschedule_chats(self, schedule):
+        """Новые моменты рассылки: schedule - список (next_run_at, chat_id)"""
+        with self.pool.writer() as conn:
+            conn.executemany('UPDATE chat_settings SET next_run_at = ? WHERE chat_id = ?', schedule)
+
+    def get_next_run_at(self):
+        """Ближайший момент рассылки среди всех чатов или None, если чатов нет"""
+        with self.pool.reader() as conn:
+            return conn.execute('SELECT MIN(next_run_at) FROM chat_settings').fetchone()[0]
+
+    # === АРЕНДЫ (ВЫБОР ЛИДЕРА) ===
+
+    def acquire_lease(self, name, holder, ttl):
+        """Захват или продление аренды на ttl секунд.
+
+        Удается, если аренды нет, она истекла или уже принадлежит holder.
+        """
+        now = time.time()
+        with self.pool.writer() as conn:
+            acquired = conn.execute('''
+                INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT (name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at
+                WHERE leases.holder = excluded.holder OR leases.expires_at < ?
+            ''', (name, holder, now + ttl, now)).rowcount
+        return acquired > 0
+
+    def release_lease(self, name, holder):
+        """Досрочное освобождение аренды"""
+        with self.pool.writer() as conn:
+            conn.execute('DELETE FROM leases WHERE name = ? AND holder = ?', (name, holder))
+
+    def add_scheduler_request(self, name):
+        """Просьба лидеру выполнить задачу вне расписания"""
+        with self.pool.writer() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO scheduler_requests (name, requested_at) VALUES (?, ?)', (name, time.time())
+            )
+
+    def pop_scheduler_request(self, name):
+        """Забрать просьбу о задаче; True, если она была"""
+        with self.pool.writer() as conn:
+            return conn.execute('DELETE FROM scheduler_requests WHERE name = ?', (name,)).rowcount > 0
+
+    # === ИСХОДЯЩИЕ СООБЩЕНИЯ (OUTBOX) ===
+
+    def enqueue_outbox(self, messages, reminders=()):
+        """Постановка сообщений в очередь.
+
+        messages - список (ключ идемпотентности, chat_id, текст, parse_mode);
+        reminders - записи sent_reminders, которые фиксируются в той же транзакции.
+        Сообщения с уже известным ключом пропускаются. Возвращает число новых сообщений.
+        """
+        now = time.time()
+        with self.pool.writer() as conn:
+            enqueued = conn.executemany('''
+                INSERT OR IGNORE INTO outbox (idempotency_key, chat_id, text, parse_mode, created_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', [(key, chat_id, text, parse_mode, now) for key, chat_id, text, parse_mode in messages]).rowcount
+
+            conn.executemany('''
+                INSERT OR REPLACE INTO sent_reminders (user_id, chat_id, reminder_date, reminder_type)
+                VALUES (?, ?, ?, ?)
+            ''', reminders)
+
+        return enqueued
+
+    def claim_outbox(self, limit, now=None):
+        """Захват пачки готовых к отправке сообщений.
+
+        Возвращает список (id, chat_id, текст, parse_mode, попыток).
+        """
+        now = now or time.time()
+        token = uuid.uuid4().hex
+        with self.pool.writer() as conn:
+            conn.execute('''
+                UPDATE outbox SET status = ?, claim_token = ?
+                WHERE id IN (
+                    SELECT id FROM outbox
+                    WHERE status = ? AND next_attempt_at <= ?
+                    ORDER BY next_attempt_at, id
+                    LIMIT ?
+                )
+            ''', (OUTBOX_SENDING, token, OUTBOX_PENDING, now, limit))
+            return conn.execute('''
+                SELECT id, chat_id, text, parse_mode, attempts FROM outbox
+                WHERE claim_token = ? AND status = ?
+                ORDER BY id
+            ''', (token, OUTBOX_SENDING)).fetchall()
+
+    def complete_outbox(self, message_id):
+        """Отметка об успешной отправке"""
+        with self.pool.writer() as conn:
+            conn.execute(
+                'UPDATE outbox SET status = ?, attempts = attempts + 1, claim_token = NULL WHERE id = ?',
+                (OUTBOX_SENT, message_id)
+            )
+
+    def fail_outbox(self, message_id, error, next_attempt_at=None):
+        """Неудачная попытка: повтор в next_attempt_at или, если он не задан, в dead letter"""
+        status = OUTBOX_DEAD if next_attempt_at is None else OUTBOX_PENDING
+        with self.pool.writer() as conn:
+            conn.execute('''
+                UPDATE outbox
+                SET status = ?, attempts = attempts + 1, next_attempt_at = ?, last_error = ?, claim_token = NULL
+                WHERE id = ?
+            ''', (status, next_attempt_at or 0, error, message_id))
+
+    def recover_outbox(self):
+        """Возврат в очередь сообщений, захваченных до падения процесса"""
+        with self.pool.writer() as conn:
+            recovered = conn.execute(
+                'UPDATE outbox SET status = ?, claim_token = NULL WHERE status = ?',
+                (OUTBOX_PENDING, OUTBOX_SENDING)
+            ).rowcount
+
+        if recovered:
+            print(f"♻️ Возвращено в очередь сообщений после перезапуска: {recovered}")
+        return recovered
+
+    def get_next_outbox_time(self):
+        """Время ближайшей запланированной попытки или None, если очередь пуста"""
+        with self.pool.reader() as conn:
+            return conn.execute(
+                'SELECT MIN(next_attempt_at) FROM outbox WHERE status = ?', (OUTBOX_PENDING,)
+            ).fetchone()[0]
+
+    def cleanup_outbox(self, days=3):
+        """Удаление давно отправленных сообщений"""
+        before = time.time() - days * 86400
+        with self.pool.writer() as conn:
+            conn.execute('DELETE FROM outbox WHERE status = ? AND created_at < ?', (OUTBOX_SENT, before))
+
+    def backup_database(self, directory='backups', keep=24, compress=True):
+        """Резервная копия базы через backup API без остановки записи; возвращает путь"""
+        path = create_backup(self.pool, directory, keep=keep, compress=compress)
+        print(f"✅ Создана резервная копия: {path}")
+        return path
+
+    def get_database_stats(self):
+        """Получение статистики базы данных"""
+        with self.pool.reader() as conn:
+            # Количество записей о днях рождения
+            birthdays_count = conn.execute('SELECT COUNT(*) FROM birthdays').fetchone()[0]
+
+            # Количество уникальных чатов
+            chats_count = conn.execute('SELECT COUNT(DISTINCT chat_id) FROM birthdays').fetchone()[0]
+
+            # Количество уникальных пользователей
+            users_count = conn.execute('SELECT COUNT(DISTINCT user_id) FROM birthdays').fetchone()[0]
+
+        return {
+            'birthdays_count': birthdays_count,
+            'chats_count': chats_count,
+            'users_count': users_count
+        }
+
+
+class AsyncDatabase:
+    """Асинхронная обертка над Database: каждый метод становится awaitable и
+    выполняется в выделенных потоках, не блокируя цикл событий бота"""
+
+    def __init__(self, db, workers=None, max_pending=1000):
+        self.db = db
+        # Писатель один, поэтому больше потоков, чем читателей + 1, не нужно
+        workers = workers or db.pool.readers + 1
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='db')
+        # Ограничение очереди запросов: при перегрузке обработчики ждут, а не копят задачи
+        self._pending = asyncio.Semaphore(max_pending)
+
+    async def run(self, func, *args, **kwargs):
+        """Выполнение синхронной функции в потоке базы данных"""
+        start = time.perf_counter()
+        try:
+            async with self._pending:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+        finally:
+            DB_LATENCY.observe(time.perf_counter() - start, func.__name__)
+
+    def __getattr__(self, name):
+        attr = getattr(self.db, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def method(*args, **kwargs):
+            return await self.run(attr, *args, **kwargs)
+
+        # Кэшируем обертку, чтобы не создавать ее на каждый вызов
+        setattr(self, name, method)
+        return method
+
+    def close(self):
+        """Остановка потоков и закрытие соединений"""
+        self._executor.shutdown(wait=True)
+        self.db.close()
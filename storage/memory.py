@@ -0,0 +1,50 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from storage.backend import StorageBackend
+from storage.sqlite import STATEMENT_CACHE_SIZE
+
+# WAL и fsync для базы в памяти не имеют смысла
+MEMORY_PRAGMAS = (
+    ("temp_store", "MEMORY"),
+)
+
+
+class MemoryBackend(StorageBackend):
+    """База в памяти процесса: для бенчмарков и проверок без файлов на диске.
+
+    Одно соединение на чтение и запись - база в памяти существует, пока оно
+    открыто, а параллельные читатели ей не нужны.
+    """
+
+    name = ":memory:"
+    readers = 0
+
+    def __init__(self, pragmas=MEMORY_PRAGMAS):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(":memory:", check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE)
+        for name, value in pragmas:
+            self._conn.execute(f"PRAGMA {name} = {value}")
+
+    @contextmanager
+    def writer(self):
+        """Соединение для записи: одна транзакция, коммит при успехе, откат при ошибке"""
+        with self._lock:
+            with self._conn:
+                yield self._conn
+
+    @contextmanager
+    def reader(self):
+        """То же соединение, что и для записи"""
+        with self._lock:
+            yield self._conn
+
+    @contextmanager
+    def backup_source(self):
+        """База в памяти доступна только через свое соединение"""
+        with self._lock:
+            yield self._conn
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,81 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from storage.backend import StorageBackend
+
+# Настройки соединений SQLite: WAL позволяет читателям не блокировать писателя,
+# synchronous=NORMAL в режиме WAL не делает fsync на каждый коммит
+DEFAULT_PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("cache_size", -16000),  # ~16 МБ страничного кэша на соединение
+    ("temp_store", "MEMORY"),
+    ("busy_timeout", 5000),
+)
+
+# Сколько подготовленных выражений хранит каждое соединение
+STATEMENT_CACHE_SIZE = 256
+
+
+def connect(db_name, pragmas=DEFAULT_PRAGMAS):
+    """Открытие соединения с настройками производительности"""
+    conn = sqlite3.connect(
+        db_name,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE
+    )
+    for name, value in pragmas:
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+
+class SQLiteBackend(StorageBackend):
+    """Файл SQLite с долгоживущими соединениями: один писатель и пул читателей"""
+
+    def __init__(self, db_name, readers=4, pragmas=DEFAULT_PRAGMAS):
+        self.name = db_name
+        self.pragmas = pragmas
+        self.readers = readers
+        self._write_lock = threading.Lock()
+        self._writer = connect(db_name, pragmas)
+        self._readers = queue.LifoQueue()
+        for _ in range(readers):
+            self._readers.put(connect(db_name, pragmas))
+
+    @contextmanager
+    def writer(self):
+        """Соединение для записи: одна транзакция, коммит при успехе, откат при ошибке"""
+        with self._write_lock:
+            with self._writer:
+                yield self._writer
+
+    @contextmanager
+    def reader(self):
+        """Соединение для чтения из пула"""
+        if not self.readers:
+            with self._write_lock:
+                yield self._writer
+            return
+
+        conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    @contextmanager
+    def backup_source(self):
+        """Отдельное соединение для копии: пулы чтения и записи остаются свободны"""
+        conn = connect(self.name, self.pragmas)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def close(self):
+        """Закрытие всех соединений"""
+        with self._write_lock:
+            self._writer.close()
+        while not self._readers.empty():
+            self._readers.get_nowait().close()
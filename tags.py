@@ -0,0 +1,306 @@
+import asyncio
+import html
+import itertools
+import logging
+import re
+from chat_cache import ChatCache
+
+logger = logging.getLogger(__name__)
+
+# Сколько индексов чатов держать в памяти
+TAG_CACHE_SIZE = 256
+
+# Окно объединения ответов на один тег в чате (секунд) и сколько сообщений
+# перечислять в объединенном ответе
+TAG_COALESCE_WINDOW = 3.0
+MAX_COALESCED_LINKS = 10
+
+# Допустимые username Telegram и названия/написания тегов (одно слово, как в тексте сообщения)
+USERNAME_PATTERN = re.compile(r"[A-Za-z0-9_]{5,32}")
+TAG_NAME_PATTERN = re.compile(r"\w{1,32}")
+
+# Окончания, с которыми тег все еще узнается (для русских слов): @тренер + "а" -> @тренера
+TAG_ENDINGS = ("", "а", "у", "ов", "ам", "ами", "ах", "и", "ы")
+
+
+def is_valid_username(username):
+    """Username Telegram (без @): 5-32 латинских букв, цифр или _"""
+    return USERNAME_PATTERN.fullmatch(username) is not None
+
+
+def is_valid_tag_name(name):
+    """Название или написание тега (без @): одно слово до 32 символов"""
+    return TAG_NAME_PATTERN.fullmatch(name) is not None
+
+
+def build_group_mapping(groups_data):
+    """Словарь {название или альтернативное написание: группа}"""
+    group_mapping = {}
+    for group_name, group_info in groups_data.items():
+        # Основное имя
+        group_mapping[group_name] = group_name
+        # Альтернативные имена
+        for alias in group_info["aliases"]:
+            group_mapping[alias] = group_name
+    return group_mapping
+
+
+def expand_tag_forms(group_mapping, endings=TAG_ENDINGS):
+    """Все написания тега (без @, в нижнем регистре), которые узнаются как группа.
+
+    Кроме самих имен это основы, к которым достаточно дописать окончание, чтобы
+    получить имя: "тренер" + "ов" -> "тренеров". При совпадении побеждает точное
+    имя, затем окончание, стоящее раньше в списке.
+    """
+    forms = dict(group_mapping)
+    for ending in endings:
+        if not ending:
+            continue
+        for name, group_name in group_mapping.items():
+            if name.endswith(ending):
+                stem = name[:-len(ending)]
+                if stem and stem not in forms and not stem.endswith(ending):
+                    forms[stem] = group_name
+    return forms
+
+
+def _trie_pattern(node):
+    """Регулярное выражение из префиксного дерева: общие префиксы проверяются один раз"""
+    alternatives = [re.escape(char) + _trie_pattern(child) for char, child in sorted(node.items()) if char]
+    if not alternatives:
+        return ""
+
+    pattern = alternatives[0] if len(alternatives) == 1 else "(?:" + "|".join(alternatives) + ")"
+    if "" in node:
+        # Здесь заканчивается одно из написаний, продолжение необязательно
+        pattern = "(?:" + pattern + ")?"
+    return pattern
+
+
+class TagMatcher:
+    """Поиск тегов групп в тексте сообщения за один проход.
+
+    Все написания всех групп собираются в префиксное дерево и компилируются в одно
+    регулярное выражение, поэтому сообщение не разбивается на слова и для слов без
+    тега не создается ни одной строки.
+    """
+
+    def __init__(self, group_mapping, endings=TAG_ENDINGS):
+        self.forms = expand_tag_forms(group_mapping, endings)
+
+        trie = {}
+        for form in self.forms:
+            node = trie
+            for char in form:
+                node = node.setdefault(char, {})
+            node[""] = {}
+
+        # Тег - это отдельное слово: начинается с @ после пробела или начала текста
+        # и заканчивается пробелом или концом текста
+        self._pattern = re.compile(
+            r"(?<!\S)@+(" + _trie_pattern(trie) + r")(?!\S)", re.IGNORECASE
+        ) if self.forms else None
+
+    def lookup(self, tag):
+        """Группа для одного тега (с @ или без)"""
+        return self.forms.get(tag.lower().lstrip('@'))
+
+    def find(self, text):
+        """Группа первого тега в тексте или None"""
+        if self._pattern is None or '@' not in text:
+            return None
+
+        match = self._pattern.search(text)
+        if match is None:
+            return None
+        return self.forms.get(match.group(1).lower())
+
+
+def render_mention(group_info):
+    """Строка упоминаний участников группы"""
+    return " ".join(f"@{member['username']}" for member in group_info["members"] if member['username'])
+
+
+def _render_aliases(aliases):
+    text = ", ".join(f"@{html.escape(alias)}" for alias in aliases[:3])
+    if len(aliases) > 3:
+        text += f" и ещё {len(aliases) - 3}"
+    return text
+
+
+def render_groups_text(groups_data):
+    """Текст ответа на /groups"""
+    lines = ["👥 <b>Состав групп:</b>\n"]
+    for group_name, group_info in groups_data.items():
+        lines.append(f"<b>{html.escape(group_name.upper())}:</b>")
+        for i, member in enumerate(group_info["members"], 1):
+            lines.append(f"{i}. @{html.escape(member['username'])}")
+
+        # Показываем альтернативные написания
+        if group_info.get("aliases"):
+            lines.append(f"   🔄 Также: {_render_aliases(group_info['aliases'])}")
+
+        lines.append("")
+
+    lines.append("💡 <b>Использование:</b> Напишите в чате @название_группы")
+    lines.append("Примеры: @стафф, @стаф, @штаб (все ведут к одной группе)")
+    return "\n".join(lines)
+
+
+def render_tags_text(groups_data):
+    """Текст ответа на /tags"""
+    lines = ["🏷️ <b>Доступные теги:</b>\n", "<b>Основные названия:</b>"]
+    lines.extend(f"• @{html.escape(group_name)}" for group_name in groups_data)
+
+    lines.append("\n<b>Альтернативные написания:</b>")
+    for group_name, group_info in groups_data.items():
+        if group_info.get("aliases"):
+            lines.append(f"• @{html.escape(group_name)} → также: {_render_aliases(group_info['aliases'])}")
+
+    lines.append("\n🤖 <b>Примеры использования:</b>")
+    lines.append("• @стафф, @стаф, @штаб - упоминают стафф")
+    lines.append("• @тренер, @тренера, @тренеры - упоминают тренеров")
+    lines.append("• @хуёжник, @хуежник - упоминают хуёжника\n")
+    lines.append("💡 <b>Просто напишите в чате нужный тег!</b>")
+    return "\n".join(lines)
+
+
+class TagIndex:
+    """Скомпилированный поиск тегов и заранее отрисованные ответы для одного набора групп.
+
+    Строится один раз на версию конфигурации групп: при ответе на тег и на
+    /groups, /tags строки не собираются заново. Названия и username в HTML
+    экранируются: группы чата задают администраторы.
+    """
+
+    def __init__(self, groups_data, version=1):
+        self.version = version
+        self.groups_data = groups_data
+        self.group_mapping = build_group_mapping(groups_data)
+        self.matcher = TagMatcher(self.group_mapping)
+
+        self.mentions = {}
+        self.replies = {}
+        for group_name, group_info in groups_data.items():
+            mention_text = render_mention(group_info)
+            self.mentions[group_name] = mention_text
+            if mention_text:
+                # Ответ с HTML и запасной вариант без разметки
+                self.replies[group_name] = (
+                    f"🏷️ <b>Тег группы:</b> {html.escape(group_name)}\n\n{html.escape(mention_text)}",
+                    f"🏷️ Тег группы: {group_name}\n\n{mention_text}",
+                )
+
+        self.groups_text = render_groups_text(groups_data)
+        self.tags_text = render_tags_text(groups_data)
+
+
+class TagRegistry:
+    """Индексы тегов по чатам с вытеснением давно не использованных (LRU).
+
+    Группы чата загружаются из базы при первом обращении; чат без своих групп
+    использует стандартный набор. После изменения групп чата достаточно вызвать
+    invalidate - следующее сообщение загрузит свежий состав.
+    """
+
+    def __init__(self, loader, default_groups, capacity=TAG_CACHE_SIZE):
+        self.loader = loader
+        self._versions = itertools.count(1)
+        self._indexes = ChatCache(capacity)
+        self.default_index = TagIndex(default_groups, version=next(self._versions))
+
+    async def get(self, chat_id):
+        """Индекс тегов чата"""
+        index = self._indexes.get(chat_id)
+        if index is not None:
+            return index
+
+        generation = self._indexes.generation(chat_id)
+        groups = await self.loader(chat_id)
+        index = TagIndex(groups, version=next(self._versions)) if groups else self.default_index
+        self._indexes.put(chat_id, index, generation)
+        return index
+
+    def invalidate(self, chat_id):
+        """Сброс индекса чата после изменения его групп"""
+        self._indexes.invalidate(chat_id)
+
+
+def message_link(chat_id, message_id):
+    """Ссылка на сообщение супергруппы или None (у обычных групп ссылок нет)"""
+    chat = str(chat_id)
+    if not chat.startswith("-100"):
+        return None
+    return f"https://t.me/c/{chat[4:]}/{message_id}"
+
+
+def render_coalesced(reply, chat_id, message_ids):
+    """Ответ на тег (HTML и без разметки) с перечислением остальных сообщений окна"""
+    html_text, plain_text = reply
+    others = message_ids[1:]
+    if not others:
+        return html_text, plain_text
+
+    links = [message_link(chat_id, message_id) for message_id in others[:MAX_COALESCED_LINKS]]
+    if links[0] is None:
+        suffix = f"\n\n💬 И еще сообщений с этим тегом: {len(others)}"
+        return html_text + suffix, plain_text + suffix
+
+    more = f" и еще {len(others) - len(links)}" if len(others) > len(links) else ""
+    html_links = ", ".join(f'<a href="{link}">{i}</a>' for i, link in enumerate(links, 2))
+    return (
+        f"{html_text}\n\n💬 Тег также в сообщениях: {html_links}{more}",
+        f"{plain_text}\n\n💬 Тег также в сообщениях: {' '.join(links)}{more}",
+    )
+
+
+class TagCoalescer:
+    """Один ответ на повторные упоминания группы в чате за окно window секунд.
+
+    На первое упоминание отвечают сразу (add возвращает True), и оно открывает
+    окно; следующие только дописывают номер сообщения: O(1), без блокировок
+    (все происходит в цикле событий). По истечении окна запись удаляется и, если
+    повторы были, уходит один ответ на первый из них со ссылками на остальные.
+    """
+
+    def __init__(self, send, window=TAG_COALESCE_WINDOW):
+        self.send = send
+        self.window = window
+        # (chat_id, группа) -> [ответ, номера сообщений, таймер]
+        self._pending = {}
+        self._tasks = set()
+
+    def add(self, chat_id, group_name, reply, message_id):
+        """Упоминание группы в сообщении message_id. True - первое за окно, ответить
+        на него нужно сразу; False - повтор, он войдет в общий ответ по окончании окна"""
+        if self.window <= 0:
+            return True
+        key = (chat_id, group_name)
+        entry = self._pending.get(key)
+        if entry is not None:
+            entry[1].append(message_id)
+            return False
+        timer = asyncio.get_running_loop().call_later(self.window, self._flush, key)
+        self._pending[key] = [reply, [], timer]
+        return True
+
+    def _flush(self, key):
+        reply, message_ids, _ = self._pending.pop(key)
+        if not message_ids:
+            return
+        task = asyncio.create_task(self._send(key[0], reply, message_ids))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, chat_id, reply, message_ids):
+        try:
+            await self.send(chat_id, render_coalesced(reply, chat_id, message_ids), message_ids[0])
+        except Exception as e:
+            logger.error(f"Error sending coalesced tag reply: {e}")
+
+    async def close(self):
+        """Немедленная отправка повторов из всех открытых окон (при остановке бота)"""
+        for key, entry in list(self._pending.items()):
+            entry[2].cancel()
+            self._flush(key)
+        await asyncio.gather(*self._tasks, return_exceptions=True)
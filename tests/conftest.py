@@ -0,0 +1,36 @@
+import contextlib
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Тесты не трогают рабочую базу
+os.environ["DATABASE_NAME"] = ":memory:"
+
+from telegram import Bot
+from telegram.request import HTTPXRequest
+
+from benchmarks.fake_bot_api import FakeBotAPI
+
+TEST_TOKEN = "123456:TEST"
+
+
+@contextlib.asynccontextmanager
+async def running_fake_api(**options):
+    """Заглушка Bot API и бот, направленный на нее: async with ... as (api, bot)"""
+    api = await FakeBotAPI(**options).start()
+    bot = Bot(TEST_TOKEN, base_url=api.url, request=HTTPXRequest(connection_pool_size=64))
+    try:
+        async with bot:
+            yield api, bot
+    finally:
+        await api.stop()
+
+
+@pytest.fixture
+def fake_api():
+    """Фабрика заглушки Bot API для тестов, запускающих свой цикл событий"""
+    return running_fake_api
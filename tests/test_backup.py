@@ -0,0 +1,76 @@
+import gzip
+import os
+import shutil
+import sqlite3
+
+import pytest
+
+from storage import Database, copy_database, create_backup, list_backups
+from storage import backup
+from storage.backup import prune_backups
+
+CHAT_ID = -100
+
+
+@pytest.fixture
+def database(tmp_path):
+    db = Database(str(tmp_path / "bot.db"))
+    db.add_birthdays(CHAT_ID, [(user_id, "1990-05-01", "", f"User {user_id}", "") for user_id in range(1, 501)])
+    yield db
+    db.close()
+
+
+def test_gzip_backup_can_be_restored(database, tmp_path):
+    path = create_backup(database.pool, str(tmp_path / "backups"), sleep=0)
+    assert path.endswith(".db.gz")
+
+    restored = tmp_path / "restored.db"
+    with gzip.open(path, "rb") as src, open(restored, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    copy = Database(str(restored))
+    try:
+        assert copy.count_chat_birthdays(CHAT_ID) == 500
+        assert sorted(copy.get_chat_birthdays(CHAT_ID)) == sorted(database.get_chat_birthdays(CHAT_ID))
+    finally:
+        copy.close()
+    # Рядом с копией не остается временных файлов
+    assert os.listdir(tmp_path / "backups") == [os.path.basename(path)]
+
+
+def test_copy_in_small_steps_matches_source(database):
+    target = sqlite3.connect(":memory:")
+    try:
+        with database.pool.backup_source() as source:
+            copy_database(source, target, pages=1, sleep=0)
+        assert target.execute('SELECT COUNT(*) FROM birthdays').fetchone()[0] == 500
+    finally:
+        target.close()
+
+
+def test_prune_keeps_newest_backups(tmp_path):
+    names = [f"bot.backup_20261018_0{hour}0000.db.gz" for hour in range(5)]
+    for name in names + ["bot.backup_notes.txt", "other.backup_20261018_000000.db"]:
+        (tmp_path / name).write_bytes(b"")
+
+    assert prune_backups(str(tmp_path), "bot", 2) == 3
+    assert [os.path.basename(path) for path in list_backups(str(tmp_path), "bot")] == names[-2:]
+    # Чужие файлы не трогаем
+    assert (tmp_path / "bot.backup_notes.txt").exists()
+    assert (tmp_path / "other.backup_20261018_000000.db").exists()
+    assert prune_backups(str(tmp_path), "bot", 2) == 0
+
+
+@pytest.mark.parametrize("broken", ["copy_database", "_compress"])
+def test_failed_backup_leaves_no_files(database, tmp_path, monkeypatch, broken):
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(backup, broken, fail)
+    directory = tmp_path / "backups"
+    directory.mkdir()
+    (directory / "bot.backup_20261018_000000.db.gz").write_bytes(b"old")
+
+    with pytest.raises(OSError):
+        create_backup(database.pool, str(directory), keep=0, sleep=0)
+    # Ни временных файлов, ни удаления старых копий при ошибке
+    assert os.listdir(directory) == ["bot.backup_20261018_000000.db.gz"]
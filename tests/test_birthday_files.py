@@ -0,0 +1,74 @@
+import io
+import json
+from datetime import date
+
+import pytest
+
+from birthday_files import IMPORT_CHUNK, ImportFileError, export_to_file, import_birthdays, open_text
+from storage import Database
+
+CHAT_ID = -100
+TODAY = date(2026, 10, 18)
+
+
+@pytest.fixture
+def database():
+    db = Database(":memory:")
+    yield db
+    db.close()
+
+
+def csv_rows(count):
+    return "".join(f"{user_id},{user_id % 28 + 1:02d}.05.1990,user{user_id},Name{user_id},\n"
+                   for user_id in range(1, count + 1))
+
+
+def test_export_import_round_trip(database):
+    database.add_birthdays(CHAT_ID, [(1, "1990-05-01", "ann", "Ann", "Lee"), (2, "1985-12-31", "", "Bob", "")])
+    for fmt, filename in (("csv", "birthdays.csv"), ("json", "birthdays.json")):
+        exported = io.BytesIO()
+        assert export_to_file(database, CHAT_ID, exported, fmt) == 2
+        exported.seek(0)
+        imported, errors, month_days = import_birthdays(database, -200, open_text(exported), filename, TODAY)
+        assert (imported, errors, month_days) == (2, [], {"05-01", "12-31"})
+        assert sorted(database.get_chat_birthdays(-200)) == sorted(
+            (user_id, -200, *rest) for user_id, _, *rest in database.get_chat_birthdays(CHAT_ID))
+        database.delete_birthday(1, -200)
+        database.delete_birthday(2, -200)
+
+
+def test_bad_rows_are_skipped(database):
+    stream = io.StringIO("user_id;birthday\n1;01.05.1990\nx;01.05.1990\n3;31.02.1990\n4;01.01.2030\n5;1990-07-08\n")
+    imported, errors, _ = import_birthdays(database, CHAT_ID, stream, "birthdays.csv", TODAY)
+    assert imported == 2
+    # Номера записей считаются с первой записи после заголовка
+    assert errors == [2, 3, 4]
+
+
+def test_error_numbers_count_records_not_lines(database):
+    stream = io.StringIO('user_id,birthday,first_name\n1,01.05.1990,"Ann\nLee"\n2,31.02.1990,Bob\n')
+    assert import_birthdays(database, CHAT_ID, stream, "birthdays.csv", TODAY)[:2] == (1, [2])
+    stream = io.StringIO('[{"user_id": 1, "birthday": "1990-05-01"},\n\n{"user_id": "x"}]')
+    assert import_birthdays(database, -200, stream, "birthdays.json", TODAY)[:2] == (1, [2])
+
+
+def test_broken_csv_reports_rows_saved_before_error(database):
+    count = IMPORT_CHUNK + 10
+    stream = io.StringIO("user_id,birthday,username,first_name,last_name\n" + csv_rows(count)
+                         + f'{count + 1},01.01.1990,"{"x" * 200000}",,\n')
+    with pytest.raises(ImportFileError) as error:
+        import_birthdays(database, CHAT_ID, stream, "birthdays.csv", TODAY)
+    assert error.value.imported == count
+    assert f"(после записи {count})" in str(error.value)
+    assert database.count_chat_birthdays(CHAT_ID) == count
+
+
+def test_broken_json_reports_rows_saved_before_error(database):
+    count = IMPORT_CHUNK + 10
+    records = ",".join(json.dumps({"user_id": user_id, "birthday": "1990-05-01"}) for user_id in range(1, count + 1))
+    stream = io.StringIO(f"[{records}, {{\"user_id\": oops}}]")
+    with pytest.raises(ImportFileError) as error:
+        import_birthdays(database, CHAT_ID, stream, "birthdays.json", TODAY)
+    assert error.value.imported == count
+    assert error.value.month_days == {"05-01"}
+    assert database.count_chat_birthdays(CHAT_ID) == count
@@ -0,0 +1,80 @@
+import asyncio
+
+from birthdays import PAGE_SIZE, BirthdayPages, parse_page_callback, row_key
+from storage import Database, AsyncDatabase
+
+CHAT_ID = -100
+
+
+def make_pages(count):
+    """База в памяти с count днями рождения в чате и кэш страниц поверх нее"""
+    db = AsyncDatabase(Database(":memory:"))
+    # Несколько человек на одну дату - порядок внутри даты задает user_id
+    db.db.add_birthdays(CHAT_ID, [
+        (user_id, f"1990-{user_id % 12 + 1:02d}-{user_id % 3 + 1:02d}", "", f"User {user_id}", "")
+        for user_id in range(1, count + 1)
+    ])
+    return db, BirthdayPages(db.get_chat_birthdays_page, db.count_chat_birthdays)
+
+
+async def follow(pages, data):
+    before, number, cursor = parse_page_callback(data)
+    return await pages.get(CHAT_ID, cursor, before, number)
+
+
+def test_pages_cover_chat_in_order_without_duplicates():
+    async def scenario():
+        db, pages = make_pages(2 * PAGE_SIZE + 5)
+        try:
+            page = await pages.get(CHAT_ID)
+            seen = list(page.rows)
+            numbers = [page.number]
+            while page.next_data:
+                page = await follow(pages, page.next_data)
+                seen += page.rows
+                numbers.append(page.number)
+            return seen, numbers, page
+        finally:
+            db.close()
+
+    seen, numbers, last = asyncio.run(scenario())
+    assert numbers == [1, 2, 3]
+    assert len(seen) == 2 * PAGE_SIZE + 5
+    assert [row_key(row) for row in seen] == sorted(row_key(row) for row in seen)
+    assert last.pages == 3 and last.prev_data is not None
+
+
+def test_previous_page_matches_forward_page():
+    async def scenario():
+        db, pages = make_pages(3 * PAGE_SIZE)
+        try:
+            first = await pages.get(CHAT_ID)
+            second = await follow(pages, first.next_data)
+            third = await follow(pages, second.next_data)
+            back = await follow(pages, third.prev_data)
+            return first, second, third, back, await follow(pages, back.prev_data)
+        finally:
+            db.close()
+
+    first, second, third, back, back_to_first = asyncio.run(scenario())
+    assert third.next_data is None
+    assert back.rows == second.rows and back.number == 2
+    assert back_to_first.rows == first.rows and back_to_first.prev_data is None
+
+
+def test_invalidate_reloads_changed_chat():
+    async def scenario():
+        db, pages = make_pages(3)
+        try:
+            cached = await pages.get(CHAT_ID)
+            await db.add_birthday(99, CHAT_ID, "1990-01-01", "", "New", "")
+            stale = await pages.get(CHAT_ID)
+            pages.invalidate(CHAT_ID)
+            return cached, stale, await pages.get(CHAT_ID)
+        finally:
+            db.close()
+
+    cached, stale, fresh = asyncio.run(scenario())
+    assert stale is cached
+    assert fresh.total == 4
+    assert 99 in [row[0] for row in fresh.rows]
@@ -0,0 +1,77 @@
+from datetime import date
+
+import pytest
+
+from birthdays import celebration_window, next_celebration, render_month
+from storage import Database, celebrated_month_days
+
+CHAT_ID = -100
+
+
+@pytest.fixture
+def database():
+    db = Database(":memory:")
+    db.add_birthdays(CHAT_ID, [
+        (1, "1990-12-20", "", "Dec20", ""),
+        (2, "1991-12-28", "", "Dec28", ""),
+        (3, "1992-12-31", "", "Dec31", ""),
+        (4, "1993-01-01", "", "Jan01", ""),
+        (5, "1994-01-05", "", "Jan05", ""),
+        (6, "1995-01-20", "", "Jan20", ""),
+        (7, "1996-02-29", "", "Feb29", ""),
+        (8, "1997-02-27", "", "Feb27", ""),
+    ])
+    yield db
+    db.close()
+
+
+def names(rows):
+    return [row[4] for row in rows]
+
+
+def test_window_wraps_over_new_year():
+    assert celebration_window(date(2026, 12, 25), 14) == ("12-25", "01-07")
+    assert celebration_window(date(2026, 12, 25), 1000) == ("12-25", "12-24")
+
+
+def test_window_ending_on_feb_28_includes_feb_29_in_non_leap_year():
+    assert celebration_window(date(2027, 2, 20), 9) == ("02-20", "02-29")
+    assert celebration_window(date(2028, 2, 20), 9) == ("02-20", "02-28")
+
+
+def test_next_celebration():
+    assert next_celebration("1990-01-03", date(2026, 12, 25)) == date(2027, 1, 3)
+    assert next_celebration("1990-12-25", date(2026, 12, 25)) == date(2026, 12, 25)
+    # 29 февраля в невисокосный год отмечается 28-го
+    assert next_celebration("1996-02-29", date(2027, 2, 1)) == date(2027, 2, 28)
+    assert next_celebration("1996-02-29", date(2027, 3, 1)) == date(2028, 2, 29)
+
+
+def test_celebrated_month_days_feb_29():
+    assert celebrated_month_days(date(2027, 2, 28)) == ("02-28", "02-29")
+    assert celebrated_month_days(date(2028, 2, 28)) == ("02-28",)
+    assert celebrated_month_days(date(2028, 2, 29)) == ("02-29",)
+
+
+def test_between_wraps_in_calendar_order(database):
+    start, end = celebration_window(date(2026, 12, 25), 14)
+    assert names(database.get_birthdays_between(CHAT_ID, start, end)) == ["Dec28", "Dec31", "Jan01", "Jan05"]
+
+
+@pytest.mark.parametrize("limit, expected", [
+    (1, ["Dec28"]),
+    (2, ["Dec28", "Dec31"]),
+    (3, ["Dec28", "Dec31", "Jan01"]),
+    (10, ["Dec28", "Dec31", "Jan01", "Jan05"]),
+])
+def test_between_limit_spans_both_wrap_queries(database, limit, expected):
+    assert names(database.get_birthdays_between(CHAT_ID, "12-25", "01-07", limit)) == expected
+
+
+def test_feb_29_in_non_leap_year(database):
+    start, end = celebration_window(date(2027, 2, 20), 9)
+    assert names(database.get_birthdays_between(CHAT_ID, start, end)) == ["Feb27", "Feb29"]
+
+    rows = database.get_birthdays_between(CHAT_ID, "02-01", "02-31")
+    assert "29.02 - Feb29 (в этом году 28.02)" in render_month(rows, 2, date(2027, 1, 10))
+    assert "(в этом году 28.02)" not in render_month(rows, 2, date(2028, 1, 10))
@@ -0,0 +1,23 @@
+from chat_cache import ChatCache
+
+
+def test_least_recently_used_chat_is_evicted():
+    cache = ChatCache(2)
+    cache.put(1, "a")
+    cache.put(2, "b")
+    assert cache.get(1) == "a"
+    cache.put(3, "c")
+    assert 2 not in cache
+    assert (cache.get(1), cache.get(3), len(cache)) == ("a", "c", 2)
+
+
+def test_load_started_before_invalidate_is_not_stored():
+    cache = ChatCache(2)
+    generation = cache.generation(1)
+    cache.invalidate(1)
+    assert not cache.put(1, "stale", generation)
+    assert cache.get(1) is None
+    assert cache.put(1, "fresh", cache.generation(1))
+    assert cache.get(1) == "fresh"
+    # Сброс одного чата не мешает загрузкам других
+    assert cache.put(2, "other", 0)
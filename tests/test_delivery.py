@@ -0,0 +1,80 @@
+import asyncio
+import time
+
+import pytest
+from telegram.error import BadRequest, Forbidden
+
+from benchmarks.fake_bot_api import MAX_MESSAGE_LENGTH
+from delivery import DeliveryEngine, TokenBucket
+
+
+def test_token_bucket_paces_after_burst():
+    async def scenario():
+        bucket = TokenBucket(rate=50, burst=5)
+        start = time.monotonic()
+        for _ in range(15):
+            await bucket.acquire()
+        return time.monotonic() - start
+
+    # 5 токенов сразу, остальные 10 - по 50 в секунду
+    assert asyncio.run(scenario()) >= 0.18
+
+
+def test_token_bucket_pause_blocks_acquire():
+    async def scenario():
+        bucket = TokenBucket(rate=100, burst=10)
+        bucket.pause(0.3)
+        start = time.monotonic()
+        await bucket.acquire()
+        return time.monotonic() - start
+
+    assert asyncio.run(scenario()) >= 0.29
+
+
+def test_global_rate_limits_fan_out(fake_api):
+    async def scenario():
+        async with fake_api() as (api, bot):
+            engine = DeliveryEngine(bot, global_rate=20)
+            start = time.monotonic()
+            await asyncio.gather(*(engine.deliver(chat_id, "reminder") for chat_id in range(1, 31)))
+            return api, time.monotonic() - start
+
+    api, elapsed = asyncio.run(scenario())
+    assert len(api.sent) == 30
+    # 20 сообщений всплеском, еще 10 - со скоростью 20 в секунду
+    assert elapsed >= 0.45
+
+
+def test_retry_after_pauses_and_retries(fake_api):
+    async def scenario():
+        async with fake_api(retry_after=1) as (api, bot):
+            api.flood_next = 1
+            engine = DeliveryEngine(bot)
+            start = time.monotonic()
+            await engine.deliver(-100, "congrats")
+            return api, engine, time.monotonic() - start
+
+    api, engine, elapsed = asyncio.run(scenario())
+    assert api.flood_hits == 1
+    assert api.calls["sendMessage"] == 2
+    assert api.sent == [(-100, "congrats")]
+    assert elapsed >= 0.9
+    assert engine.global_bucket.blocked_until > 0
+
+
+@pytest.mark.parametrize("chat_id, text, error", [
+    (42, "reminder", Forbidden),
+    (43, "x" * (MAX_MESSAGE_LENGTH + 1), BadRequest),
+])
+def test_permanent_errors_fail_fast(fake_api, chat_id, text, error):
+    async def scenario():
+        async with fake_api() as (api, bot):
+            api.blocked_chats.add(42)
+            engine = DeliveryEngine(bot)
+            with pytest.raises(error):
+                await engine.deliver(chat_id, text)
+            return api
+
+    api = asyncio.run(scenario())
+    assert api.calls["sendMessage"] == 1
+    assert api.sent == []
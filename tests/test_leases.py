@@ -0,0 +1,68 @@
+import time
+
+import pytest
+
+from storage import Database
+
+LEASE = "scheduler"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Управляемое время time.time()"""
+    now = [1_000_000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def processes(tmp_path):
+    """Две базы на одном файле - как два процесса бота"""
+    path = str(tmp_path / "birthdays.db")
+    first, second = Database(path), Database(path)
+    yield first, second
+    first.close()
+    second.close()
+
+
+def test_second_holder_waits_for_expiry(processes, clock):
+    first, second = processes
+    assert first.acquire_lease(LEASE, "a", ttl=30)
+    assert not second.acquire_lease(LEASE, "b", ttl=30)
+
+    clock[0] += 29
+    assert not second.acquire_lease(LEASE, "b", ttl=30)
+    clock[0] += 2
+    assert second.acquire_lease(LEASE, "b", ttl=30)
+    # Прежний держатель аренду потерял
+    assert not first.acquire_lease(LEASE, "a", ttl=30)
+
+
+def test_holder_renews_lease(processes, clock):
+    first, second = processes
+    assert first.acquire_lease(LEASE, "a", ttl=30)
+    for _ in range(5):
+        clock[0] += 20
+        assert first.acquire_lease(LEASE, "a", ttl=30)
+        assert not second.acquire_lease(LEASE, "b", ttl=30)
+
+
+def test_release_frees_lease_immediately(processes, clock):
+    first, second = processes
+    assert first.acquire_lease(LEASE, "a", ttl=30)
+    # Чужой release ничего не снимает
+    second.release_lease(LEASE, "b")
+    assert not second.acquire_lease(LEASE, "b", ttl=30)
+
+    first.release_lease(LEASE, "a")
+    assert second.acquire_lease(LEASE, "b", ttl=30)
+
+
+def test_scheduler_request_is_popped_once(processes):
+    first, second = processes
+    assert not first.pop_scheduler_request("birthday_check")
+    second.add_scheduler_request("birthday_check")
+    second.add_scheduler_request("birthday_check")
+    assert first.pop_scheduler_request("birthday_check")
+    assert not first.pop_scheduler_request("birthday_check")
+    assert not second.pop_scheduler_request("birthday_check")
@@ -0,0 +1,121 @@
+import asyncio
+
+import metrics
+from delivery import DeliveryEngine
+from outbox import Outbox, plain_text
+from storage import Database, AsyncDatabase, OUTBOX_DEAD, OUTBOX_PENDING, OUTBOX_SENDING, OUTBOX_SENT
+
+
+def outbox_statuses(db):
+    """{ключ идемпотентности: (статус, попыток)}"""
+    with db.db.pool.reader() as conn:
+        return {key: (status, attempts) for key, status, attempts in
+                conn.execute('SELECT idempotency_key, status, attempts FROM outbox')}
+
+
+async def drain(db, api, bot, count, **options):
+    """Запуск outbox до отправки count сообщений"""
+    outbox = Outbox(db, DeliveryEngine(bot), **options)
+    await outbox.start()
+    try:
+        outbox.wake()
+        await api.wait_sent(count, timeout=10)
+        # Ждем, пока обработчики отметят последние отправки в базе
+        while {status for status, _ in outbox_statuses(db).values()} & {OUTBOX_PENDING, OUTBOX_SENDING}:
+            await asyncio.sleep(0.01)
+    finally:
+        await outbox.stop()
+
+
+def run_with_db(fake_api, scenario, **api_options):
+    """Сценарий scenario(api, bot, db) с заглушкой Bot API и базой в памяти"""
+    async def main():
+        db = AsyncDatabase(Database(":memory:"))
+        try:
+            async with fake_api(**api_options) as (api, bot):
+                return await scenario(api, bot, db)
+        finally:
+            db.close()
+    return asyncio.run(main())
+
+
+def test_duplicate_keys_are_sent_once(fake_api):
+    async def scenario(api, bot, db):
+        message = ("reminder:2026-10-18:1:2", 1, "🎂 <b>Ann</b>", 'HTML')
+        assert await db.enqueue_outbox([message], [(2, -100, "2026-10-18", "reminder")]) == 1
+        assert await db.enqueue_outbox([message]) == 0
+        await drain(db, api, bot, 1)
+        return api, outbox_statuses(db)
+
+    api, statuses = run_with_db(fake_api, scenario)
+    assert api.sent == [(1, "🎂 <b>Ann</b>")]
+    assert statuses == {"reminder:2026-10-18:1:2": (OUTBOX_SENT, 1)}
+
+
+def test_forbidden_goes_to_dead_letter_and_marks_user(fake_api):
+    async def scenario(api, bot, db):
+        api.blocked_chats.add(7)
+        await db.enqueue_outbox([("reminder:7", 7, "hi", None), ("reminder:8", 8, "hi", None)])
+        await drain(db, api, bot, 1)
+        return api, outbox_statuses(db), await db.get_undeliverable({7, 8})
+
+    api, statuses, undeliverable = run_with_db(fake_api, scenario)
+    assert api.sent == [(8, "hi")]
+    assert api.calls["sendMessage"] == 2
+    assert statuses["reminder:7"] == (OUTBOX_DEAD, 1)
+    assert statuses["reminder:8"] == (OUTBOX_SENT, 1)
+    assert undeliverable == {7}
+
+
+def test_claimed_messages_are_requeued_after_restart(fake_api):
+    async def scenario(api, bot, db):
+        await db.enqueue_outbox([("congrats:1", -100, "🎉", None), ("congrats:2", -200, "🎉", None)])
+        # Процесс захватил пачку и упал, не успев отправить
+        assert len(await db.claim_outbox(10)) == 2
+        assert await db.get_next_outbox_time() is None
+        await drain(db, api, bot, 2)
+        return api, outbox_statuses(db)
+
+    api, statuses = run_with_db(fake_api, scenario)
+    assert sorted(api.sent) == [(-200, "🎉"), (-100, "🎉")]
+    assert set(statuses.values()) == {(OUTBOX_SENT, 1)}
+
+
+def test_rejected_markup_is_sent_as_plain_text(fake_api):
+    async def scenario(api, bot, db):
+        await db.enqueue_outbox([("reminder:3", 3, "🎂 <b>Ann</b> <3 &amp; Bob", 'HTML')])
+        await drain(db, api, bot, 1)
+        return api, outbox_statuses(db)
+
+    api, statuses = run_with_db(fake_api, scenario)
+    assert api.sent == [(3, "🎂 Ann <3 & Bob")]
+    assert statuses["reminder:3"] == (OUTBOX_SENT, 1)
+
+
+def test_drain_records_throughput(fake_api, monkeypatch):
+    monkeypatch.setattr(metrics.registry, "enabled", True)
+    monkeypatch.setattr(metrics.FANOUT_THROUGHPUT, "series", {})
+
+    async def scenario(api, bot, db):
+        await db.enqueue_outbox([(f"reminder:{chat_id}", chat_id, "hi", None) for chat_id in range(1, 26)])
+        outbox = Outbox(db, DeliveryEngine(bot), workers=4)
+        await outbox.start()
+        try:
+            outbox.wake()
+            await api.wait_sent(25, timeout=10)
+            # Разбор считается завершенным, когда обработчик находит очередь пустой
+            for _ in range(500):
+                if metrics.FANOUT_THROUGHPUT.series:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await outbox.stop()
+
+    run_with_db(fake_api, scenario)
+    _, total, count = metrics.FANOUT_THROUGHPUT.series[()]
+    assert count == 1
+    assert total > 0
+
+
+def test_plain_text_strips_tags_and_entities():
+    assert plain_text('<a href="tg://user?id=1">👤</a> <b>Ann &lt;3</b>') == "👤 Ann <3"
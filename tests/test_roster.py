@@ -0,0 +1,112 @@
+import asyncio
+
+import roster
+from roster import ChatRoster
+from storage import Database, AsyncDatabase
+
+CHAT_ID = -100
+
+
+class FlakyDatabase:
+    """База, в которой запись состава падает заданное число раз"""
+
+    def __init__(self, db, failures=0):
+        self.db = db
+        self.failures = failures
+        self.writes = []
+
+    async def update_chat_members(self, joined, left):
+        self.writes.append((sorted(joined), sorted(left)))
+        if self.failures:
+            self.failures -= 1
+            raise OSError("database is locked")
+        await self.db.update_chat_members(joined, left)
+
+    def __getattr__(self, name):
+        return getattr(self.db, name)
+
+
+def run_with_roster(scenario, failures=0, **options):
+    """Сценарий scenario(roster, db, flaky) с базой в памяти"""
+    async def main():
+        db = AsyncDatabase(Database(":memory:"))
+        flaky = FlakyDatabase(db, failures)
+        try:
+            return await scenario(ChatRoster(flaky, **options), db, flaky)
+        finally:
+            db.close()
+    return asyncio.run(main())
+
+
+def stored(db, chat_id=CHAT_ID):
+    return sorted(db.db.get_members_for_chats([chat_id])[chat_id])
+
+
+def test_changes_are_written_in_one_batch_on_flush():
+    async def scenario(roster, db, flaky):
+        for user_id in (1, 2, 3, 1, 2):
+            roster.seen(CHAT_ID, user_id)
+        roster.left(CHAT_ID, 3)
+        before = stored(db)
+        await roster.flush()
+        # Уже известные участники повторно не записываются
+        roster.seen(CHAT_ID, 1)
+        await roster.flush()
+        return before, stored(db), flaky.writes
+
+    before, after, writes = run_with_roster(scenario)
+    assert before == []
+    assert after == [1, 2]
+    assert writes == [([(CHAT_ID, 1), (CHAT_ID, 2)], [(CHAT_ID, 3)])]
+
+
+def test_failed_flush_is_retried():
+    async def scenario(roster, db, flaky):
+        roster.seen(CHAT_ID, 1)
+        roster.seen(CHAT_ID, 2)
+        await roster.flush()
+        failed = stored(db)
+        # Пока запись не удалась, пользователь 2 успел выйти
+        roster.left(CHAT_ID, 2)
+        await roster.flush()
+        return failed, stored(db), flaky.writes
+
+    failed, after, writes = run_with_roster(scenario, failures=1)
+    assert failed == []
+    assert after == [1]
+    assert writes[-1] == ([(CHAT_ID, 1)], [(CHAT_ID, 2)])
+
+
+def test_member_who_left_is_stored_again_when_seen():
+    async def scenario(roster, db, flaky):
+        roster.seen(CHAT_ID, 1)
+        await roster.flush()
+        roster.left(CHAT_ID, 1)
+        await roster.flush()
+        gone = stored(db)
+        roster.seen(CHAT_ID, 1)
+        await roster.flush()
+        return gone, stored(db), await roster.members_for_chats([CHAT_ID])
+
+    gone, back, members = run_with_roster(scenario)
+    assert gone == []
+    assert back == [1]
+    assert members == {CHAT_ID: [1]}
+
+
+def test_members_are_reloaded_after_ttl(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(roster.time, "monotonic", lambda: clock[0])
+
+    async def scenario(roster, db, flaky):
+        await db.update_chat_members([(CHAT_ID, 1)])
+        first = await roster.members_for_chats([CHAT_ID])
+        # Участника добавил другой процесс кластера
+        await db.update_chat_members([(CHAT_ID, 2)])
+        cached = await roster.members_for_chats([CHAT_ID])
+        clock[0] += 61
+        return first, cached, await roster.members_for_chats([CHAT_ID])
+
+    first, cached, reloaded = run_with_roster(scenario, ttl=60)
+    assert first == cached == {CHAT_ID: [1]}
+    assert sorted(reloaded[CHAT_ID]) == [1, 2]
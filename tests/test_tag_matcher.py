@@ -0,0 +1,40 @@
+import pytest
+
+from benchmarks.bench_tags import legacy_find, make_corpus
+from tags import TagMatcher, build_group_mapping
+
+GROUPS = {
+    "команда": {"members": [], "aliases": ["команд", "команду"]},
+    "тренер": {"members": [], "aliases": ["тренера", "тренеры", "тренеров"]},
+    "аналитик": {"members": [], "aliases": ["аналитики", "аналитиков", "аналитикам"]},
+    "staff": {"members": [], "aliases": ["crew"]},
+}
+MAPPING = build_group_mapping(GROUPS)
+
+
+@pytest.fixture(scope="module")
+def matcher():
+    return TagMatcher(MAPPING)
+
+
+@pytest.mark.parametrize("text", [
+    # Окончания и основы
+    "@тренер", "@тренеру", "@тренерам", "@тренерами", "@тренеров", "@аналитикам", "@аналитиками",
+    "@команде", "@команды", "@команд", "@тренерх",
+    # Регистр и повторенный @
+    "@ТРЕНЕРОВ", "@Команду", "@STAFF", "@@тренер", "@@@crew",
+    # Тег только отдельным словом
+    "text@тренер", "почта team@staff", "@тренер,", "(@тренер)", "@тренер!", "@", "@@",
+    # Несколько тегов и упоминаний: побеждает первый тег
+    "@someone позовите @тренеров и @команду", "@crew\n@тренер", "\t@команду  ",
+    "привет всем", "", "@trainer", "@staffer",
+])
+def test_matcher_agrees_with_legacy_algorithm(matcher, text):
+    assert matcher.find(text) == legacy_find(text, MAPPING)
+
+
+def test_matcher_agrees_on_chat_corpus(matcher):
+    corpus = make_corpus(5000, MAPPING)
+    mismatches = [text for text in corpus if matcher.find(text) != legacy_find(text, MAPPING)]
+    assert mismatches == []
+    assert any(matcher.find(text) for text in corpus)
@@ -0,0 +1,188 @@
+import asyncio
+
+import pytest
+
+from storage import Database, AsyncDatabase
+from tags import TagCoalescer, TagIndex, TagRegistry, is_valid_tag_name, is_valid_username
+
+REPLY = ("<b>@ann</b>", "@ann")
+CHAT_ID = -1001234567890
+
+
+def run_coalescer(scenario, window=0.05):
+    """Сценарий scenario(coalescer) и список отправленных (chat_id, ответ, reply_to)"""
+    sent = []
+
+    async def send(chat_id, reply, reply_to_message_id):
+        sent.append((chat_id, reply, reply_to_message_id))
+
+    async def main():
+        return await scenario(TagCoalescer(send, window))
+
+    return asyncio.run(main()), sent
+
+
+def test_first_mention_is_answered_immediately():
+    async def scenario(coalescer):
+        first = coalescer.add(CHAT_ID, "team", REPLY, 1)
+        await asyncio.sleep(0.1)
+        return first
+
+    first, sent = run_coalescer(scenario)
+    # Ответ на первое упоминание отправляет вызывающий, окно без повторов ничего не шлет
+    assert first is True
+    assert sent == []
+
+
+def test_follow_ups_are_sent_as_one_reply():
+    async def scenario(coalescer):
+        added = [coalescer.add(CHAT_ID, "team", REPLY, message_id) for message_id in (1, 2, 3, 4)]
+        added.append(coalescer.add(CHAT_ID, "other", REPLY, 5))
+        await asyncio.sleep(0.1)
+        added.append(coalescer.add(CHAT_ID, "team", REPLY, 6))
+        return added
+
+    added, sent = run_coalescer(scenario)
+    assert added == [True, False, False, False, True, True]
+    assert len(sent) == 1
+    chat_id, (html_text, plain_text), reply_to = sent[0]
+    assert (chat_id, reply_to) == (CHAT_ID, 2)
+    assert "https://t.me/c/1234567890/3" in plain_text and "https://t.me/c/1234567890/4" in plain_text
+
+
+def test_close_flushes_open_windows():
+    async def scenario(coalescer):
+        coalescer.add(CHAT_ID, "team", REPLY, 1)
+        coalescer.add(CHAT_ID, "team", REPLY, 2)
+        await coalescer.close()
+
+    _, sent = run_coalescer(scenario, window=60)
+    assert [reply_to for _, _, reply_to in sent] == [2]
+
+
+def test_zero_window_answers_every_mention():
+    async def scenario(coalescer):
+        return [coalescer.add(CHAT_ID, "team", REPLY, message_id) for message_id in (1, 2)]
+
+    added, sent = run_coalescer(scenario, window=0)
+    assert added == [True, True]
+    assert sent == []
+
+
+@pytest.mark.parametrize("name, valid", [
+    ("durov", True), ("Margul95", True), ("user_name_1", True),
+    ("abcd", False), ("<b", False), ("x" * 33, False), ("имя_юзера", False),
+])
+def test_username_validation(name, valid):
+    assert is_valid_username(name) is valid
+
+
+@pytest.mark.parametrize("name, valid", [
+    ("стафф", True), ("team_1", True), ("хуёжник", True),
+    ("", False), ("a<b>", False), ("two words", False), ("&amp", False), ("x" * 33, False),
+])
+def test_tag_name_validation(name, valid):
+    assert is_valid_tag_name(name) is valid
+
+
+def test_index_escapes_stored_names():
+    # Строки, сохраненные до проверки ввода, не ломают HTML-ответы
+    index = TagIndex({"a<b": {"members": [{"username": "x&<y"}], "aliases": ["<i>"]}})
+    html_reply, plain_reply = index.replies["a<b"]
+    assert "a&lt;b" in html_reply and "@x&amp;&lt;y" in html_reply
+    assert "@x&<y" in plain_reply
+    for text in (index.groups_text, index.tags_text):
+        assert "<b>A&lt;B:</b>" in text or "• @a&lt;b" in text
+        assert "@&lt;i&gt;" in text
+        assert "<i>" not in text and "x&<y" not in text
+
+
+@pytest.fixture
+def database():
+    db = Database(":memory:")
+    yield db
+    db.close()
+
+
+def test_tag_group_crud(database):
+    assert database.create_tag_group(-1, "team", ["crew", "team"])
+    # Имя занято группой или чужим написанием
+    assert not database.create_tag_group(-1, "team")
+    assert not database.create_tag_group(-1, "crew")
+    assert database.create_tag_group(-2, "team")
+
+    assert database.add_tag_members(-1, "team", ["alice_1", "bobby_2", "alice_1"]) == 2
+    assert database.add_tag_members(-1, "missing", ["alice_1"]) == 0
+    assert database.add_tag_aliases(-1, "team", ["squad", "crew", "team"]) == 1
+    assert database.remove_tag_members(-1, "team", ["bobby_2", "nobody_3"]) == 1
+
+    assert database.get_tag_groups(-1) == {
+        "team": {"members": [{"username": "alice_1"}], "aliases": ["crew", "squad"]},
+    }
+    assert database.get_tag_groups(-2) == {"team": {"members": [], "aliases": []}}
+
+    assert database.delete_tag_group(-1, "team")
+    assert not database.delete_tag_group(-1, "team")
+    assert database.get_tag_groups(-1) == {}
+    # Написания удалены вместе с группой - имя снова свободно
+    assert database.create_tag_group(-1, "crew")
+
+
+DEFAULT_GROUPS = {"staff": {"members": [{"username": "admin_1"}], "aliases": []}}
+
+
+def test_registry_caches_until_invalidated():
+    async def scenario():
+        db = AsyncDatabase(Database(":memory:"))
+        try:
+            loads = []
+
+            async def loader(chat_id):
+                loads.append(chat_id)
+                return await db.get_tag_groups(chat_id)
+
+            registry = TagRegistry(loader, DEFAULT_GROUPS)
+            default = await registry.get(-1)
+            cached = await registry.get(-1)
+
+            await db.create_tag_group(-1, "team")
+            await db.add_tag_members(-1, "team", ["alice_1"])
+            stale = await registry.get(-1)
+            registry.invalidate(-1)
+            fresh = await registry.get(-1)
+            return loads, default, cached, stale, fresh, registry.default_index
+        finally:
+            db.close()
+
+    loads, default, cached, stale, fresh, default_index = asyncio.run(scenario())
+    assert default is default_index and cached is default and stale is default
+    assert loads == [-1, -1]
+    assert fresh.matcher.find("@team hi") == "team"
+    assert fresh.version != default.version
+
+
+def test_registry_does_not_cache_load_raced_by_invalidate():
+    async def scenario():
+        started, release = asyncio.Event(), asyncio.Event()
+        groups = {"old": {"members": [{"username": "alice_1"}], "aliases": []}}
+
+        async def loader(chat_id):
+            loaded = dict(groups)
+            started.set()
+            await release.wait()
+            return loaded
+
+        registry = TagRegistry(loader, DEFAULT_GROUPS)
+        pending = asyncio.create_task(registry.get(-1))
+        await started.wait()
+        # Группы меняются, пока идет загрузка
+        groups.clear()
+        groups["new"] = {"members": [{"username": "bobby_2"}], "aliases": []}
+        registry.invalidate(-1)
+        release.set()
+        raced = await pending
+        return raced, await registry.get(-1)
+
+    raced, fresh = asyncio.run(scenario())
+    assert raced.matcher.find("@old") == "old"
+    assert fresh.matcher.find("@new") == "new"
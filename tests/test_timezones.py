@@ -0,0 +1,83 @@
+from datetime import date, datetime, timezone
+
+import pytest
+
+from storage import Database
+from timezones import chat_zone, delivery_passed, local_today, next_delivery, parse_timezone, run_after_change
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc).timestamp()
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Europe/Moscow", "Europe/Moscow"),
+    ("utc", "UTC"),
+    ("+3", "UTC+03:00"),
+    ("GMT-5:30", "UTC-05:30"),
+    ("UTC+15", None),
+    ("Mars/Olympus", None),
+])
+def test_parse_timezone(text, expected):
+    assert parse_timezone(text) == expected
+
+
+def test_next_delivery_today_or_tomorrow():
+    zone = chat_zone("UTC+03:00")
+    # 05:00 по местному времени: рассылка в 9:00 сегодня, в 4:00 - уже завтра
+    now = utc(2026, 10, 18, 2, 0)
+    assert next_delivery(now, zone, 9) == utc(2026, 10, 18, 6, 0)
+    assert next_delivery(now, zone, 4) == utc(2026, 10, 19, 1, 0)
+    assert not delivery_passed(now, zone, 9)
+    assert delivery_passed(now, zone, 4)
+
+
+def test_next_delivery_across_dst_change():
+    # 1 ноября 2026 Нью-Йорк переходит на зимнее время: 9:00 EST = 14:00 UTC
+    zone = chat_zone("America/New_York")
+    assert next_delivery(utc(2026, 10, 31, 14, 0), zone, 9) == utc(2026, 11, 1, 14, 0)
+
+
+def test_due_chats_follow_local_delivery_hour():
+    db = Database(":memory:")
+    try:
+        tokyo, new_york = chat_zone("Asia/Tokyo"), chat_zone("America/New_York")
+        # 00:30 UTC: в Токио 9:30 18 октября, в Нью-Йорке 20:30 17 октября
+        now = utc(2026, 10, 18, 0, 30)
+        earlier = now - 3600
+        db.set_chat_settings(-1, "Asia/Tokyo", 9, next_delivery(earlier, tokyo, 9))
+        db.set_chat_settings(-2, "America/New_York", 9, next_delivery(earlier, new_york, 9))
+        for chat_id in (-1, -2):
+            db.add_birthday(1, chat_id, "1990-10-19", "", "Ann", "")
+
+        assert db.get_due_chats(now) == [(-1, "Asia/Tokyo", 9)]
+        assert local_today(now, tokyo) == date(2026, 10, 18)
+        assert local_today(now, new_york) == date(2026, 10, 17)
+
+        # В Токио ДР завтра - напоминание; чат Нью-Йорка еще не обрабатывается
+        today_birthdays, tomorrow_birthdays = db.get_pending_birthdays("2026-10-18", [-1])
+        assert today_birthdays == [] and [row[1] for row in tomorrow_birthdays] == [-1]
+
+        db.reschedule_chats([(next_delivery(now, tokyo, 9), -1)])
+        assert db.get_due_chats(now) == []
+        assert db.get_next_run_at() == utc(2026, 10, 18, 13, 0)
+    finally:
+        db.close()
+
+
+def test_moving_delivery_hour_into_the_past_runs_today():
+    db = Database(":memory:")
+    try:
+        zone = chat_zone("UTC+03:00")
+        # Рассылка была в 18:00; в 12:00 по местному времени ее переносят на 9:00
+        now = utc(2026, 10, 18, 9, 0)
+        db.set_chat_settings(-1, "UTC+03:00", 18, next_delivery(now, zone, 18))
+        assert db.get_due_chats(now) == []
+
+        db.set_chat_settings(-1, "UTC+03:00", 9, run_after_change(now, zone, 9))
+        assert db.get_due_chats(now) == [(-1, "UTC+03:00", 9)]
+
+        # Перенос на еще не наступивший час - рассылка в него же сегодня
+        assert run_after_change(now, zone, 20) == utc(2026, 10, 18, 17, 0)
+    finally:
+        db.close()
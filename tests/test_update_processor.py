@@ -0,0 +1,77 @@
+import asyncio
+import random
+from datetime import datetime, timezone
+
+from telegram import Chat, Message, Update
+
+from update_processor import ChatOrderedUpdateProcessor, chat_key
+
+LIMIT = 3
+
+
+def chat_update(update_id, chat_id):
+    chat = Chat(chat_id, Chat.SUPERGROUP)
+    return Update(update_id, message=Message(update_id, datetime.now(timezone.utc), chat))
+
+
+def test_chats_run_in_parallel_in_order_within_limit():
+    random.seed(7)
+    updates = [chat_update(update_id, -random.randint(1, 5)) for update_id in range(1, 201)]
+    # Обновления без чата упорядочивать не нужно, но лимит действует и на них
+    updates += [Update(update_id) for update_id in range(201, 211)]
+
+    async def main():
+        processor = ChatOrderedUpdateProcessor(LIMIT)
+        handled = {}
+        state = {"running": 0, "peak": 0}
+
+        async def handle(update):
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+            await asyncio.sleep(random.random() / 1000)
+            handled.setdefault(chat_key(update), []).append(update.update_id)
+            state["running"] -= 1
+
+        # Как и Application, задачи создаются в порядке получения обновлений
+        await asyncio.gather(*(
+            asyncio.create_task(processor.process_update(update, handle(update))) for update in updates
+        ))
+        return handled, state["peak"], processor._chats
+
+    handled, peak, chats = asyncio.run(main())
+    for chat_id, update_ids in handled.items():
+        if chat_id is None:
+            continue
+        expected = [update.update_id for update in updates if chat_key(update) == chat_id]
+        assert update_ids == expected
+    assert sum(len(update_ids) for update_ids in handled.values()) == len(updates)
+    assert peak == LIMIT
+    # Блокировки разобранных чатов не копятся
+    assert chats == {}
+
+
+def test_slow_chat_does_not_hold_others():
+    async def main():
+        processor = ChatOrderedUpdateProcessor(2)
+        release = asyncio.Event()
+        done = []
+
+        async def slow():
+            await release.wait()
+            done.append("slow")
+
+        async def fast(name):
+            done.append(name)
+
+        # Второе обновление медленного чата ждет свой чат, не занимая обработчик
+        slow_tasks = [asyncio.create_task(processor.process_update(chat_update(1, -1), slow())),
+                      asyncio.create_task(processor.process_update(chat_update(2, -1), fast("slow-next")))]
+        await asyncio.wait_for(processor.process_update(chat_update(3, -2), fast("other")), 1)
+        other_first = list(done)
+        release.set()
+        await asyncio.gather(*slow_tasks)
+        return other_first, done
+
+    other_first, done = asyncio.run(main())
+    assert other_first == ["other"]
+    assert done == ["other", "slow", "slow-next"]
@@ -0,0 +1,74 @@
+import asyncio
+import json
+
+import pytest
+from telegram import Bot
+
+from webhook import SECRET_HEADER, WebhookApp
+
+
+class FakeApplication:
+    """То, что WebhookApp использует у Application"""
+
+    def __init__(self):
+        self.bot = Bot("123456:TEST")
+        self.update_queue = asyncio.Queue()
+        self.running = True
+
+
+def call(app, method, path, body=b"", headers=()):
+    """Один HTTP-запрос к ASGI-приложению: (статус, тело ответа)"""
+    async def scenario():
+        messages = [{"type": "http.request", "body": body, "more_body": False}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "method": method, "path": path, "headers": list(headers)}
+        await app(scope, receive, send)
+        return sent[0]["status"], sent[1]["body"]
+
+    return asyncio.run(scenario())
+
+
+def message_update(update_id):
+    return {"update_id": update_id, "message": {
+        "message_id": update_id, "date": 0, "chat": {"id": -100, "type": "supergroup"}, "text": "hi",
+    }}
+
+
+def test_batch_is_queued():
+    application = FakeApplication()
+    app = WebhookApp(application)
+    body = json.dumps([message_update(1), message_update(2)]).encode()
+    assert call(app, "POST", "/webhook", body) == (200, b"ok")
+    assert application.update_queue.qsize() == 2
+    assert app.received == 2
+
+
+@pytest.mark.parametrize("body", [b"not json", b'"x"', b"1", b"[1]", b"null", b'[{"update_id": 1}, "x"]'])
+def test_malformed_body_is_rejected(body):
+    application = FakeApplication()
+    assert call(WebhookApp(application), "POST", "/webhook", body) == (400, b"bad request")
+    assert application.update_queue.empty()
+
+
+def test_secret_token_is_checked():
+    application = FakeApplication()
+    app = WebhookApp(application, secret_token="s3cret")
+    body = json.dumps(message_update(1)).encode()
+    assert call(app, "POST", "/webhook", body, [(SECRET_HEADER, b"wrong")]) == (403, b"forbidden")
+    assert call(app, "POST", "/webhook", body, [(SECRET_HEADER, b"s3cret")]) == (200, b"ok")
+
+
+def test_health_endpoints():
+    application = FakeApplication()
+    app = WebhookApp(application)
+    assert call(app, "GET", "/healthz") == (200, b"ok")
+    application.running = False
+    assert call(app, "GET", "/readyz") == (503, b"starting")
+    assert call(app, "GET", "/missing") == (404, b"not found")
@@ -0,0 +1,76 @@
+import logging
+import re
+from datetime import datetime, time, timedelta, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from config import DEFAULT_TIMEZONE, DEFAULT_DELIVERY_HOUR
+
+logger = logging.getLogger(__name__)
+
+# Смещение от UTC: "+3", "-05:30", "UTC+3", "GMT-2"
+OFFSET_PATTERN = re.compile(r"^(?:UTC|GMT)?([+-])(\d{1,2})(?::?(\d{2}))?$", re.IGNORECASE)
+
+
+def parse_timezone(text):
+    """Имя часового пояса для хранения ("Europe/Moscow", "UTC+03:00") или None"""
+    text = text.strip()
+    if text.upper() in ("UTC", "GMT"):
+        return "UTC"
+
+    match = OFFSET_PATTERN.match(text)
+    if match:
+        sign, hours, minutes = match.group(1), int(match.group(2)), int(match.group(3) or 0)
+        if hours > 14 or minutes >= 60:
+            return None
+        return f"UTC{sign}{hours:02d}:{minutes:02d}"
+
+    try:
+        ZoneInfo(text)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+    return text
+
+
+@lru_cache(maxsize=None)
+def chat_zone(name):
+    """tzinfo по имени из parse_timezone; None - пояс по умолчанию"""
+    name = name or DEFAULT_TIMEZONE
+    match = OFFSET_PATTERN.match(name)
+    if match:
+        offset = timedelta(hours=int(match.group(2)), minutes=int(match.group(3) or 0))
+        return timezone(-offset if match.group(1) == "-" else offset)
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        logger.error(f"Unknown timezone {name!r}, using UTC")
+        return timezone.utc
+
+
+def delivery_hour(hour):
+    """Час рассылки чата; None - час по умолчанию"""
+    return DEFAULT_DELIVERY_HOUR if hour is None else hour
+
+
+def local_today(now, zone):
+    """Дата в часовом поясе zone в момент now (Unix time)"""
+    return datetime.fromtimestamp(now, zone).date()
+
+
+def delivery_passed(now, zone, hour):
+    """Наступил ли к моменту now сегодняшний (по местному времени) час рассылки"""
+    return now >= datetime.combine(local_today(now, zone), time(hour), tzinfo=zone).timestamp()
+
+
+def run_after_change(now, zone, hour):
+    """Момент рассылки после смены часового пояса или часа: 0 (сразу), если по новым
+    настройкам сегодняшний час уже прошел, иначе ближайший час рассылки"""
+    return 0 if delivery_passed(now, zone, hour) else next_delivery(now, zone, hour)
+
+
+def next_delivery(now, zone, hour):
+    """Ближайший после now момент hour:00 по местному времени - ключ расписания (Unix time, UTC)"""
+    today = local_today(now, zone)
+    for days in range(3):
+        moment = datetime.combine(today + timedelta(days=days), time(hour), tzinfo=zone).timestamp()
+        if moment > now:
+            return moment
@@ -0,0 +1,63 @@
+import asyncio
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+# Сколько обновлений могут ждать своей очереди (включая ожидающие освобождения чата)
+MAX_PENDING_UPDATES = 1000
+
+
+def chat_key(update):
+    """Ключ упорядочивания: чат, иначе пользователь; None - порядок не важен"""
+    if not isinstance(update, Update):
+        return None
+    if update.effective_chat:
+        return update.effective_chat.id
+    if update.effective_user:
+        return update.effective_user.id
+    return None
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """Параллельная обработка обновлений разных чатов с сохранением порядка внутри чата.
+
+    Одновременно выполняется не больше max_concurrent_updates обработчиков.
+    Обновления одного чата идут строго друг за другом, поэтому диалог
+    /set_birthday и ответы на теги не перемешиваются. Обновление, ожидающее
+    свой чат, не занимает место обработчика: медленный или заваленный
+    сообщениями чат не задерживает остальные.
+    """
+
+    def __init__(self, max_concurrent_updates, max_pending=MAX_PENDING_UPDATES):
+        # Семафор базового класса ограничивает число принятых обновлений,
+        # свой - число одновременно работающих обработчиков
+        super().__init__(max(max_pending, max_concurrent_updates))
+        self.concurrency = max_concurrent_updates
+        self._running = asyncio.Semaphore(max_concurrent_updates)
+        # chat_key -> [блокировка, число обновлений чата в работе и в ожидании]
+        self._chats = {}
+
+    async def do_process_update(self, update, coroutine):
+        key = chat_key(update)
+        if key is None:
+            async with self._running:
+                await coroutine
+            return
+
+        entry = self._chats.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            # asyncio.Lock пропускает ожидающих в порядке прихода, а задачи
+            # обновлений создаются в порядке получения
+            async with entry[0]:
+                async with self._running:
+                    await coroutine
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._chats[key]
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
@@ -0,0 +1,107 @@
+import hmac
+import json
+import logging
+from telegram import Update
+
+logger = logging.getLogger(__name__)
+
+# Заголовок, в котором Telegram передает секрет, заданный в setWebhook
+SECRET_HEADER = b"x-telegram-bot-api-secret-token"
+
+
+class WebhookApp:
+    """ASGI-приложение для приема обновлений Telegram.
+
+    POST <path> - одно обновление или JSON-массив обновлений, которые разом
+    передаются в очередь обработки приложения;
+    GET /healthz - процесс жив;
+    GET /readyz - приложение запущено и принимает обновления.
+    """
+
+    def __init__(self, application, path="/webhook", secret_token=None):
+        self.application = application
+        self.path = path
+        self.secret_token = secret_token.encode() if secret_token else None
+        self.received = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        method, path = scope["method"], scope["path"]
+        if method == "GET" and path == "/healthz":
+            await self._respond(send, 200, b"ok")
+        elif method == "GET" and path == "/readyz":
+            ready = self.application.running
+            await self._respond(send, 200 if ready else 503, b"ready" if ready else b"starting")
+        elif method == "POST" and path == self.path:
+            await self._handle_updates(scope, receive, send)
+        else:
+            await self._respond(send, 404, b"not found")
+
+    async def _handle_updates(self, scope, receive, send):
+        if self.secret_token is not None:
+            token = dict(scope["headers"]).get(SECRET_HEADER, b"")
+            if not hmac.compare_digest(token, self.secret_token):
+                await self._respond(send, 403, b"forbidden")
+                return
+
+        body = await self._read_body(receive)
+        try:
+            payload = json.loads(body)
+            batch = payload if isinstance(payload, list) else [payload]
+            # Обновление - JSON-объект; строки, числа и null de_json не разберет
+            if not all(isinstance(data, dict) for data in batch):
+                raise ValueError("update is not a JSON object")
+            updates = [Update.de_json(data, self.application.bot) for data in batch]
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning(f"Invalid webhook payload: {e}")
+            await self._respond(send, 400, b"bad request")
+            return
+
+        # Вся пачка кладется в очередь без ожидания обработки: Telegram получает
+        # ответ сразу, а обработчики разбирают очередь в своем темпе
+        for update in updates:
+            if update is not None:
+                self.application.update_queue.put_nowait(update)
+        self.received += len(updates)
+        await self._respond(send, 200, b"ok")
+
+    async def _read_body(self, receive):
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                return b"".join(chunks)
+
+    async def _lifespan(self, receive, send):
+        # Жизненным циклом бота управляет вызывающий код, здесь только подтверждаем
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _respond(self, send, status, body):
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"text/plain"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+async def serve_webhook(app, listen, port):
+    """Запуск ASGI-сервера в текущем цикле событий; возвращается после остановки сервера"""
+    import uvicorn
+
+    config = uvicorn.Config(app, host=listen, port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    logger.info(f"✅ Webhook server listening on {listen}:{port}")
+    await server.serve()